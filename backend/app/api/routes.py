@@ -1,8 +1,19 @@
+import asyncio
+import json
 import time
 import logging
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from ..models.schemas import QueryRequest, QueryResponse
+from typing import Any, Dict
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
+from ..models.schemas import BatchQueryRequest, BatchQueryResponse, QueryRequest, QueryResponse
 from ..services.ai_service import ai_service
+from ..services.batch_scheduler import batch_scheduler
+from ..services.domain_scheduler import domain_scheduler
+from ..services.metrics import REQUEST_SECONDS, llm_throughput, start_timer
+from ..services.page_cache import page_cache
+from ..services.prompt_builder import token_counter
+from ..services.serp_cache import serp_cache
+from ..services.web_scraper import fetch_path_counts, network_totals
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -10,6 +21,7 @@ router = APIRouter()
 @router.post("/query", response_model=QueryResponse)
 async def process_query(request: QueryRequest):
     start_time = time.time()
+    timer = start_timer()
     
     try:
         logger.info(f"Processing query: {request.query}")
@@ -19,10 +31,12 @@ async def process_query(request: QueryRequest):
             query=request.query,
             max_results=request.max_results,
             search_engine=request.search_engine,
-            use_cache=request.use_cache
+            use_cache=request.use_cache,
+            speculative=request.speculative
         )
         
         processing_time = time.time() - start_time
+        REQUEST_SECONDS.labels(str(cached).lower()).observe(processing_time)
         
         # create response
         response = QueryResponse(
@@ -30,7 +44,8 @@ async def process_query(request: QueryRequest):
             answer=answer,
             sources=sources,
             cached=cached,
-            processing_time=processing_time
+            processing_time=processing_time,
+            timings=timer.timings
         )
         
         logger.info(f"Query processed in {processing_time:.2f}s (cached: {cached})")
@@ -46,19 +61,120 @@ async def process_query(request: QueryRequest):
         )
 
 
+@router.post("/query/stream")
+async def stream_query(request: QueryRequest, http_request: Request):
+    """
+    Server-sent events variant of /query.
+
+    Emits `cache`, `validated` and `source` events as the pipeline progresses,
+    then `token` events while the answer is generated. A query that joins a
+    similar one already in flight gets a `coalesced` event instead and then
+    waits for its result. The last frame is a
+    `result` event carrying the QueryResponse payload, or an `error` event.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def on_event(name: str, data: Dict[str, Any]):
+        await events.put((name, data))
+
+    async def run():
+        start_time = time.time()
+        timer = start_timer()
+        try:
+            answer, sources, cached = await ai_service.process_query(
+                query=request.query,
+                max_results=request.max_results,
+                search_engine=request.search_engine,
+                use_cache=request.use_cache,
+                speculative=request.speculative,
+                on_event=on_event
+            )
+            processing_time = time.time() - start_time
+            REQUEST_SECONDS.labels(str(cached).lower()).observe(processing_time)
+            response = QueryResponse(
+                query=request.query,
+                answer=answer,
+                sources=sources,
+                cached=cached,
+                processing_time=processing_time,
+                timings=timer.timings
+            )
+            logger.info(f"Streamed query processed in {processing_time:.2f}s (cached: {cached})")
+            await events.put(("result", json.loads(response.json())))
+        except Exception as e:
+            logger.error(f"Error processing streamed query: {e}")
+            await events.put(("error", {"detail": f"Query processing failed: {str(e)}"}))
+
+    async def event_stream():
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                name, data = await events.get()
+                yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+                if name in ("result", "error"):
+                    break
+                if await http_request.is_disconnected():
+                    logger.info("Client disconnected, cancelling streamed query")
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/query/batch", response_model=BatchQueryResponse)
+async def process_batch(request: BatchQueryRequest):
+    """
+    Process many queries in one call, e.g. for offline enrichment.
+
+    Queries run through a scheduler shared by all batch requests, with at most
+    BATCH_CONCURRENCY in flight; a failed query is reported in its result
+    rather than failing the batch.
+    """
+    start_time = time.time()
+    logger.info(f"Processing batch of {len(request.queries)} queries")
+    
+    results = await batch_scheduler.run(
+        request.queries,
+        max_results=request.max_results,
+        search_engine=request.search_engine,
+        use_cache=request.use_cache
+    )
+    failed = sum(1 for result in results if result.error)
+    processing_time = time.time() - start_time
+    logger.info(f"Batch processed in {processing_time:.2f}s ({failed} failed)")
+    
+    return BatchQueryResponse(
+        results=results,
+        succeeded=len(results) - failed,
+        failed=failed,
+        processing_time=processing_time
+    )
+
+
 @router.get("/cache/stats")
 async def get_cache_stats():
     try:
         if not ai_service._initialized:
             await ai_service.initialize()
         
-        total_entries = len(ai_service.query_metadata)
-        faiss_size = ai_service.faiss_index.ntotal if ai_service.faiss_index else 0
+        cache_store = ai_service.cache_store
+        total_entries = len(cache_store)
+        faiss_size = cache_store.index.ntotal if cache_store.index else 0
         
         return {
             "total_cached_queries": total_entries,
             "faiss_index_size": faiss_size,
-            "cache_enabled": True
+            "cache_enabled": True,
+            **cache_store.usage_stats(),
+            "index": cache_store.index.stats() if cache_store.index else None,
+            "persistence": cache_store.persistence_stats()
         }
     except Exception as e:
         logger.error(f"Error getting cache stats: {e}")
@@ -66,3 +182,32 @@ async def get_cache_stats():
             status_code=500,
             detail=f"Failed to get cache stats: {str(e)}"
         )
+
+
+@router.get("/scraper/stats")
+async def get_scraper_stats():
+    total_fetches = sum(fetch_path_counts.values())
+    http_fetches = fetch_path_counts.get("http", 0)
+    page_cache_hits = fetch_path_counts.get("cache", 0) + fetch_path_counts.get("revalidated", 0)
+    
+    return {
+        "total_fetches": total_fetches,
+        "fetch_paths": dict(fetch_path_counts),
+        "http_hit_rate": http_fetches / total_fetches if total_fetches else 0.0,
+        "page_cache_hit_rate": page_cache_hits / total_fetches if total_fetches else 0.0,
+        "page_cache": page_cache.stats(),
+        "serp_cache": serp_cache.stats(),
+        "batch": batch_scheduler.stats(),
+        "domains": domain_scheduler.stats(),
+        "bytes_transferred": network_totals.get("bytes_transferred", 0),
+        "blocked_requests": network_totals.get("blocked_requests", 0)
+    }
+
+
+@router.get("/llm/stats")
+async def get_llm_stats():
+    return {
+        "calls": llm_throughput(),
+        "gateway": ai_service.llm_gateway.stats(),
+        "chars_per_token": round(token_counter.chars_per_token, 3)
+    }
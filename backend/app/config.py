@@ -13,11 +13,20 @@ class Settings:
     # Project paths
     PROJECT_ROOT: Path = Path(__file__).parent.parent.parent
     BACKEND_ROOT: Path = Path(__file__).parent.parent
-    DATA_DIR: Path = BACKEND_ROOT / "data"
+    DATA_DIR: Path = Path(os.getenv("DATA_DIR", str(BACKEND_ROOT / "data")))
     
     # Model Configuration
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "gemini")  # "gemini" or "stub"
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+    
+    # Local stub LLM (LLM_BACKEND=stub) for offline benchmarking
+    LLM_STUB_LATENCY: float = float(os.getenv("LLM_STUB_LATENCY", "0.2"))  # seconds per call
+    LLM_STUB_TOKENS_PER_SECOND: float = float(os.getenv("LLM_STUB_TOKENS_PER_SECOND", "200"))
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    EMBEDDING_BATCH_WINDOW: float = float(os.getenv("EMBEDDING_BATCH_WINDOW", "0.005"))  # seconds to gather a batch
+    EMBEDDING_MAX_BATCH: int = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))  # recent query embeddings kept
     
     # AI Service Configuration
     EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "384"))
@@ -25,13 +34,114 @@ class Settings:
     MAX_CONTENT_LENGTH: int = int(os.getenv("MAX_CONTENT_LENGTH", "500"))
     ERROR_MESSAGE_PREFIX: str = os.getenv("ERROR_MESSAGE_PREFIX", "I encountered an error")
     
+    # Answer Context Retrieval Configuration
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", "8"))  # chunks in the answer context
+    RETRIEVAL_TOKEN_BUDGET: int = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "4000"))  # candidate chunk tokens
+    RETRIEVAL_DEDUP_THRESHOLD: float = float(os.getenv("RETRIEVAL_DEDUP_THRESHOLD", "0.92"))
+    RETRIEVAL_ENCODE_BATCH: int = int(os.getenv("RETRIEVAL_ENCODE_BATCH", "64"))  # chunks per forward pass
+    
+    # Prompt Token Budgets (per LLM call)
+    LLM_ANSWER_INPUT_TOKENS: int = int(os.getenv("LLM_ANSWER_INPUT_TOKENS", "2500"))
+    LLM_ANSWER_OUTPUT_TOKENS: int = int(os.getenv("LLM_ANSWER_OUTPUT_TOKENS", "1024"))
+    LLM_VALIDATION_INPUT_TOKENS: int = int(os.getenv("LLM_VALIDATION_INPUT_TOKENS", "400"))
+    LLM_VALIDATION_OUTPUT_TOKENS: int = int(os.getenv("LLM_VALIDATION_OUTPUT_TOKENS", "5"))
+    
+    # LLM Gateway (rate limit, concurrency, retries and hedging of LLM calls)
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # calls in flight at once
+    LLM_REQUESTS_PER_MINUTE: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))  # 0 = unlimited
+    LLM_RATE_BURST: int = int(os.getenv("LLM_RATE_BURST", "10"))  # calls allowed back to back
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "60"))  # seconds per attempt
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # seconds, doubled per retry
+    LLM_RETRY_MAX_DELAY: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+    LLM_HEDGE_CALLS: list = [call for call in os.getenv("LLM_HEDGE_CALLS", "validation").split(",") if call]
+    LLM_HEDGE_DELAY: float = float(os.getenv("LLM_HEDGE_DELAY", "2"))  # seconds, until p95 is known
+    
+    # Query Validation Configuration
+    VALIDATION_CACHE_SIZE: int = int(os.getenv("VALIDATION_CACHE_SIZE", "10000"))
+    VALIDATION_LOCAL_CLASSIFIER: bool = os.getenv("VALIDATION_LOCAL_CLASSIFIER", "true").lower() == "true"
+    VALIDATION_MIN_SIMILARITY: float = float(os.getenv("VALIDATION_MIN_SIMILARITY", "0.6"))
+    VALIDATION_MARGIN: float = float(os.getenv("VALIDATION_MARGIN", "0.15"))
+    
     # FAISS Configuration
     FAISS_INDEX_PATH: Path = DATA_DIR / "query_cache.faiss"
     FAISS_METADATA_PATH: Path = DATA_DIR / "query_metadata.json"
+    CACHE_METADATA_PATH: Path = DATA_DIR / "query_metadata.db"
+    CACHE_METADATA_MMAP_SIZE: int = int(os.getenv("CACHE_METADATA_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes
+    
+    # Cache Index Configuration
+    CACHE_INDEX_TYPE: str = os.getenv("CACHE_INDEX_TYPE", "flat")  # "flat", "ivf" or "hnsw"
+    CACHE_INDEX_QUANTIZER: str = os.getenv("CACHE_INDEX_QUANTIZER", "none")  # "none", "sq8" or "pq"
+    CACHE_INDEX_TRAIN_SIZE: int = int(os.getenv("CACHE_INDEX_TRAIN_SIZE", "10000"))  # vectors before leaving flat
+    CACHE_IVF_NLIST: int = int(os.getenv("CACHE_IVF_NLIST", "0"))  # 0 = sized from the cache
+    CACHE_IVF_NPROBE: int = int(os.getenv("CACHE_IVF_NPROBE", "16"))
+    CACHE_HNSW_M: int = int(os.getenv("CACHE_HNSW_M", "32"))
+    CACHE_HNSW_EF_SEARCH: int = int(os.getenv("CACHE_HNSW_EF_SEARCH", "64"))
+    CACHE_PQ_M: int = int(os.getenv("CACHE_PQ_M", "0"))  # 0 = dimension / 8 sub-quantizers
     
     # Search Configuration
     MAX_SEARCH_RESULTS: int = int(os.getenv("MAX_SEARCH_RESULTS", "5"))
     DEFAULT_SEARCH_ENGINE: str = os.getenv("DEFAULT_SEARCH_ENGINE", "bing")
+    LOCAL_SEARCH_URL: str = os.getenv("LOCAL_SEARCH_URL", "http://127.0.0.1:8765/search")  # "local" engine
+    SERP_CACHE_TTL: float = float(os.getenv("SERP_CACHE_TTL", "600"))  # seconds, 0 = disabled
+    SERP_CACHE_SIZE: int = int(os.getenv("SERP_CACHE_SIZE", "4096"))  # result lists kept
+    
+    # Batch Query Configuration
+    BATCH_MAX_QUERIES: int = int(os.getenv("BATCH_MAX_QUERIES", "1000"))  # per request
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "8"))  # queries in flight across all batches
+    
+    # Browser Pool Configuration
+    BROWSER_POOL_SIZE: int = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+    BROWSER_MAX_PAGES: int = int(os.getenv("BROWSER_MAX_PAGES", "200"))  # recycle after N pages
+    BROWSER_HEALTH_CHECK_INTERVAL: float = float(os.getenv("BROWSER_HEALTH_CHECK_INTERVAL", "30"))
+    
+    # Scraping Configuration
+    SCRAPE_CONCURRENCY: int = int(os.getenv("SCRAPE_CONCURRENCY", "5"))  # pages per query
+    SCRAPE_GLOBAL_CONCURRENCY: int = int(os.getenv("SCRAPE_GLOBAL_CONCURRENCY", "20"))  # pages across all queries
+    SCRAPE_DEADLINE: float = float(os.getenv("SCRAPE_DEADLINE", "25"))  # seconds per query
+    SCRAPE_OVERFETCH: int = int(os.getenv("SCRAPE_OVERFETCH", "3"))  # spare search results per query
+    SCRAPE_HEDGE_DELAY: float = float(os.getenv("SCRAPE_HEDGE_DELAY", "3"))  # seconds before backing up a page, 0 = off
+    
+    # Per-Domain Scheduling Configuration
+    DOMAIN_TIMEOUT_DEFAULT: float = float(os.getenv("DOMAIN_TIMEOUT_DEFAULT", "20"))  # seconds, also the ceiling
+    DOMAIN_TIMEOUT_MIN: float = float(os.getenv("DOMAIN_TIMEOUT_MIN", "2"))
+    DOMAIN_TIMEOUT_MULTIPLIER: float = float(os.getenv("DOMAIN_TIMEOUT_MULTIPLIER", "2"))  # times the domain's p95
+    DOMAIN_TIMEOUT_MIN_SAMPLES: int = int(os.getenv("DOMAIN_TIMEOUT_MIN_SAMPLES", "5"))
+    DOMAIN_HISTORY_WINDOW: int = int(os.getenv("DOMAIN_HISTORY_WINDOW", "50"))  # fetches remembered per domain
+    DOMAIN_BREAKER_FAILURES: int = int(os.getenv("DOMAIN_BREAKER_FAILURES", "3"))  # consecutive, to open the circuit
+    DOMAIN_BREAKER_COOLDOWN: float = float(os.getenv("DOMAIN_BREAKER_COOLDOWN", "300"))  # seconds
+    DOMAIN_MAX_CONCURRENCY: int = int(os.getenv("DOMAIN_MAX_CONCURRENCY", "4"))  # pages per domain across queries
+    
+    # HTTP Fast Path Configuration
+    HTTP_FAST_PATH: bool = os.getenv("HTTP_FAST_PATH", "true").lower() == "true"
+    HTTP_FETCH_TIMEOUT: float = float(os.getenv("HTTP_FETCH_TIMEOUT", "8"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE: int = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    
+    # Page Cache Configuration (extracted text of result pages, by URL)
+    PAGE_CACHE_ENABLED: bool = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+    PAGE_CACHE_PATH: Path = DATA_DIR / "page_cache.db"
+    PAGE_CACHE_FRESHNESS: float = float(os.getenv("PAGE_CACHE_FRESHNESS", "900"))  # seconds before revalidating
+    PAGE_CACHE_MEMORY_ENTRIES: int = int(os.getenv("PAGE_CACHE_MEMORY_ENTRIES", "256"))  # decompressed pages in memory
+    PAGE_CACHE_MAX_ENTRIES: int = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "20000"))  # pages on disk, 0 = unbounded
+    
+    # Text Extraction Configuration
+    TEXT_EXTRACTOR: str = os.getenv("TEXT_EXTRACTOR", "lxml")  # "lxml" or "selector"
+    EXTRACTION_POOL: str = os.getenv("EXTRACTION_POOL", "thread")  # "thread" or "process"
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", "4"))
+    
+    # Request Blocking Configuration (Playwright resource types and ad/analytics domains)
+    BLOCKED_RESOURCE_TYPES: list = os.getenv(
+        "BLOCKED_RESOURCE_TYPES",
+        "image,media,font,stylesheet,texttrack,websocket,manifest,eventsource,other"
+    ).split(",")
+    BLOCKED_DOMAINS: list = os.getenv(
+        "BLOCKED_DOMAINS",
+        "doubleclick.net,googlesyndication.com,googleadservices.com,google-analytics.com,"
+        "googletagmanager.com,facebook.net,scorecardresearch.com,adnxs.com,amazon-adsystem.com,"
+        "criteo.com,taboola.com,outbrain.com,hotjar.com,quantserve.com,chartbeat.com,segment.io"
+    ).split(",")
     
     # CORS Configuration
     CORS_ORIGINS: list = os.getenv(
@@ -39,12 +149,19 @@ class Settings:
     ).split(",")
     
     # Cache Configuration
-    CACHE_TTL: int = int(os.getenv("CACHE_TTL", "3600"))  # 1 hour
+    CACHE_TTL: int = int(os.getenv("CACHE_TTL", "3600"))  # 1 hour, 0 = never expire
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "100000"))  # 0 = unbounded
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_BYTES", "0"))  # 0 = unbounded
+    CACHE_EVICTION_POLICY: str = os.getenv("CACHE_EVICTION_POLICY", "lru")  # "lru" or "lfu"
+    CACHE_SWEEP_INTERVAL: float = float(os.getenv("CACHE_SWEEP_INTERVAL", "60"))  # seconds between expiry sweeps
+    CACHE_FLUSH_INTERVAL: float = float(os.getenv("CACHE_FLUSH_INTERVAL", "1.0"))  # seconds between log flushes
+    CACHE_FLUSH_BATCH: int = int(os.getenv("CACHE_FLUSH_BATCH", "64"))  # flush early once this many are pending
+    CACHE_COMPACT_THRESHOLD: int = int(os.getenv("CACHE_COMPACT_THRESHOLD", "1000"))  # log records per snapshot
     
     def __init__(self):
         self.DATA_DIR.mkdir(exist_ok=True)
 
-        if not self.GEMINI_API_KEY:
+        if self.LLM_BACKEND == "gemini" and not self.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY environment variable is required")
 
 settings = Settings()
@@ -1,25 +1,67 @@
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
 from .api.routes import router
+from .services.ai_service import ai_service
+from .services.browser_pool import browser_pool
+from .services.http_fetcher import http_fetcher
+from .services.metrics import METRICS_CONTENT_TYPE, render_metrics
+from .services.page_cache import page_cache
+from .services.startup import startup
+from .services.text_extractor import shutdown_extraction_pool
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+async def _start_browser_pool():
+    await browser_pool.start()
+    await browser_pool.warmup()
+
+
+async def _start_components():
+    """Start the slow components concurrently; requests arriving meanwhile wait for what they need"""
+    started = time.perf_counter()
+    await asyncio.gather(
+        startup.run("browser_pool", _start_browser_pool),
+        ai_service.initialize(),
+        return_exceptions=True
+    )
+    if startup.ready:
+        logging.info(f"Web Query API ready in {time.perf_counter() - started:.2f}s")
+    else:
+        logging.error(f"Web Query API started with failed components: {startup.components}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logging.info("Starting Web Query API...")
     logging.info(f"Debug mode: {settings.DEBUG}")
     logging.info(f"CORS origins: {settings.CORS_ORIGINS}")
     
+    await startup.run("http_fetcher", http_fetcher.start)
+    await startup.run("page_cache", page_cache.start)
+    startup.expect("browser_pool", "embedding_model", "llm", "semantic_cache", "text_splitter")
+    # Serve liveness probes while models load; /health/ready reports when everything is up
+    startup_task = asyncio.create_task(_start_components())
+
     yield
 
     logging.info("Shutting down Web Query API...")
+    if not startup_task.done():
+        startup_task.cancel()
+    await asyncio.gather(startup_task, return_exceptions=True)
+    await ai_service.shutdown()
+    await http_fetcher.stop()
+    page_cache.stop()
+    await browser_pool.stop()
+    shutdown_extraction_pool()
 
 app = FastAPI(
     title="Web Query API",
@@ -49,6 +91,27 @@ async def root():
     }
 
 
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving requests"""
+    return {"status": "alive", "uptime_seconds": round(startup.uptime, 3)}
+
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """Every component has started; 503 with the per-component status until then"""
+    ready = startup.ready
+    if not ready:
+        response.status_code = 503
+    return {"ready": ready, "components": startup.components}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     
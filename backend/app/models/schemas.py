@@ -1,7 +1,9 @@
-from typing import List, Optional
+from typing import Annotated, Dict, List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 
+from ..config import settings
+
 
 class QueryRequest(BaseModel):
     """Request model for web query"""
@@ -9,6 +11,7 @@ class QueryRequest(BaseModel):
     max_results: Optional[int] = Field(5, ge=1, le=20, description="Maximum number of results")
     search_engine: Optional[str] = Field("bing", description="Search engine to use")
     use_cache: Optional[bool] = Field(True, description="Whether to use cached results")
+    speculative: Optional[bool] = Field(False, description="Start scraping while the query is still being validated")
 
 
 class SearchResult(BaseModel):
@@ -27,3 +30,29 @@ class QueryResponse(BaseModel):
     cached: bool = False
     timestamp: datetime = Field(default_factory=datetime.now)
     processing_time: Optional[float] = None
+    timings: Optional[Dict[str, float]] = Field(None, description="Seconds spent in each pipeline stage")
+
+
+class BatchQueryRequest(BaseModel):
+    """Request model for many web queries sharing the same options"""
+    queries: List[Annotated[str, Field(min_length=1, max_length=1000)]] = Field(
+        ..., min_length=1, max_length=settings.BATCH_MAX_QUERIES, description="Search queries"
+    )
+    max_results: Optional[int] = Field(5, ge=1, le=20, description="Maximum number of results per query")
+    search_engine: Optional[str] = Field("bing", description="Search engine to use")
+    use_cache: Optional[bool] = Field(True, description="Whether to use cached results")
+
+
+class BatchQueryResult(BaseModel):
+    """Outcome of one query in a batch: a response, or the error that stopped it"""
+    query: str
+    response: Optional[QueryResponse] = None
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    """Response model for a batch of web queries, in request order"""
+    results: List[BatchQueryResult]
+    succeeded: int
+    failed: int
+    processing_time: float
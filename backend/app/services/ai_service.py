@@ -1,92 +1,378 @@
-import json
 import asyncio
 import logging
-from typing import List, Optional, Dict, Any, Tuple
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
-import google.generativeai as genai
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import Document
 
 from ..config import settings
 from ..models.schemas import SearchResult
+from ..utils.text import normalize_query
+from .cache_store import CacheStore
+from .embedding_service import EmbeddingService
+from .llm_backends import LLMBackend, LLMResponse, create_llm_backend
+from .metrics import (
+    CACHE_LOOKUPS, COALESCED_REQUESTS, LLM_ERRORS, LLM_HEDGES, LLM_MODEL_SECONDS, LLM_QUEUE_SECONDS, LLM_RETRIES,
+    SPECULATIVE_CANCELLED, SPECULATIVE_WASTED_SECONDS, VALIDATIONS, record_llm_tokens, span
+)
+from .prompt_builder import BuiltPrompt, ContextChunk, prompt_builder, token_counter
+from .query_classifier import QueryClassifier
+from .retrieval import select_chunks
+from .startup import startup
 from .web_scraper import WebScraperService
 
+# langchain is imported by `initialize`, off the event loop, to keep app import fast
+if TYPE_CHECKING:
+    from langchain.schema import Document
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
 logger = logging.getLogger(__name__)
 
+INVALID_QUERY_ANSWER = "This query doesn't appear to be a valid web search query. Please try asking a question that can be answered with web information."
+NO_RESULTS_ANSWER = "I couldn't find any relevant information for your query."
+
+# Receives pipeline progress events (name, payload) for streaming clients
+EventCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# Exception names and HTTP statuses worth another attempt: rate limits, overload, timeouts, dropped connections
+_RETRYABLE_ERRORS = (
+    "ResourceExhausted", "TooManyRequests", "RateLimit", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "Timeout", "Connect", "RemoteProtocolError"
+)
+_RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """The LLM could not be reached within the retry budget"""
+
+
+class LLMTiming:
+    """Where one LLM call's time went: waiting for capacity vs. inside the model"""
+
+    def __init__(self):
+        self.queue_seconds = 0.0
+        self.model_seconds = 0.0
+        self.attempts = 0
+        self.hedged = False
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and bursts of up to `capacity`; rate 0 = unlimited"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # Waiters are served in arrival order
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while not self.try_acquire():
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def try_acquire(self) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class LLMGateway:
+    """
+    The one way AIService talks to the LLM backend.
+
+    Every call waits for a token from a rate-limit bucket and a slot in a
+    bounded concurrency pool (time spent there is reported as queue wait,
+    separately from model time), has a per-attempt timeout, and is retried
+    with full-jitter exponential backoff on rate limits, overload, timeouts
+    and connection errors. Calls of the types in `hedge_calls` are hedged: if
+    no answer arrives within the call type's recent p95 model time, a second
+    request is sent when there is spare capacity, and the first answer wins.
+    Streams are retried only until their first chunk arrives.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = settings.LLM_MAX_CONCURRENCY,
+        requests_per_minute: float = settings.LLM_REQUESTS_PER_MINUTE,
+        burst: int = settings.LLM_RATE_BURST,
+        timeout: float = settings.LLM_TIMEOUT,
+        max_retries: int = settings.LLM_MAX_RETRIES,
+        retry_base_delay: float = settings.LLM_RETRY_BASE_DELAY,
+        retry_max_delay: float = settings.LLM_RETRY_MAX_DELAY,
+        hedge_calls: List[str] = settings.LLM_HEDGE_CALLS,
+        hedge_delay: float = settings.LLM_HEDGE_DELAY
+    ):
+        self.backend: Optional[LLMBackend] = None
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.hedge_calls = set(hedge_calls)
+        self.hedge_delay = hedge_delay
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._model_seconds: Dict[str, Deque[float]] = {}
+        self.waiting = 0
+        self.in_flight = 0
+
+    async def invoke(
+        self,
+        call: str,
+        prompt: str,
+        max_output_tokens: Optional[int] = None,
+        timing: Optional[LLMTiming] = None
+    ) -> LLMResponse:
+        timing = timing or LLMTiming()
+        for attempt in range(self.max_retries + 1):
+            try:
+                if call in self.hedge_calls:
+                    return await self._hedged(call, prompt, max_output_tokens, timing)
+                return await self._send(call, prompt, max_output_tokens, timing)
+            except Exception as e:
+                await self._backoff(call, attempt, e)
+
+    async def stream(
+        self,
+        call: str,
+        prompt: str,
+        max_output_tokens: Optional[int] = None,
+        timing: Optional[LLMTiming] = None
+    ) -> AsyncIterator[str]:
+        timing = timing or LLMTiming()
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self._slot(call, timing):
+                    sent = time.perf_counter()
+                    chunks = self.backend.astream(prompt, max_output_tokens)
+                    try:
+                        # The timeout covers the wait for the first chunk; after that the answer is flowing
+                        first = await asyncio.wait_for(anext(chunks, None), self.timeout)
+                        started = True
+                        if first is not None:
+                            yield first
+                            async for chunk in chunks:
+                                yield chunk
+                    except Exception:
+                        self._observe_model_time(call, time.perf_counter() - sent, timing, ok=False)
+                        raise
+                    finally:
+                        await chunks.aclose()
+                    self._observe_model_time(call, time.perf_counter() - sent, timing)
+                return
+            except Exception as e:
+                if started:
+                    LLM_ERRORS.labels(call, type(e).__name__).inc()
+                    raise
+                await self._backoff(call, attempt, e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rate_tokens": round(self.bucket.tokens, 2) if self.bucket.rate > 0 else None,
+            "hedge_after_seconds": {call: round(self._hedge_after(call), 3) for call in sorted(self.hedge_calls)}
+        }
+
+    async def _hedged(self, call: str, prompt: str, max_output_tokens: Optional[int], timing: LLMTiming) -> LLMResponse:
+        primary = asyncio.create_task(self._send(call, prompt, max_output_tokens, timing))
+        pending = {primary}
+        # Cancelling the caller at any point here must cancel the attempts too, or they keep their slots
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self._hedge_after(call))
+            # Only hedge with spare capacity, so hedging can't feed an overload
+            if done or self._slots.locked() or not self.bucket.try_acquire():
+                return await primary
+
+            timing.hedged = True
+            hedge = asyncio.create_task(self._send(call, prompt, max_output_tokens, timing, rate_limited=False))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGES.labels(call, "won" if task is hedge else "lost").inc()
+                        return task.result()
+            # Both failed: surface the primary's error
+            return primary.result()
+        finally:
+            unfinished = [task for task in pending if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                # Let the cancelled attempts give their slots back before returning
+                await asyncio.wait(unfinished)
+
+    async def _send(
+        self,
+        call: str,
+        prompt: str,
+        max_output_tokens: Optional[int],
+        timing: LLMTiming,
+        rate_limited: bool = True
+    ) -> LLMResponse:
+        async with self._slot(call, timing, rate_limited):
+            sent = time.perf_counter()
+            # A cancelled attempt (the losing side of a hedge) is left out of the timings
+            try:
+                response = await asyncio.wait_for(self.backend.ainvoke(prompt, max_output_tokens), self.timeout)
+            except Exception:
+                self._observe_model_time(call, time.perf_counter() - sent, timing, ok=False)
+                raise
+            self._observe_model_time(call, time.perf_counter() - sent, timing)
+            return response
+
+    @asynccontextmanager
+    async def _slot(self, call: str, timing: LLMTiming, rate_limited: bool = True):
+        """Hold a concurrency slot and (unless hedging) a rate-limit token, timing the wait for both"""
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+            try:
+                if rate_limited:
+                    await self.bucket.acquire()
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - started
+        LLM_QUEUE_SECONDS.labels(call).observe(waited)
+        timing.queue_seconds += waited
+        timing.attempts += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def _backoff(self, call: str, attempt: int, error: Exception):
+        if not _is_retryable(error):
+            LLM_ERRORS.labels(call, type(error).__name__).inc()
+            raise error
+        if attempt >= self.max_retries:
+            LLM_ERRORS.labels(call, type(error).__name__).inc()
+            raise LLMUnavailableError(
+                f"{call} call failed after {attempt + 1} attempt(s): {type(error).__name__}: {error}"
+            ) from error
+        # Full jitter keeps a burst of failed calls from retrying in lockstep
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        LLM_RETRIES.labels(call, type(error).__name__).inc()
+        logger.warning(f"LLM {call} call failed ({type(error).__name__}: {str(error)[:80]}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    def _observe_model_time(self, call: str, seconds: float, timing: LLMTiming, ok: bool = True):
+        LLM_MODEL_SECONDS.labels(call).observe(seconds)
+        timing.model_seconds = seconds
+        # Only answers count towards the hedge delay; a timed-out attempt would drag it to the timeout
+        if ok:
+            self._model_seconds.setdefault(call, deque(maxlen=200)).append(seconds)
+
+    def _hedge_after(self, call: str) -> float:
+        recent = self._model_seconds.get(call)
+        if not recent or len(recent) < 20:
+            return self.hedge_delay
+        return float(np.percentile(recent, 95))
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in _RETRYABLE_STATUSES:
+        return True
+    name = type(error).__name__
+    return any(marker in name for marker in _RETRYABLE_ERRORS)
+
+
 class AIService:
     def __init__(self):
-        self.embedding_model: Optional[SentenceTransformer] = None
-        self.llm: Optional[ChatGoogleGenerativeAI] = None
-        self.faiss_index: Optional[faiss.Index] = None
-        self.query_metadata: List[Dict[str, Any]] = []
+        self.embeddings = EmbeddingService()
+        self.llm: Optional[LLMBackend] = None
+        self.llm_gateway = LLMGateway()
+        self.cache_store = CacheStore()
+        self.query_classifier: Optional[QueryClassifier] = None
+        self.text_splitter: Optional["RecursiveCharacterTextSplitter"] = None
+        self._validation_cache: "OrderedDict[str, bool]" = OrderedDict()
+        # (query, options, embedding, future) of every query currently running the full pipeline
+        self._inflight: List[Tuple[str, Tuple, np.ndarray, asyncio.Future]] = []
         self._initialized = False
+        # Loading now yields to the event loop, so concurrent first requests must not load twice
+        self._init_lock = asyncio.Lock()
     
     async def initialize(self):
         if self._initialized:
             return
             
-        try:
-            logger.info("Initializing AI models...")
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            logger.info(f"Loading embedding model: {settings.EMBEDDING_MODEL}")
-            self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=settings.GEMINI_API_KEY,
-                temperature=0.3
-            )
-            await self._load_faiss_index()
-            
-            self._initialized = True
-            logger.info("AI models initialized successfully")
-            
-        except Exception as e:
-            logger.error(f"Error initializing AI models: {e}")
-            raise
-    
-    async def _load_faiss_index(self):
-        try:
-            if settings.FAISS_INDEX_PATH.exists():
-                logger.info("Loading existing FAISS index...")
-                self.faiss_index = faiss.read_index(str(settings.FAISS_INDEX_PATH))
-                
-                if settings.FAISS_METADATA_PATH.exists():
-                    with open(settings.FAISS_METADATA_PATH, 'r') as f:
-                        self.query_metadata = json.load(f)
+        async with self._init_lock:
+            if self._initialized:
+                return
+            try:
+                logger.info("Initializing AI models...")
+                # Independent loads overlap: they spend their time in threads or on disk
+                await asyncio.gather(
+                    startup.run("embedding_model", self._start_embeddings),
+                    startup.run("llm", self._start_llm),
+                    startup.run("semantic_cache", self.cache_store.start),
+                    startup.run("text_splitter", self._start_text_splitter)
+                )
                 
-                logger.info(f"Loaded FAISS index with {self.faiss_index.ntotal} vectors")
-            else:
-                logger.info("Creating new FAISS index...")
-                self.faiss_index = faiss.IndexFlatIP(settings.EMBEDDING_DIMENSION)
-                self.query_metadata = []
+                self._initialized = True
+                logger.info("AI models initialized successfully")
                 
-        except Exception as e:
-            logger.error(f"Error loading FAISS index: {e}")
-            self.faiss_index = faiss.IndexFlatIP(settings.EMBEDDING_DIMENSION)
-            self.query_metadata = []
+            except Exception as e:
+                logger.error(f"Error initializing AI models: {e}")
+                raise
     
-    async def save_faiss_index(self):
-        """Save FAISS index and metadata to disk"""
-        try:
-            settings.DATA_DIR.mkdir(exist_ok=True)
-            faiss.write_index(self.faiss_index, str(settings.FAISS_INDEX_PATH))
-            with open(settings.FAISS_METADATA_PATH, 'w') as f:
-                json.dump(self.query_metadata, f, indent=2, default=str)
-                
-            logger.info("FAISS index and metadata saved successfully")
-            
-        except Exception as e:
-            logger.error(f"Error saving FAISS index: {e}")
+    async def _start_embeddings(self):
+        await self.embeddings.start()
+        if settings.VALIDATION_LOCAL_CLASSIFIER and self.query_classifier is None:
+            self.query_classifier = await asyncio.to_thread(QueryClassifier, self.embeddings.model)
+    
+    async def _start_llm(self):
+        self.llm = await asyncio.to_thread(create_llm_backend)
+        self.llm_gateway.backend = self.llm
     
-    async def validate_query(self, query: str) -> bool:
+    async def _start_text_splitter(self):
+        def create() -> "RecursiveCharacterTextSplitter":
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+        
+        self.text_splitter = await asyncio.to_thread(create)
+    
+    async def shutdown(self):
+        """Flush cache writes that are still pending"""
+        if self._initialized:
+            await self.cache_store.stop()
+        self.embeddings.stop()
+    
+    async def validate_query(self, query: str, query_embedding: Optional[np.ndarray] = None) -> bool:
         """
-        Validate if the query is a valid web search query using Gemini
+        Validate if the query is a valid web search query
+        
+        Verdicts are memoized by normalized query. Misses go to the local
+        nearest-neighbour classifier first, which only accepts clear-cut
+        queries; everything else, including every rejection, is decided by Gemini.
         
         Args:
             query: User input query
+            query_embedding: Normalized query embedding, if already computed
             
         Returns:
             bool: True if valid, False if invalid
@@ -94,194 +380,440 @@ class AIService:
         try:
             if not self._initialized:
                 await self.initialize()
+            
+            cache_key = normalize_query(query)
+            if cache_key in self._validation_cache:
+                self._validation_cache.move_to_end(cache_key)
+                VALIDATIONS.labels("cache").inc()
+                return self._validation_cache[cache_key]
                 
             logger.info(f"Validating query: {query}")
             
-            validation_prompt = f"""
-            Analyze the following user input. Is it a query that can be answered by a web search?
-            
-            Examples of VALID queries:
-            - "What is the capital of France?"
-            - "Best restaurants in Tokyo"
-            - "How to learn Python programming"
-            - "Latest news about AI"
-            - "Climate change solutions 2024"
-            - "Explain quantum computing"
+            is_valid = None
+            if self.query_classifier:
+                if query_embedding is None:
+                    query_embedding = await self.embeddings.embed(query)
+                is_valid = self.query_classifier.classify(query_embedding)
+                if is_valid is not None:
+                    VALIDATIONS.labels("local").inc()
+                    logger.info("Query validation result (local): VALID")
             
-            Examples of INVALID queries:
-            - "Walk my pet"
-            - "Add apples to grocery list"
-            - "Remind me to call mom"
-            - "Turn off the lights"
-            - "Play music"
-            - "Set a timer"
-            
-            User input: "{query}"
-            
-            Respond with only the word "VALID" or "INVALID".
-            """
-            
-            response = await asyncio.to_thread(self.llm.invoke, validation_prompt)
-            result = response.content.strip().upper()
-            
-            is_valid = result == "VALID"
-            logger.info(f"Query validation result: {result}")
+            if is_valid is None:
+                is_valid = await self._validate_with_llm(query)
+                VALIDATIONS.labels("llm").inc()
             
+            self._remember_verdict(cache_key, is_valid)
             return is_valid
             
         except Exception as e:
             logger.error(f"Error validating query: {e}")
             # Default to valid if validation fails
             return True
+    
+    async def _validate_with_llm(self, query: str) -> bool:
+        prompt = prompt_builder.validation_prompt(query)
+        logger.info(prompt.describe())
+        
+        timing = LLMTiming()
+        with span("validation"):
+            response = await self.llm_gateway.invoke("validation", prompt.text, prompt.max_output_tokens, timing)
+        self._record_usage(prompt, response, timing)
+        result = response.content.strip().upper()
+        logger.info(f"Query validation result: {result}")
+        
+        return result == "VALID"
+    
+    def _remember_verdict(self, cache_key: str, is_valid: bool):
+        self._validation_cache[cache_key] = is_valid
+        self._validation_cache.move_to_end(cache_key)
+        while len(self._validation_cache) > settings.VALIDATION_CACHE_SIZE:
+            self._validation_cache.popitem(last=False)
 
     async def process_query(
         self, 
         query: str, 
         max_results: int = 5, 
         search_engine: str = "bing",
-        use_cache: bool = True
+        use_cache: bool = True,
+        speculative: bool = False,
+        on_event: Optional[EventCallback] = None
     ) -> Tuple[str, List[SearchResult], bool]:
         """
         Process a user query and return AI-generated answer with sources
         
+        Concurrent queries within SIMILARITY_THRESHOLD of one another (when
+        `use_cache` is set) that ask for the same max_results, search_engine and
+        speculative mode run the pipeline once: later ones wait for the first
+        and return its result.
+        
+        Args:
+            on_event: Optional callback for progress events ("validated", "cache",
+                "coalesced", "source", "token") used by the streaming endpoint
+        
         Returns:
             Tuple of (answer, sources, was_cached)
         """
         if not self._initialized:
             await self.initialize()
 
-        is_valid = await self.validate_query(query)
-        if not is_valid:
-            logger.warning(f"Invalid query rejected: {query}")
-            return "This query doesn't appear to be a valid web search query. Please try asking a question that can be answered with web information.", [], False
+        with span("embedding"):
+            query_embedding = await self.embeddings.embed(query)
+        
+        if not use_cache:
+            return await self._run_pipeline(query, query_embedding, max_results, search_engine, False, speculative, on_event)
+        
+        # Single flight: a query close enough to one already running shares its result
+        # Only requests asking for the same pipeline can share a result
+        options = (max_results, search_engine.lower(), speculative)
+        leader = self._find_inflight(query_embedding, options)
+        if leader is not None:
+            leader_query, future = leader
+            COALESCED_REQUESTS.inc()
+            logger.info(f"Coalescing query with in-flight query: {query} -> {leader_query}")
+            await _emit(on_event, "coalesced", {"query": leader_query})
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader's client went away before it finished; do the work ourselves
+                logger.info(f"In-flight query was cancelled, processing independently: {query}")
+        
+        future = asyncio.get_running_loop().create_future()
+        # Followers may never show up; don't warn about an exception nobody retrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        inflight = (query, options, query_embedding, future)
+        self._inflight.append(inflight)
+        try:
+            result = await self._run_pipeline(query, query_embedding, max_results, search_engine, True, speculative, on_event)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.remove(inflight)
+    
+    async def build_cache_entry(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        max_results: int = 5,
+        search_engine: str = "bing"
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Validate, scrape and answer an already embedded query without reading
+        or writing the semantic cache, so callers can insert entries in bulk
+        
+        Returns:
+            Tuple of (status, metadata): status is "answered", "invalid",
+            "no_results" or "failed"; metadata is the cache entry when answered
+        """
+        if not self._initialized:
+            await self.initialize()
+        
+        answer, sources, _ = await self._run_pipeline(query, query_embedding, max_results, search_engine, False, False)
+        if answer == INVALID_QUERY_ANSWER:
+            return "invalid", None
+        if not sources:
+            return "no_results", None
+        if answer.startswith(settings.ERROR_MESSAGE_PREFIX):
+            return "failed", None
+        return "answered", self._cache_metadata(query, answer, sources)
+    
+    def _find_inflight(self, query_embedding: np.ndarray, options: Tuple) -> Optional[Tuple[str, asyncio.Future]]:
+        """
+        The in-flight query with the same `options` most similar to
+        `query_embedding`, if above SIMILARITY_THRESHOLD
+        """
+        candidates = [inflight for inflight in self._inflight if inflight[1] == options]
+        if not candidates:
+            return None
+        similarities = np.vstack([embedding for _, _, embedding, _ in candidates]) @ query_embedding[0]
+        best = int(np.argmax(similarities))
+        if similarities[best] <= settings.SIMILARITY_THRESHOLD:
+            return None
+        query, _, _, future = candidates[best]
+        return query, future
+    
+    async def _run_pipeline(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        max_results: int,
+        search_engine: str,
+        use_cache: bool,
+        speculative: bool,
+        on_event: Optional[EventCallback] = None
+    ) -> Tuple[str, List[SearchResult], bool]:
+        if speculative:
+            return await self._process_speculatively(
+                query, query_embedding, max_results, search_engine, use_cache, on_event
+            )
         
+        # Cached answers were validated when they were stored, so hits skip validation
         if use_cache:
-            cached_result = await self._check_cache(query)
+            cached_result = await self._lookup_cache(query, query_embedding, on_event)
             if cached_result:
                 return cached_result["answer"], cached_result["sources"], True
+
+        is_valid = await self.validate_query(query, query_embedding)
+        await _emit(on_event, "validated", {"valid": is_valid})
+        if not is_valid:
+            logger.warning(f"Invalid query rejected: {query}")
+            return INVALID_QUERY_ANSWER, [], False
+        
+        scraped_data = await self._scrape(query, max_results, search_engine, on_event)
+        return await self._answer_from_scraped(query, query_embedding, scraped_data, use_cache, on_event)
+    
+    async def _process_speculatively(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        max_results: int,
+        search_engine: str,
+        use_cache: bool,
+        on_event: Optional[EventCallback] = None
+    ) -> Tuple[str, List[SearchResult], bool]:
+        """
+        Start validation and the search scrape together with the cache lookup.
         
+        A cache hit cancels both, an INVALID verdict cancels the scrape; cancelled
+        work is counted so its cost stays visible.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        validation_task = asyncio.create_task(self.validate_query(query, query_embedding))
+        scrape_task = asyncio.create_task(self._scrape(query, max_results, search_engine, on_event))
+        
+        try:
+            if use_cache:
+                cached_result = await self._lookup_cache(query, query_embedding, on_event)
+                if cached_result:
+                    await self._cancel_speculative(started, validation=validation_task, scrape=scrape_task)
+                    return cached_result["answer"], cached_result["sources"], True
+            
+            is_valid = await validation_task
+            await _emit(on_event, "validated", {"valid": is_valid})
+            if not is_valid:
+                logger.warning(f"Invalid query rejected: {query}")
+                await self._cancel_speculative(started, scrape=scrape_task)
+                return INVALID_QUERY_ANSWER, [], False
+            
+            scraped_data = await scrape_task
+        finally:
+            for task in (validation_task, scrape_task):
+                if not task.done():
+                    task.cancel()
+        
+        return await self._answer_from_scraped(query, query_embedding, scraped_data, use_cache, on_event)
+    
+    async def _cancel_speculative(self, started: float, **tasks: asyncio.Task):
+        # cancel everything before awaiting anything, so no task gets a chance to start in between
+        pending = {name: task for name, task in tasks.items() if not task.done()}
+        for task in pending.values():
+            task.cancel()
+        await asyncio.gather(*pending.values(), return_exceptions=True)
+        
+        wasted = asyncio.get_running_loop().time() - started
+        for name in pending:
+            SPECULATIVE_CANCELLED.labels(name).inc()
+            SPECULATIVE_WASTED_SECONDS.labels(name).inc(wasted)
+        if pending:
+            logger.info(f"Cancelled speculative {', '.join(pending)} after {wasted:.3f}s")
+    
+    async def _lookup_cache(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        on_event: Optional[EventCallback] = None
+    ) -> Optional[Dict[str, Any]]:
+        with span("cache_lookup"):
+            cached_result = await self._check_cache(query, query_embedding)
+        CACHE_LOOKUPS.labels("hit" if cached_result else "miss").inc()
+        await _emit(on_event, "cache", {"hit": cached_result is not None})
+        return cached_result
+    
+    async def _scrape(
+        self,
+        query: str,
+        max_results: int,
+        search_engine: str,
+        on_event: Optional[EventCallback] = None
+    ) -> List[Tuple[str, str, Optional[str]]]:
         logger.info(f"Processing new query: {query}")
-        async with WebScraperService() as scraper:
-            scraped_data = await scraper.scrape_web_content(query, max_results, search_engine)
         
+        async def emit_source(rank: int, url: str, content: str, title: Optional[str]):
+            source = self._to_search_result(url, content, title)
+            await on_event("source", {"rank": rank, **source.dict()})
+        
+        on_result = emit_source if on_event else None
+        with span("scrape"):
+            async with WebScraperService() as scraper:
+                return await scraper.scrape_web_content(query, max_results, search_engine, on_result=on_result)
+    
+    async def _answer_from_scraped(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        scraped_data: List[Tuple[str, str, Optional[str]]],
+        use_cache: bool,
+        on_event: Optional[EventCallback] = None
+    ) -> Tuple[str, List[SearchResult], bool]:
         if not scraped_data:
-            return "I couldn't find any relevant information for your query.", [], False
+            return NO_RESULTS_ANSWER, [], False
+        
+        async def emit_token(text: str):
+            await on_event("token", {"text": text})
         
+        on_token = emit_token if on_event else None
         sources, documents = self._process_scraped_data(scraped_data)
-        answer = await self._generate_answer(query, documents)
+        answer = await self._generate_answer(query, query_embedding, documents, sources, on_token=on_token)
         
         if use_cache and not answer.startswith(settings.ERROR_MESSAGE_PREFIX):
-            await self._cache_result(query, answer, sources)
+            with span("cache_write"):
+                await self._cache_result(query, answer, sources, query_embedding)
         
         return answer, sources, False
     
-    def _process_scraped_data(self, scraped_data: List[Tuple[str, str, Optional[str]]]) -> Tuple[List[SearchResult], List[Document]]:
+    def _process_scraped_data(self, scraped_data: List[Tuple[str, str, Optional[str]]]) -> Tuple[List[SearchResult], List["Document"]]:
+        from langchain.schema import Document
+        
         sources = []
         documents = []
         
-        for url, content, title in scraped_data:
-            search_result = SearchResult(
-                url=url,
-                title=title,
-                content=content[:settings.MAX_CONTENT_LENGTH] + "..." if len(content) > settings.MAX_CONTENT_LENGTH else content
-            )
-            sources.append(search_result)
+        for i, (url, content, title) in enumerate(scraped_data):
+            sources.append(self._to_search_result(url, content, title))
             
             doc = Document(
                 page_content=content,
-                metadata={"url": url, "title": title or ""}
+                metadata={"url": url, "title": title or "", "source": i}
             )
             documents.append(doc)
         
         return sources, documents
     
-    async def _check_cache(self, query: str) -> Optional[Dict[str, Any]]:
+    def _to_search_result(self, url: str, content: str, title: Optional[str]) -> SearchResult:
+        return SearchResult(
+            url=url,
+            title=title,
+            content=content[:settings.MAX_CONTENT_LENGTH] + "..." if len(content) > settings.MAX_CONTENT_LENGTH else content
+        )
+    
+    async def _check_cache(self, query: str, query_embedding: np.ndarray) -> Optional[Dict[str, Any]]:
         try:
-            if self.faiss_index.ntotal == 0:
-                return None
-            
-            query_embedding = self.embedding_model.encode([query])
-            query_embedding = query_embedding / np.linalg.norm(query_embedding)
-            
-            similarities, indices = self.faiss_index.search(query_embedding, 1)
-            
-            if similarities[0][0] > settings.SIMILARITY_THRESHOLD:  
-                cached_idx = indices[0][0]
-                if cached_idx < len(self.query_metadata):
-                    cached_data = self.query_metadata[cached_idx]
-                    logger.info(f"Found cached result for query: {query}")
-                    return cached_data
+            cached_data = self.cache_store.lookup(query_embedding, settings.SIMILARITY_THRESHOLD)
+            if cached_data:
+                logger.info(f"Found cached result for query: {query}")
+                return cached_data
             
         except Exception as e:
             logger.error(f"Error checking cache: {e}")
         
         return None
     
-    async def _cache_result(self, query: str, answer: str, sources: List[SearchResult]):
+    async def _cache_result(self, query: str, answer: str, sources: List[SearchResult], query_embedding: np.ndarray):
         try:
-            query_embedding = self.embedding_model.encode([query])
-            query_embedding = query_embedding / np.linalg.norm(query_embedding)
-            
-            self.faiss_index.add(query_embedding)
-            
-            metadata = {
-                "query": query,
-                "answer": answer,
-                "sources": [source.dict() for source in sources],
-                "timestamp": str(asyncio.get_event_loop().time())
-            }
-            self.query_metadata.append(metadata)
-            await self.save_faiss_index()
+            self.cache_store.add(query_embedding, self._cache_metadata(query, answer, sources))
             logger.info(f"Cached result for query: {query}")
             
         except Exception as e:
             logger.error(f"Error caching result: {e}")
     
-    async def _generate_answer(self, query: str, documents: List[Document]) -> str:
+    def _cache_metadata(self, query: str, answer: str, sources: List[SearchResult]) -> Dict[str, Any]:
+        return {
+            "query": query,
+            "answer": answer,
+            "sources": [source.dict() for source in sources]
+        }
+    
+    async def _generate_answer(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        documents: List["Document"],
+        sources: List[SearchResult],
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> str:
         try:
-            split_docs = self._split_documents(documents)
-            context = self._create_context_from_documents(split_docs)
-            prompt = self._create_answer_prompt(query, context)
-            response = await self.llm.ainvoke(prompt)
-            return response.content.strip() if hasattr(response, 'content') else str(response).strip()
+            with span("text_splitting"):
+                split_docs = self._split_documents(documents)
+            with span("retrieval"):
+                context_chunks = await self._retrieve(query_embedding, split_docs, sources)
+            prompt = prompt_builder.answer_prompt(query, context_chunks)
+            logger.info(prompt.describe())
+            timing = LLMTiming()
+            with span("generation"):
+                if on_token:
+                    chunks = []
+                    async for chunk in self.llm_gateway.stream("answer", prompt.text, prompt.max_output_tokens, timing):
+                        chunks.append(chunk)
+                        await on_token(chunk)
+                    response = LLMResponse(''.join(chunks))
+                else:
+                    response = await self.llm_gateway.invoke("answer", prompt.text, prompt.max_output_tokens, timing)
+            self._record_usage(prompt, response, timing)
+            return response.content.strip()
             
+        except LLMUnavailableError as e:
+            logger.error(f"Error generating answer: {e}")
+            return f"{settings.ERROR_MESSAGE_PREFIX}: the language model is unavailable right now. Please try again shortly."
         except Exception as e:
             logger.error(f"Error generating answer: {e}")
             return f"{settings.ERROR_MESSAGE_PREFIX} while processing your query. Please try again."
     
-    def _split_documents(self, documents: List[Document]) -> List[Document]:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100
-        )
-        
+    def _split_documents(self, documents: List["Document"]) -> List["Document"]:
         split_docs = []
         for doc in documents:
-            chunks = text_splitter.split_documents([doc])
+            chunks = self.text_splitter.split_documents([doc])
             split_docs.extend(chunks)
         
-        return split_docs[:10] if len(split_docs) > 10 else split_docs
+        return split_docs
     
-    def _create_context_from_documents(self, documents: List[Document]) -> str:
-        return "\n\n".join([doc.page_content[:500] for doc in documents])
+    async def _retrieve(
+        self,
+        query_embedding: np.ndarray,
+        chunks: List["Document"],
+        sources: List[SearchResult]
+    ) -> List[ContextChunk]:
+        """
+        The chunks most similar to the query, most relevant first, as candidates
+        for the answer context; each source's relevance_score is its best chunk's score
+        """
+        if not chunks:
+            return []
+        
+        chunk_embeddings = await self.embeddings.embed_documents([chunk.page_content for chunk in chunks])
+        scores = chunk_embeddings @ query_embedding[0]
+        
+        for chunk, score in zip(chunks, scores):
+            source = sources[chunk.metadata["source"]]
+            if source.relevance_score is None or score > source.relevance_score:
+                source.relevance_score = round(float(score), 4)
+        
+        selected = select_chunks(scores, chunk_embeddings, [token_counter.count(chunk.page_content) for chunk in chunks])
+        logger.info(f"Selected {len(selected)} of {len(chunks)} chunks for the answer context")
+        return [ContextChunk(chunks[i].page_content, float(scores[i]), chunks[i].metadata["source"]) for i in selected]
     
-    def _create_answer_prompt(self, query: str, context: str) -> str:
-        """Create the prompt for answer generation"""
-        return f"""You are a helpful assistant that provides clear, accurate information based on web sources.
-
-Question: {query}
+    def _record_usage(self, prompt: BuiltPrompt, response: LLMResponse, timing: LLMTiming):
+        # Throughput is measured on model time; time queued behind the rate limit says nothing about the model
+        seconds = timing.model_seconds
+        input_tokens, output_tokens = record_llm_tokens(prompt.call, prompt.text, response, seconds)
+        token_counter.calibrate(prompt.text, response.input_tokens)
+        logger.info(
+            f"{prompt.call} call: {input_tokens} input / {output_tokens} output tokens in {seconds:.2f}s "
+            f"({output_tokens / seconds if seconds else 0.0:.0f} output tokens/s), queued {timing.queue_seconds:.2f}s, "
+            f"{timing.attempts} attempt(s){', hedged' if timing.hedged else ''}"
+        )
 
-Context from web sources:
-{context}
 
-Instructions:
-- Provide a comprehensive answer using the information from the sources
-- Write in clear, plain text without any special formatting characters like asterisks, bold markers, or markdown
-- Structure your response in easy-to-read paragraphs
-- If sources don't contain enough information, mention that limitation
-- Keep the tone conversational and informative
-- Do not use any special characters or formatting symbols in your response
+async def _emit(on_event: Optional[EventCallback], name: str, data: Dict[str, Any]):
+    if on_event:
+        await on_event(name, data)
 
-Answer:"""
 
 ai_service = AIService()
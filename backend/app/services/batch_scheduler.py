@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List
+
+from ..config import settings
+from ..models.schemas import BatchQueryResult, QueryResponse
+from ..utils.text import fold_query
+from .ai_service import ai_service
+from .metrics import REQUEST_SECONDS, start_timer
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """
+    Runs batches of queries through the normal query pipeline.
+
+    One semaphore bounds how many batch queries are in flight across every
+    batch being processed, so a few large enrichment jobs can't crowd out
+    interactive traffic. Queries that differ only in case and whitespace are
+    processed once per batch.
+    """
+
+    def __init__(self, concurrency: int = settings.BATCH_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.waiting = 0
+        self.running = 0
+
+    async def run(
+        self,
+        queries: List[str],
+        max_results: int = 5,
+        search_engine: str = "bing",
+        use_cache: bool = True
+    ) -> List[BatchQueryResult]:
+        """Process every query; results are in input order and a failed query doesn't fail the batch"""
+        distinct: Dict[str, asyncio.Task] = {}
+        tasks = []
+        for query in queries:
+            key = fold_query(query) or query
+            if key not in distinct:
+                distinct[key] = asyncio.create_task(self._schedule(query, max_results, search_engine, use_cache))
+            tasks.append(distinct[key])
+
+        try:
+            await asyncio.gather(*distinct.values())
+        finally:
+            # The client went away: drop whatever hasn't run yet
+            for task in distinct.values():
+                task.cancel()
+        logger.info(f"Batch of {len(queries)} queries ({len(distinct)} distinct) processed")
+
+        results = []
+        for query, task in zip(queries, tasks):
+            result = task.result()
+            if result.query != query:
+                # A repeat of an earlier query: same outcome, reported under its own text
+                response = result.response.copy(update={"query": query}) if result.response else None
+                result = BatchQueryResult(query=query, response=response, error=result.error)
+            results.append(result)
+        return results
+
+    async def _schedule(self, query: str, max_results: int, search_engine: str, use_cache: bool) -> BatchQueryResult:
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await self._process(query, max_results, search_engine, use_cache)
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    async def _process(self, query: str, max_results: int, search_engine: str, use_cache: bool) -> BatchQueryResult:
+        start_time = time.time()
+        timer = start_timer()
+        try:
+            answer, sources, cached = await ai_service.process_query(
+                query=query,
+                max_results=max_results,
+                search_engine=search_engine,
+                use_cache=use_cache
+            )
+        except Exception as e:
+            logger.error(f"Error processing batch query: {e}")
+            return BatchQueryResult(query=query, error=f"Query processing failed: {str(e)}")
+
+        processing_time = time.time() - start_time
+        REQUEST_SECONDS.labels(str(cached).lower()).observe(processing_time)
+        return BatchQueryResult(
+            query=query,
+            response=QueryResponse(
+                query=query,
+                answer=answer,
+                sources=sources,
+                cached=cached,
+                processing_time=processing_time,
+                timings=timer.timings
+            )
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {"concurrency": self.concurrency, "running": self.running, "waiting": self.waiting}
+
+
+batch_scheduler = BatchScheduler()
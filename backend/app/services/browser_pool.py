@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledBrowser:
+    """A launched Chromium instance plus the bookkeeping the pool needs to recycle it"""
+
+    def __init__(self, browser: Browser, slot: int):
+        self.browser = browser
+        self.slot = slot
+        self.pages_served = 0
+        self.active_contexts = 0
+        self.retiring = False
+        self.launched_at = time.monotonic()
+
+    @property
+    def healthy(self) -> bool:
+        return self.browser.is_connected() and not self.retiring
+
+
+class BrowserPool:
+    """
+    Long-lived pool of headless Chromium browsers shared by all requests.
+
+    Browsers are launched once and hand out isolated contexts per request.
+    A browser is retired after serving `max_pages_per_browser` pages (or when
+    it disconnects) and replaced by a fresh launch once its last context closes.
+    """
+
+    def __init__(
+        self,
+        size: int = settings.BROWSER_POOL_SIZE,
+        max_pages_per_browser: int = settings.BROWSER_MAX_PAGES,
+        health_check_interval: float = settings.BROWSER_HEALTH_CHECK_INTERVAL
+    ):
+        self.size = max(1, size)
+        self.max_pages_per_browser = max_pages_per_browser
+        self.health_check_interval = health_check_interval
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[Optional[_PooledBrowser]] = []
+        self._lock = asyncio.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+        self._started = False
+        self.browsers_launched = 0
+        self.browsers_recycled = 0
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self):
+        async with self._lock:
+            if self._started:
+                return
+
+            logger.info(f"Starting browser pool with {self.size} browser(s)...")
+            self._playwright = await async_playwright().start()
+            self._browsers = [None] * self.size
+            for slot in range(self.size):
+                self._browsers[slot] = await self._launch(slot)
+
+            if self.health_check_interval > 0:
+                self._health_task = asyncio.create_task(self._health_loop())
+            self._started = True
+            logger.info("Browser pool started")
+
+    async def stop(self):
+        async with self._lock:
+            if not self._started:
+                return
+
+            logger.info("Stopping browser pool...")
+            if self._health_task:
+                self._health_task.cancel()
+                try:
+                    await self._health_task
+                except asyncio.CancelledError:
+                    pass
+                self._health_task = None
+
+            for pooled in self._browsers:
+                if pooled:
+                    await self._close(pooled)
+            self._browsers = []
+
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+            self._started = False
+            logger.info("Browser pool stopped")
+
+    @asynccontextmanager
+    async def context(self) -> AsyncIterator[BrowserContext]:
+        """Borrow a fresh, isolated browser context for the duration of the block"""
+        if not self._started:
+            await self.start()
+
+        pooled = await self._acquire()
+        context = None
+        try:
+            context = await pooled.browser.new_context()
+            context.on("page", lambda _page: self._count_page(pooled))
+            yield context
+        finally:
+            if context:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.warning(f"Error closing browser context: {e}")
+            await self._release(pooled)
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        """Borrow a single page in its own context"""
+        async with self.context() as context:
+            page = await context.new_page()
+            yield page
+
+    async def warmup(self):
+        """Open a blank page on every browser so the first request doesn't pay for the first page"""
+        async def open_blank():
+            async with self.page() as page:
+                await page.goto("about:blank")
+
+        await asyncio.gather(*(open_blank() for _ in range(self.size)))
+
+    async def health_check(self) -> int:
+        """
+        Replace disconnected browsers and retire idle ones that are due for recycling
+
+        Returns:
+            int: Number of browsers replaced
+        """
+        replaced = 0
+        async with self._lock:
+            for slot, pooled in enumerate(self._browsers):
+                if pooled is None:
+                    self._browsers[slot] = await self._launch(slot)
+                    replaced += 1
+                elif not pooled.browser.is_connected():
+                    logger.warning(f"Browser in slot {slot} disconnected, relaunching")
+                    self._browsers[slot] = await self._launch(slot)
+                    replaced += 1
+                elif pooled.retiring and pooled.active_contexts == 0:
+                    await self._close(pooled)
+                    self._browsers[slot] = await self._launch(slot)
+                    self.browsers_recycled += 1
+                    replaced += 1
+        return replaced
+
+    def stats(self):
+        return {
+            "pool_size": self.size,
+            "started": self._started,
+            "browsers_launched": self.browsers_launched,
+            "browsers_recycled": self.browsers_recycled,
+            "browsers": [
+                {
+                    "slot": pooled.slot,
+                    "connected": pooled.browser.is_connected(),
+                    "pages_served": pooled.pages_served,
+                    "active_contexts": pooled.active_contexts,
+                    "retiring": pooled.retiring
+                }
+                for pooled in self._browsers if pooled
+            ]
+        }
+
+    async def _acquire(self) -> _PooledBrowser:
+        async with self._lock:
+            for slot, pooled in enumerate(self._browsers):
+                if pooled is None or not pooled.browser.is_connected():
+                    if pooled is not None:
+                        logger.warning(f"Browser in slot {slot} disconnected, relaunching")
+                    self._browsers[slot] = await self._launch(slot)
+                elif pooled.retiring and pooled.active_contexts == 0:
+                    await self._close(pooled)
+                    self._browsers[slot] = await self._launch(slot)
+                    self.browsers_recycled += 1
+
+            candidates = [pooled for pooled in self._browsers if pooled.healthy]
+            if not candidates:
+                # Every browser is retiring with contexts still open; spread load over them
+                candidates = list(self._browsers)
+
+            pooled = min(candidates, key=lambda b: b.active_contexts)
+            pooled.active_contexts += 1
+            return pooled
+
+    async def _release(self, pooled: _PooledBrowser):
+        async with self._lock:
+            pooled.active_contexts -= 1
+            if pooled.retiring and pooled.active_contexts == 0 and pooled in self._browsers:
+                await self._close(pooled)
+                self._browsers[pooled.slot] = await self._launch(pooled.slot)
+                self.browsers_recycled += 1
+
+    def _count_page(self, pooled: _PooledBrowser):
+        pooled.pages_served += 1
+        if self.max_pages_per_browser and pooled.pages_served >= self.max_pages_per_browser:
+            if not pooled.retiring:
+                logger.info(f"Browser in slot {pooled.slot} served {pooled.pages_served} pages, scheduling recycle")
+            pooled.retiring = True
+
+    async def _launch(self, slot: int) -> _PooledBrowser:
+        browser = await self._playwright.chromium.launch(headless=True)
+        self.browsers_launched += 1
+        return _PooledBrowser(browser, slot)
+
+    async def _close(self, pooled: _PooledBrowser):
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser in slot {pooled.slot}: {e}")
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                replaced = await self.health_check()
+                if replaced:
+                    logger.info(f"Browser pool health check replaced {replaced} browser(s)")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Browser pool health check failed: {e}")
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,870 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import re
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, every worker acts as the owner
+    fcntl = None
+
+from ..config import settings
+from .metadata_store import USAGE_FIELDS, MetadataStore
+from .metrics import CACHE_REMOVALS
+from .vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Every WAL record is <payload length><crc32 of payload> followed by the payload:
+# <op><entry id>, then for adds the float32 vector (older logs follow it with the JSON metadata)
+_RECORD_HEADER = struct.Struct("<II")
+_OP_HEADER = struct.Struct("<cq")
+_OP_ADD = b"A"
+_OP_REMOVE = b"R"
+# Only in the inbox: a hit on a reader worker, for the owner's LRU/LFU bookkeeping
+_OP_TOUCH = b"T"
+_WAL_NAME = re.compile(r"cache_wal\.(\d+)\.log$")
+_LOCK_NAME = "cache.lock"
+_INBOX_NAME = "cache_inbox.log"
+
+# A log record as (op, entry id, rest of the payload)
+LogRecord = Tuple[bytes, int, bytes]
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+# Evict down to this share of the budget so eviction runs in batches, not on every insert
+_EVICTION_LOW_WATERMARK = 0.95
+
+
+class CacheStore:
+    """
+    Storage, expiry and eviction for the semantic cache's FAISS index and metadata.
+
+    Entries get stable ids shared by the index and the metadata. They expire
+    `ttl` seconds after they were cached (checked on lookup and by a periodic
+    sweep), and once the cache exceeds `max_entries` or `max_bytes` the least
+    recently ("lru") or least frequently ("lfu") used entries are evicted.
+
+    Answers and sources live in a SQLite `MetadataStore`; memory only holds each
+    entry's timestamps, hit count and size, and a hit reads its one row.
+
+    The vectors on disk are a snapshot of the index (written by compaction) plus
+    append-only write-ahead logs of the adds and removals since. A manifest
+    names the current snapshot generation; it is replaced atomically, so a crash
+    at any point leaves either the old or the new snapshot in effect, and the
+    logs of that generation and later are replayed on startup. Vectors and rows
+    that do not match up after a crash are dropped on load.
+
+    Changes are applied in memory immediately and written out in batches by a
+    background task (log records first, then one SQLite transaction), so
+    inserts never touch the disk on the event loop. Once the log holds
+    `compact_threshold` records it is rotated and the index is written out as
+    the next snapshot in a worker thread.
+
+    Several processes (uvicorn workers) can share one cache directory. The one
+    holding an exclusive lock on `cache.lock` is the owner and the only writer
+    of the logs, snapshots and metadata store. The others are readers: they
+    load the same snapshot, tail the owner's log every `flush_interval` to pick
+    up its adds and removals, reload when it compacts into a new generation,
+    and read answers from the metadata store read-only. Their new entries and
+    hits go to the owner through a locked inbox file. Expiry, eviction and
+    compaction only run on the owner, and when it exits a reader takes the lock
+    over and becomes the owner.
+    """
+
+    def __init__(
+        self,
+        directory: Path = settings.DATA_DIR,
+        dimension: int = settings.EMBEDDING_DIMENSION,
+        flush_interval: float = settings.CACHE_FLUSH_INTERVAL,
+        flush_batch: int = settings.CACHE_FLUSH_BATCH,
+        compact_threshold: int = settings.CACHE_COMPACT_THRESHOLD,
+        ttl: float = settings.CACHE_TTL,
+        max_entries: int = settings.CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.CACHE_MAX_BYTES,
+        eviction_policy: str = settings.CACHE_EVICTION_POLICY,
+        sweep_interval: float = settings.CACHE_SWEEP_INTERVAL,
+        metadata_store: Optional[MetadataStore] = None
+    ):
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown cache eviction policy '{eviction_policy}', expected one of {EVICTION_POLICIES}")
+
+        self.directory = directory
+        self.dimension = dimension
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.compact_threshold = compact_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction_policy = eviction_policy
+        self.sweep_interval = sweep_interval
+
+        self.index: Optional[VectorIndex] = None
+        self.metadata_store = metadata_store or MetadataStore(directory / settings.CACHE_METADATA_PATH.name)
+        # Entry id -> usage (id, timestamp, last_accessed, hits), in creation order
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        # Metadata of entries not yet written to the store, and row changes since the last flush
+        self._unflushed: Dict[int, Tuple[Dict[str, Any], int]] = {}
+        self._removed_rows: List[int] = []
+        self._touched: Set[int] = set()
+        self._recency: "OrderedDict[int, None]" = OrderedDict()
+        self._sizes: Dict[int, int] = {}
+        self._bytes = 0
+        self._next_id = 0
+        self._counts = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+        self.owner = False
+        self._loading = False
+        self._lock_file = None
+        # Records for the owner's inbox (reader adds and hits)
+        self._outbox: List[bytes] = []
+        # How far a reader has followed the owner's log
+        self._wal_offset = 0
+
+        self._generation = 0
+        self._wal_generation = 0
+        self._wal_file = None
+        self._wal_records = 0
+        self._pending: List[bytes] = []
+        self._compacting = False
+        self._last_compaction_seconds: Optional[float] = None
+        self._last_sweep = 0.0
+        self._flush_lock = asyncio.Lock()
+        self._flush_wanted = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._compaction_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / "cache_manifest.json"
+
+    @property
+    def inbox_path(self) -> Path:
+        return self.directory / _INBOX_NAME
+
+    async def start(self):
+        """Load the cache as its owner or as a reader and start the background flusher"""
+        if self._flush_task:
+            return
+        self._loading = True
+        try:
+            if self._acquire_ownership():
+                await asyncio.to_thread(self._load)
+                self.owner = True
+                self.sweep_expired()
+                self._enforce_budget()
+            else:
+                self.metadata_store.read_only = True
+                self._install_replica(await asyncio.to_thread(self._read_replica))
+                logger.info(
+                    f"Following the semantic cache owned by another process "
+                    f"(generation {self._generation}, {len(self.entries)} entries)"
+                )
+        finally:
+            self._loading = False
+        self.index.maybe_migrate()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Flush everything still pending and close the log"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        if self._compaction_task:
+            await asyncio.gather(self._compaction_task, return_exceptions=True)
+        await self.index.wait_for_migration()
+        await self.flush()
+        if self._wal_file:
+            self._wal_file.close()
+            self._wal_file = None
+        self.metadata_store.close()
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+        self.owner = False
+
+    def lookup(self, query_embedding: np.ndarray, threshold: float) -> Optional[Dict[str, Any]]:
+        """Metadata of the closest live entry above `threshold`, or None"""
+        entry = payload = None
+        if self.index.ntotal and not self._loading:
+            similarities, ids = self.index.search(query_embedding, 1)
+            entry_id = int(ids[0][0])
+            if similarities[0][0] > threshold and entry_id in self.entries:
+                entry = self.entries[entry_id]
+                if self._is_expired(entry, time.time()):
+                    self.remove([entry_id], "expired")
+                else:
+                    payload = self._payload(entry_id)
+
+        if payload is None:
+            self._counts["misses"] += 1
+            return None
+
+        self._counts["hits"] += 1
+        self._touch(entry)
+        if not self.owner:
+            self._forward(_OP_HEADER.pack(_OP_TOUCH, entry["id"]))
+        return {**payload, **entry}
+
+    def add(self, vector: np.ndarray, metadata: Dict[str, Any]) -> Optional[int]:
+        """
+        Add one entry; it is searchable at once and durable after the next flush.
+        Readers forward it to the owner instead and return None; it shows up
+        once they follow the owner's log.
+        """
+        return self.add_many(vector, [metadata])[0]
+
+    def add_many(self, vectors: np.ndarray, metadatas: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """Add entries like `add`, with a single index insert and budget check for all of them"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if not self.owner or self._loading:
+            for vector, metadata in zip(vectors, metadatas):
+                self._forward(
+                    _OP_HEADER.pack(_OP_ADD, -1) + vector.tobytes() + json.dumps(metadata, default=str).encode("utf-8")
+                )
+            return [None] * len(metadatas)
+
+        ids = list(range(self._next_id, self._next_id + len(metadatas)))
+        self._next_id += len(metadatas)
+        now = time.time()
+        for entry_id, vector, metadata in zip(ids, vectors, metadatas):
+            entry = {"id": entry_id, "timestamp": now, "last_accessed": now, "hits": 0}
+            metadata = {k: v for k, v in metadata.items() if k not in USAGE_FIELDS}
+            size = vector.nbytes + len(json.dumps(metadata, default=str))
+            self._track(entry, size)
+            self._unflushed[entry_id] = (metadata, size)
+            self._append(self._encode_add(entry_id, vector))
+        self.index.add(vectors, np.array(ids))
+
+        self._enforce_budget()
+        self.index.maybe_migrate()
+        return ids
+
+    def covered(self, vectors: np.ndarray, threshold: float) -> np.ndarray:
+        """
+        Whether each vector already has a live entry above `threshold`, as one
+        batched search; unlike `lookup` it counts no hits and touches nothing
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if not self.index.ntotal or not len(vectors):
+            return np.zeros(len(vectors), dtype=bool)
+        similarities, ids = self.index.search(vectors, 1)
+        return np.array([
+            similarity > threshold and int(entry_id) in self.entries
+            for similarity, entry_id in zip(similarities[:, 0], ids[:, 0])
+        ], dtype=bool)
+
+    def remove(self, ids: Iterable[int], reason: str):
+        """Drop entries from the index and metadata ("expired" or "evicted"); readers leave that to the owner"""
+        if not self.owner:
+            return
+        removed = [entry_id for entry_id in ids if entry_id in self.entries]
+        if not removed:
+            return
+        for entry_id in removed:
+            self._untrack(entry_id)
+            self._touched.discard(entry_id)
+            # Also delete the row if it is being written right now
+            self._unflushed.pop(entry_id, None)
+            self._removed_rows.append(entry_id)
+            self._append(self._encode_remove(entry_id))
+        self.index.remove(removed)
+
+        self._counts[reason] += len(removed)
+        CACHE_REMOVALS.labels(reason).inc(len(removed))
+
+    def sweep_expired(self):
+        """Remove every entry past its TTL; the oldest entries come first in `entries`"""
+        self._last_sweep = time.time()
+        if self.ttl <= 0 or not self.owner:
+            return
+        expired = []
+        for entry_id, entry in self.entries.items():
+            if not self._is_expired(entry, self._last_sweep):
+                break
+            expired.append(entry_id)
+        if expired:
+            self.remove(expired, "expired")
+            logger.info(f"Expired {len(expired)} semantic cache entries")
+
+    async def flush(self):
+        """Append pending records to the write-ahead log and commit the metadata changes"""
+        async with self._flush_lock:
+            if self._outbox:
+                records, self._outbox = self._outbox, []
+                await asyncio.to_thread(self._write_inbox, records)
+            await self._flush_locked()
+
+        if self._wal_records >= self.compact_threshold and self._can_compact():
+            self._compaction_task = asyncio.create_task(self.compact())
+
+    async def compact(self):
+        """Write the current state as a new snapshot and drop the logs it covers"""
+        if not self._can_compact():
+            return
+        self._compacting = True
+        started = time.perf_counter()
+        try:
+            async with self._flush_lock:
+                # Every vector in the snapshot has its row committed before the old logs go
+                await self._flush_locked()
+                generation = self._wal_generation + 1
+                await asyncio.to_thread(self._open_wal, generation)
+                self._wal_records = 0
+                # Changes from here on are in the new log; the snapshot thread reads a frozen index
+                self.index.freeze()
+                entries = len(self.entries)
+
+            await asyncio.to_thread(self._write_snapshot, generation)
+            self._last_compaction_seconds = time.perf_counter() - started
+            logger.info(
+                f"Compacted semantic cache into generation {generation} "
+                f"({entries} entries, {self._last_compaction_seconds:.2f}s)"
+            )
+        except Exception as e:
+            logger.error(f"Error compacting semantic cache: {e}")
+        finally:
+            self.index.thaw()
+            self._compacting = False
+            self.index.maybe_migrate()
+
+    def usage_stats(self) -> Dict[str, Any]:
+        lookups = self._counts["hits"] + self._counts["misses"]
+        return {
+            **self._counts,
+            "hit_rate": self._counts["hits"] / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "bytes": self._bytes,
+            "ttl_seconds": self.ttl,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "eviction_policy": self.eviction_policy
+        }
+
+    def persistence_stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self._generation,
+            "wal_generation": self._wal_generation,
+            "wal_records": self._wal_records,
+            "pending_writes": len(self._pending),
+            "compacting": self._compacting,
+            "last_compaction_seconds": self._last_compaction_seconds,
+            "role": "owner" if self.owner else "reader",
+            "metadata": self.metadata_store.stats()
+        }
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wanted.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wanted.clear()
+            try:
+                if not self.owner:
+                    await self.flush()
+                    if self._acquire_ownership():
+                        await self._promote()
+                    else:
+                        await self._follow()
+                    continue
+                await self._drain_inbox()
+                if time.time() - self._last_sweep >= self.sweep_interval:
+                    self.sweep_expired()
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing semantic cache log: {e}")
+
+    def _acquire_ownership(self) -> bool:
+        if fcntl is None:
+            return True
+        if self._lock_file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._lock_file = open(self.directory / _LOCK_NAME, 'a')
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    async def _promote(self):
+        """Take over from an owner that exited: reload everything as the writer"""
+        self._loading = True
+        try:
+            self.metadata_store.close()
+            self.metadata_store.read_only = False
+            self.entries, self._recency, self._sizes, self._bytes = {}, OrderedDict(), {}, 0
+            await asyncio.to_thread(self._load)
+            self.owner = True
+        finally:
+            self._loading = False
+        logger.info(f"Took over as the semantic cache owner ({len(self.entries)} entries)")
+        self.sweep_expired()
+        self._enforce_budget()
+        self.index.maybe_migrate()
+
+    async def _follow(self):
+        """Apply the owner's new log records, or reload after it compacted"""
+        manifest = await asyncio.to_thread(self._read_manifest)
+        if manifest["generation"] != self._generation:
+            self._install_replica(await asyncio.to_thread(self._read_replica))
+            self.index.maybe_migrate()
+            return
+
+        records, self._wal_generation, self._wal_offset = await asyncio.to_thread(
+            self._read_wal_tail, self._wal_generation, self._wal_offset
+        )
+        if not records:
+            return
+        added, removed = self._apply_records(self.index, records)
+        for entry_id in removed:
+            if entry_id in self.entries:
+                self._untrack(entry_id)
+        now = time.time()
+        for entry_id in added:
+            self._track({"id": entry_id, "timestamp": now, "last_accessed": now, "hits": 0}, self.dimension * 4)
+        self.index.maybe_migrate()
+
+    async def _drain_inbox(self):
+        """Owner: apply the adds and hits forwarded by readers"""
+        data = await asyncio.to_thread(self._take_inbox)
+        if not data:
+            return
+        records, _ = self._parse_log(data)
+        vector_bytes = self.dimension * 4
+        for op, entry_id, body in records:
+            if op == _OP_ADD:
+                self.add(
+                    np.frombuffer(body[:vector_bytes], dtype=np.float32),
+                    json.loads(body[vector_bytes:].decode("utf-8"))
+                )
+            elif op == _OP_TOUCH and entry_id in self.entries:
+                self._touch(self.entries[entry_id])
+
+    async def _flush_locked(self):
+        if not self._wal_file:
+            return
+        if not (self._pending or self._unflushed or self._removed_rows or self._touched):
+            return
+        records, self._pending = self._pending, []
+        added = [
+            ({**metadata, **self.entries[entry_id]}, size)
+            for entry_id, (metadata, size) in self._unflushed.items()
+        ]
+        removed, self._removed_rows = self._removed_rows, []
+        touched = [
+            (self.entries[entry_id]["hits"], self.entries[entry_id]["last_accessed"], entry_id)
+            for entry_id in self._touched if entry_id in self.entries
+        ]
+        self._touched = set()
+
+        await asyncio.to_thread(self._write_batch, records, added, removed, touched, self._next_id)
+        # Until now hits on these entries were served from `_unflushed`
+        for entry, _ in added:
+            self._unflushed.pop(entry["id"], None)
+        self._wal_records += len(records)
+
+    def _write_batch(
+        self,
+        records: List[bytes],
+        added: List[Tuple[Dict[str, Any], int]],
+        removed: List[int],
+        touched: List[Tuple[int, float, int]],
+        next_id: int
+    ):
+        # Log first: a vector without a row is dropped on load, a row without a vector too
+        if records:
+            self._write_records(records)
+        self.metadata_store.write(added, removed, touched, next_id)
+
+    def _touch(self, entry: Dict[str, Any]):
+        entry["hits"] += 1
+        entry["last_accessed"] = time.time()
+        self._recency.move_to_end(entry["id"])
+        if self.owner:
+            self._touched.add(entry["id"])
+
+    def _forward(self, payload: bytes):
+        self._outbox.append(self._frame(payload))
+        if len(self._outbox) >= self.flush_batch:
+            self._flush_wanted.set()
+
+    def _payload(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        pending = self._unflushed.get(entry_id)
+        if pending:
+            return pending[0]
+        return self.metadata_store.get(entry_id)
+
+    def _can_compact(self) -> bool:
+        return not self._compacting and not self.index.migrating and not self.index.frozen
+
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return self.ttl > 0 and now - entry["timestamp"] > self.ttl
+
+    def _track(self, entry: Dict[str, Any], size: int):
+        self.entries[entry["id"]] = entry
+        self._recency[entry["id"]] = None
+        self._sizes[entry["id"]] = size
+        self._bytes += size
+
+    def _untrack(self, entry_id: int):
+        del self.entries[entry_id]
+        self._recency.pop(entry_id, None)
+        self._bytes -= self._sizes.pop(entry_id, 0)
+
+    def _append(self, record: bytes):
+        self._pending.append(record)
+        if len(self._pending) >= self.flush_batch:
+            self._flush_wanted.set()
+
+    def _over_budget(self, entries: int, size: int) -> bool:
+        if not self.owner:
+            return False
+        return (self.max_entries > 0 and entries > self.max_entries) or (self.max_bytes > 0 and size > self.max_bytes)
+
+    def _enforce_budget(self):
+        if not self._over_budget(len(self.entries), self._bytes):
+            return
+
+        target_entries = int(self.max_entries * _EVICTION_LOW_WATERMARK) if self.max_entries > 0 else None
+        target_bytes = int(self.max_bytes * _EVICTION_LOW_WATERMARK) if self.max_bytes > 0 else None
+        if self.eviction_policy == "lru":
+            candidates = iter(self._recency)
+        else:
+            excess = len(self.entries) - (target_entries if target_entries is not None else len(self.entries))
+            # Byte budgets can need more victims than the entry excess; take a generous batch
+            batch = max(excess, len(self.entries) // 20, 1)
+            candidates = (
+                entry["id"] for entry in
+                heapq.nsmallest(batch, self.entries.values(), key=lambda e: (e["hits"], e["last_accessed"]))
+            )
+
+        victims, entries, size = [], len(self.entries), self._bytes
+        for entry_id in candidates:
+            if (target_entries is None or entries <= target_entries) and (target_bytes is None or size <= target_bytes):
+                break
+            victims.append(entry_id)
+            entries -= 1
+            size -= self._sizes.get(entry_id, 0)
+
+        if victims:
+            self.remove(victims, "evicted")
+            logger.info(f"Evicted {len(victims)} semantic cache entries ({self.eviction_policy})")
+
+    def _load(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.metadata_store.open()
+        manifest = self._read_manifest()
+        self._generation = manifest["generation"]
+
+        index_path = self.directory / manifest["index"]
+        if index_path.exists():
+            self.index = VectorIndex(faiss.read_index(str(index_path)), self.dimension)
+        else:
+            self.index = VectorIndex(dimension=self.dimension)
+
+        # Snapshots and logs written before the metadata store carry the metadata as JSON
+        imported: Dict[int, Tuple[Dict[str, Any], int]] = {}
+        legacy_metadata = self.directory / manifest["metadata"] if "metadata" in manifest else None
+        if legacy_metadata and legacy_metadata.exists() and index_path.exists():
+            with open(legacy_metadata, 'r') as f:
+                imported.update(self._snapshot_entries(json.load(f)))
+
+        wal_generations = sorted(gen for gen in self._wal_generations() if gen >= self._generation)
+        replayed = 0
+        for gen in wal_generations:
+            replayed += self._replay(self._wal_path(gen), imported, truncate=gen == wal_generations[-1])
+        # Later starts replay the same old logs; rows already imported may have been used since
+        imported = {entry_id: row for entry_id, row in imported.items() if not self.metadata_store.contains(entry_id)}
+        if imported:
+            self.metadata_store.write(imported.values())
+            logger.info(f"Imported {len(imported)} semantic cache entries into {self.metadata_store.path.name}")
+        if legacy_metadata:
+            self._write_manifest(self._generation, manifest["index"])
+
+        # Drop vectors and rows without a counterpart, e.g. after a crash between the log and the store
+        vector_ids = self.index.live_ids()
+        usage = self.metadata_store.usage()
+        row_ids = {row[0] for row in usage}
+        orphan_vectors = vector_ids - row_ids
+        if orphan_vectors:
+            logger.warning(f"Removing {len(orphan_vectors)} cache vectors without metadata")
+            self.index.remove(orphan_vectors)
+        orphan_rows = row_ids - vector_ids
+        if orphan_rows:
+            logger.warning(f"Removing {len(orphan_rows)} cache metadata rows without vectors")
+            self.metadata_store.write(removed=orphan_rows)
+
+        for entry_id, timestamp, last_accessed, hits, size in usage:
+            if entry_id in vector_ids:
+                entry = {"id": entry_id, "timestamp": timestamp, "last_accessed": last_accessed, "hits": hits}
+                self._track(entry, size)
+        self._next_id = max([self.metadata_store.next_id(), *(entry_id + 1 for entry_id in vector_ids | row_ids)])
+
+        self._open_wal(wal_generations[-1] if wal_generations else self._generation)
+        self._wal_records = replayed
+        self._remove_stale_files()
+        logger.info(
+            f"Loaded semantic cache generation {self._generation} with {len(self.entries)} entries "
+            f"({replayed} log records replayed)"
+        )
+
+    def _snapshot_entries(self, snapshot: Any) -> Dict[int, Tuple[Dict[str, Any], int]]:
+        """(entry, size) by id from a JSON metadata snapshot"""
+        if isinstance(snapshot, dict):
+            entries = snapshot["entries"]
+        else:
+            # Original format: a list aligned with index positions and event-loop timestamps
+            now = time.time()
+            entries = [
+                {**entry, "id": position, "timestamp": now, "last_accessed": now, "hits": 0}
+                for position, entry in enumerate(snapshot)
+            ]
+        vector_bytes = self.dimension * 4
+        return {entry["id"]: (entry, len(json.dumps(entry, default=str)) + vector_bytes) for entry in entries}
+
+    def _replay(self, path: Path, imported: Dict[int, Tuple[Dict[str, Any], int]], truncate: bool) -> int:
+        """Apply a log's records to the index, stopping at the first torn or corrupt one"""
+        data = path.read_bytes()
+        records, offset = self._parse_log(data)
+        if offset < len(data):
+            logger.warning(f"Discarding {len(data) - offset} trailing bytes of incomplete records in {path.name}")
+            if truncate:
+                with open(path, 'r+b') as f:
+                    f.truncate(offset)
+
+        vector_bytes = self.dimension * 4
+        for op, entry_id, body in records:
+            if op == _OP_ADD and len(body) > vector_bytes:
+                imported[entry_id] = (json.loads(body[vector_bytes:].decode("utf-8")), _OP_HEADER.size + len(body))
+            elif op == _OP_REMOVE:
+                imported.pop(entry_id, None)
+        self._apply_records(self.index, records)
+        return len(records)
+
+    def _apply_records(self, index: VectorIndex, records: List[LogRecord]) -> Tuple[List[int], List[int]]:
+        """Apply adds and removes to `index`; returns the ids added and the ids removed"""
+        vector_bytes = self.dimension * 4
+        added: Dict[int, np.ndarray] = {}
+        removed = []
+        for op, entry_id, body in records:
+            if op == _OP_ADD:
+                added[entry_id] = np.frombuffer(body[:vector_bytes], dtype=np.float32).reshape(1, self.dimension)
+            elif op == _OP_REMOVE and added.pop(entry_id, None) is None:
+                removed.append(entry_id)
+
+        if removed:
+            present = index.live_ids()
+            removed = [entry_id for entry_id in removed if entry_id in present]
+            index.remove(removed)
+        if added:
+            index.add(np.vstack(list(added.values())), np.fromiter(added, dtype=np.int64))
+        return list(added), removed
+
+    @staticmethod
+    def _parse_log(data: bytes) -> Tuple[List[LogRecord], int]:
+        """Records up to the first torn or corrupt one, and the offset where they end"""
+        records = []
+        offset = 0
+        while offset + _RECORD_HEADER.size <= len(data):
+            length, crc = _RECORD_HEADER.unpack_from(data, offset)
+            start = offset + _RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc or length < _OP_HEADER.size:
+                break
+            op, entry_id = _OP_HEADER.unpack_from(payload)
+            records.append((op, entry_id, payload[_OP_HEADER.size:]))
+            offset = start + length
+        return records, offset
+
+    def _read_replica(self) -> Dict[str, Any]:
+        """Reader: load the owner's current snapshot and logs into a new index, in a worker thread"""
+        manifest = self._read_manifest()
+        index_path = self.directory / manifest["index"]
+        if index_path.exists():
+            index = VectorIndex(faiss.read_index(str(index_path)), self.dimension)
+        else:
+            index = VectorIndex(dimension=self.dimension)
+
+        generation = manifest["generation"]
+        records, wal_generation, wal_offset = self._read_wal_tail(generation, 0)
+        self._apply_records(index, records)
+
+        live = index.live_ids()
+        entries: Dict[int, Dict[str, Any]] = {}
+        sizes: Dict[int, int] = {}
+        for entry_id, timestamp, last_accessed, hits, size in self.metadata_store.usage():
+            if entry_id in live:
+                entries[entry_id] = {"id": entry_id, "timestamp": timestamp, "last_accessed": last_accessed, "hits": hits}
+                sizes[entry_id] = size
+        # Vectors whose rows the owner has not committed yet
+        now = time.time()
+        for entry_id in sorted(live - set(entries)):
+            entries[entry_id] = {"id": entry_id, "timestamp": now, "last_accessed": now, "hits": 0}
+            sizes[entry_id] = self.dimension * 4
+        return {
+            "index": index,
+            "generation": generation,
+            "wal_generation": wal_generation,
+            "wal_offset": wal_offset,
+            "entries": entries,
+            "sizes": sizes
+        }
+
+    def _install_replica(self, replica: Dict[str, Any]):
+        self.index = replica["index"]
+        self._generation = replica["generation"]
+        self._wal_generation = replica["wal_generation"]
+        self._wal_offset = replica["wal_offset"]
+        self.entries = replica["entries"]
+        self._sizes = replica["sizes"]
+        self._bytes = sum(self._sizes.values())
+        self._recency = OrderedDict(
+            (entry["id"], None) for entry in sorted(self.entries.values(), key=lambda e: e["last_accessed"])
+        )
+
+    def _read_wal_tail(self, generation: int, offset: int) -> Tuple[List[LogRecord], int, int]:
+        """Reader: complete records from `offset` of log `generation` on, moving to newer logs once it is done"""
+        records: List[LogRecord] = []
+        while True:
+            try:
+                with open(self._wal_path(generation), 'rb') as f:
+                    f.seek(offset)
+                    data = f.read()
+            except FileNotFoundError:
+                data = b''
+            parsed, end = self._parse_log(data)
+            records.extend(parsed)
+            offset += end
+            newer = [gen for gen in self._wal_generations() if gen > generation]
+            # The owner only starts a new log after everything before it is written, so a
+            # torn tail with a newer log present is left over from a crash
+            if not newer:
+                return records, generation, offset
+            generation, offset = min(newer), 0
+
+    def _write_inbox(self, records: List[bytes]):
+        with open(self.inbox_path, 'ab') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            f.write(b''.join(records))
+            f.flush()
+
+    def _take_inbox(self) -> bytes:
+        if not self.inbox_path.exists():
+            return b''
+        with open(self.inbox_path, 'r+b') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            data = f.read()
+            if data:
+                f.truncate(0)
+        return data
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        # No manifest yet: the legacy single-file index is generation 0
+        return {
+            "generation": 0,
+            "index": settings.FAISS_INDEX_PATH.name,
+            "metadata": settings.FAISS_METADATA_PATH.name
+        }
+
+    def _write_snapshot(self, generation: int):
+        """Runs in a worker thread while the index is frozen"""
+        index_name = f"query_cache.{generation}.faiss"
+        self._atomic_write(self.directory / index_name, self.index.serialize().tobytes())
+        self._write_manifest(generation, index_name)
+
+        self._generation = generation
+        self._remove_stale_files()
+
+    def _write_manifest(self, generation: int, index_name: str):
+        manifest = {"generation": generation, "index": index_name}
+        self._atomic_write(self.manifest_path, json.dumps(manifest).encode("utf-8"))
+
+    def _atomic_write(self, path: Path, data: bytes):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._fsync_directory()
+
+    def _fsync_directory(self):
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _open_wal(self, generation: int):
+        if self._wal_file:
+            self._wal_file.close()
+        self._wal_file = open(self._wal_path(generation), 'ab')
+        self._wal_generation = generation
+
+    def _write_records(self, records: List[bytes]):
+        self._wal_file.write(b''.join(records))
+        self._wal_file.flush()
+        os.fsync(self._wal_file.fileno())
+
+    @staticmethod
+    def _frame(payload: bytes) -> bytes:
+        return _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def _encode_add(self, entry_id: int, vector: np.ndarray) -> bytes:
+        return self._frame(_OP_HEADER.pack(_OP_ADD, entry_id) + vector.tobytes())
+
+    def _encode_remove(self, entry_id: int) -> bytes:
+        return self._frame(_OP_HEADER.pack(_OP_REMOVE, entry_id))
+
+    def _wal_path(self, generation: int) -> Path:
+        return self.directory / f"cache_wal.{generation}.log"
+
+    def _wal_generations(self) -> List[int]:
+        generations = []
+        for path in self.directory.glob("cache_wal.*.log"):
+            match = _WAL_NAME.search(path.name)
+            if match:
+                generations.append(int(match.group(1)))
+        return generations
+
+    def _remove_stale_files(self):
+        """Delete logs and snapshots superseded by the current generation"""
+        manifest = self._read_manifest()
+        keep = {manifest["index"], manifest.get("metadata")}
+        for gen in self._wal_generations():
+            if gen < self._generation:
+                self._wal_path(gen).unlink(missing_ok=True)
+        # Before the first manifest, the files on disk are a legacy cache still to be imported
+        if not self.manifest_path.exists():
+            return
+        for pattern in ("query_cache*.faiss", "query_metadata*.json", "*.tmp"):
+            for path in self.directory.glob(pattern):
+                if path.name not in keep:
+                    path.unlink(missing_ok=True)
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from ..config import settings
+from .metrics import DOMAIN_SKIPPED
+
+logger = logging.getLogger(__name__)
+
+# History is kept for this many most recently fetched domains
+MAX_TRACKED_DOMAINS = 10000
+
+
+def domain_of(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class DomainStats:
+    """Recent fetch latencies and failures of one domain, and its circuit breaker state"""
+
+    def __init__(self, window: int, max_concurrency: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probe_started = 0.0
+        self.slots = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def failure_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        return float(np.percentile(self.latencies, q)) if self.latencies else None
+
+
+class DomainScheduler:
+    """
+    Per-domain fetch history that decides which result pages to fetch, in what
+    order, and how long to wait for each.
+
+    - Timeouts adapt to each domain: `timeout_multiplier` times its observed
+      p95 fetch time, within [min_timeout, default_timeout], once it has
+      `min_samples` fetches; until then `default_timeout` applies.
+    - After `breaker_failures` consecutive failures a domain's circuit opens
+      and its URLs are skipped for `breaker_cooldown` seconds; then one probe
+      fetch is let through, and its outcome closes or re-opens the circuit.
+    - At most `max_concurrency` pages per domain are fetched at once, across
+      all queries.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = settings.DOMAIN_TIMEOUT_DEFAULT,
+        min_timeout: float = settings.DOMAIN_TIMEOUT_MIN,
+        timeout_multiplier: float = settings.DOMAIN_TIMEOUT_MULTIPLIER,
+        min_samples: int = settings.DOMAIN_TIMEOUT_MIN_SAMPLES,
+        window: int = settings.DOMAIN_HISTORY_WINDOW,
+        breaker_failures: int = settings.DOMAIN_BREAKER_FAILURES,
+        breaker_cooldown: float = settings.DOMAIN_BREAKER_COOLDOWN,
+        max_concurrency: int = settings.DOMAIN_MAX_CONCURRENCY
+    ):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.window = window
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.max_concurrency = max(1, max_concurrency)
+        self.domains: "OrderedDict[str, DomainStats]" = OrderedDict()
+
+    def timeout(self, url: str) -> float:
+        stats = self.domains.get(domain_of(url))
+        if stats is None or len(stats.latencies) < self.min_samples:
+            return self.default_timeout
+        p95 = stats.percentile(95)
+        return min(self.default_timeout, max(self.min_timeout, p95 * self.timeout_multiplier))
+
+    def order(self, urls: List[str], slow_after: Optional[float] = None) -> List[Tuple[int, str]]:
+        """
+        Fetch order of search results, as (search rank, url) pairs
+
+        Drops URLs whose domain's circuit is open and moves domains that are
+        failing, or whose median fetch takes `slow_after` seconds or more
+        (default: half the default timeout), behind the rest; search rank
+        decides within each group. The rank is each URL's index in `urls`.
+        """
+        slow_after = slow_after or self.default_timeout / 2
+        healthy: List[Tuple[int, str]] = []
+        degraded: List[Tuple[int, str]] = []
+        for rank, url in enumerate(urls):
+            domain = domain_of(url)
+            if not self._allow(domain):
+                DOMAIN_SKIPPED.inc()
+                logger.info(f"Skipping {url[:60]}: circuit open for {domain}")
+                continue
+            stats = self.domains.get(domain)
+            slow = stats is not None and len(stats.latencies) >= self.min_samples \
+                and stats.percentile(50) >= slow_after
+            if stats is not None and (stats.failure_rate > 0.5 or slow):
+                degraded.append((rank, url))
+            else:
+                healthy.append((rank, url))
+        return healthy + degraded
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Hold one of the domain's fetch slots"""
+        async with self._stats(domain_of(url)).slots:
+            yield
+
+    def record(self, url: str, seconds: float, ok: bool):
+        domain = domain_of(url)
+        stats = self._stats(domain)
+        stats.outcomes.append(ok)
+        stats.probe_started = 0.0
+        if ok:
+            stats.latencies.append(seconds)
+            if stats.open_until:
+                logger.info(f"Circuit closed for {domain}")
+            stats.consecutive_failures = 0
+            stats.open_until = 0.0
+            return
+
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures >= self.breaker_failures:
+            if not stats.open_until:
+                logger.warning(f"Circuit opened for {domain} after {stats.consecutive_failures} consecutive failures")
+            stats.open_until = time.monotonic() + self.breaker_cooldown
+
+    def record_unfinished(self, url: str, seconds: float):
+        """A fetch cancelled after `seconds` because faster pages got there first; it took at least that long"""
+        self._stats(domain_of(url)).latencies.append(seconds)
+
+    def stats(self, limit: int = 20) -> Dict[str, Any]:
+        """The `limit` most fetched domains, and every domain whose circuit is open"""
+        now = time.monotonic()
+        busiest = sorted(self.domains.items(), key=lambda item: len(item[1].outcomes), reverse=True)
+        report = {}
+        for i, (domain, stats) in enumerate(busiest):
+            is_open = stats.open_until > now
+            if i >= limit and not is_open:
+                continue
+            p50, p95 = stats.percentile(50), stats.percentile(95)
+            report[domain] = {
+                "fetches": len(stats.outcomes),
+                "failure_rate": round(stats.failure_rate, 3),
+                "p50_seconds": round(p50, 3) if p50 is not None else None,
+                "p95_seconds": round(p95, 3) if p95 is not None else None,
+                "timeout_seconds": round(self.timeout(f"http://{domain}/"), 3),
+                "circuit_open": is_open
+            }
+        return {"tracked_domains": len(self.domains), "domains": report}
+
+    def _allow(self, domain: str) -> bool:
+        stats = self.domains.get(domain)
+        if stats is None or not stats.open_until:
+            return True
+        now = time.monotonic()
+        # A probe that was never fetched (the query had enough pages) doesn't block the next one forever
+        if now < stats.open_until or now - stats.probe_started < self.default_timeout:
+            return False
+        # Cooldown over: let a single probe through
+        stats.probe_started = now
+        return True
+
+    def _stats(self, domain: str) -> DomainStats:
+        stats = self.domains.get(domain)
+        if stats is None:
+            stats = self.domains[domain] = DomainStats(self.window, self.max_concurrency)
+            while len(self.domains) > MAX_TRACKED_DOMAINS:
+                self.domains.popitem(last=False)
+        self.domains.move_to_end(domain)
+        return stats
+
+
+domain_scheduler = DomainScheduler()
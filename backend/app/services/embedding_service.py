@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingService:
+    """
+    Query embeddings computed off the event loop, in micro-batches.
+
+    Concurrent `embed` calls are collected for up to `batch_window` seconds (or
+    until `max_batch` are waiting) and encoded in one SentenceTransformer call
+    on a dedicated thread, so the loop never blocks on a forward pass. Results
+    are L2-normalized and the last `cache_size` are kept in an LRU keyed by the
+    exact query text; concurrent requests for the same text share one encode.
+
+    sentence_transformers (and torch) are only imported by `start`, on the
+    embedding thread, so importing the app stays cheap.
+    """
+
+    def __init__(
+        self,
+        model_name: str = settings.EMBEDDING_MODEL,
+        batch_window: float = settings.EMBEDDING_BATCH_WINDOW,
+        max_batch: int = settings.EMBEDDING_MAX_BATCH,
+        cache_size: int = settings.EMBEDDING_CACHE_SIZE
+    ):
+        self.model_name = model_name
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self.model: Optional["SentenceTransformer"] = None
+
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._queue: List[Tuple[str, asyncio.Future]] = []
+        self._waiting: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # One thread: batches run back to back and torch parallelizes each one itself
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def start(self):
+        """Load the model and run a warmup encode, both on the embedding thread"""
+        if self.model is not None:
+            return
+        logger.info(f"Loading embedding model: {self.model_name}")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self.model = await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+
+    def stop(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Normalized embedding of shape (1, dim); treat it as read-only, it may be shared"""
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            EMBEDDING_CACHE.labels("hit").inc()
+            return cached
+        EMBEDDING_CACHE.labels("miss").inc()
+
+        future = self._waiting.get(text)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting[text] = future
+            self._queue.append((text, future))
+            if len(self._queue) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.batch_window, self._dispatch)
+        # A cancelled caller must not cancel the encode other callers are waiting for
+        return await asyncio.shield(future)
+
+    async def embed_documents(self, texts: List[str], batch_size: int = settings.RETRIEVAL_ENCODE_BATCH) -> np.ndarray:
+        """
+        Normalized embeddings of shape (len(texts), dim), encoded together on the
+        embedding thread; documents are one-off, so they skip the query LRU
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._encode, texts, batch_size)
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached": len(self._cache), "queued": len(self._queue)}
+
+    def _dispatch(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+        if self._queue:
+            self._timer = asyncio.get_running_loop().call_later(self.batch_window, self._dispatch)
+        if batch:
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(self._executor, self._encode, texts)
+        except Exception as e:
+            for text, future in batch:
+                self._waiting.pop(text, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (text, future), vector in zip(batch, vectors):
+            vector = vector.reshape(1, -1)
+            vector.flags.writeable = False
+            self._remember(text, vector)
+            self._waiting.pop(text, None)
+            if not future.done():
+                future.set_result(vector)
+
+    def _load(self) -> "SentenceTransformer":
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(self.model_name)
+        # The first forward pass allocates and initializes kernels; keep that off the first request
+        model.encode(["warmup"], show_progress_bar=False)
+        return model
+
+    def _encode(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        embeddings = self.model.encode(texts, batch_size=batch_size or len(texts), show_progress_bar=False)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    def _remember(self, text: str, vector: np.ndarray):
+        self._cache[text] = vector
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
@@ -0,0 +1,81 @@
+import logging
+from typing import Dict, Optional
+
+import httpx
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+class HttpFetcher:
+    """Pooled keep-alive HTTP/2 client used for the fast, browser-less fetch path"""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is not None:
+            return
+
+        self._client = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            headers=DEFAULT_HEADERS,
+            timeout=httpx.Timeout(settings.HTTP_FETCH_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        logger.info("HTTP fetcher started")
+
+    async def stop(self):
+        if self._client is None:
+            return
+
+        await self._client.aclose()
+        self._client = None
+        logger.info("HTTP fetcher stopped")
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[httpx.Response]:
+        """
+        Fetch a page's HTML without a browser
+
+        Args:
+            headers: Extra request headers, e.g. If-None-Match / If-Modified-Since
+                for a conditional GET
+
+        Returns:
+            The response, or None if it is not a successful HTML page. A 304
+            is returned as is when the request was conditional.
+        """
+        if self._client is None:
+            await self.start()
+
+        response = await self._client.get(url, headers=headers)
+        if response.status_code == 304 and headers:
+            return response
+        if response.status_code != 200:
+            logger.debug(f"HTTP fetch of {url[:60]} returned {response.status_code}")
+            return None
+
+        content_type = response.headers.get("content-type", "")
+        if "html" not in content_type:
+            logger.debug(f"HTTP fetch of {url[:60]} returned non-HTML content: {content_type}")
+            return None
+
+        return response
+
+
+http_fetcher = HttpFetcher()
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Optional, Type
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponse:
+    """Model output plus token usage, shaped like a LangChain message (`.content`)"""
+
+    def __init__(self, content: str, input_tokens: Optional[int] = None, output_tokens: Optional[int] = None):
+        self.content = content
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+
+class LLMBackend(ABC):
+    """
+    Interface every text-generation backend used by AIService implements.
+
+    `max_output_tokens` caps the length of the response, when given. Backends
+    make a single attempt per call: AIService's LLMGateway owns timeouts,
+    retries and hedging.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def ainvoke(self, prompt: str, max_output_tokens: Optional[int] = None) -> LLMResponse:
+        ...
+
+    async def astream(self, prompt: str, max_output_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield the answer text in chunks as the model produces it"""
+        response = await self.ainvoke(prompt, max_output_tokens)
+        yield response.content
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through LangChain"""
+
+    name = "gemini"
+
+    def __init__(self, model: str = settings.GEMINI_MODEL, temperature: float = 0.3):
+        import google.generativeai as genai
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self.llm = ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=settings.GEMINI_API_KEY,
+            temperature=temperature,
+            # LLMGateway retries; SDK retries on top would multiply attempts and skew hedge timings
+            max_retries=0,
+            timeout=settings.LLM_TIMEOUT
+        )
+
+    async def ainvoke(self, prompt: str, max_output_tokens: Optional[int] = None) -> LLMResponse:
+        return self._to_response(await self.llm.ainvoke(prompt, **self._options(max_output_tokens)))
+
+    async def astream(self, prompt: str, max_output_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        async for chunk in self.llm.astream(prompt, **self._options(max_output_tokens)):
+            if chunk.content:
+                yield chunk.content
+
+    @staticmethod
+    def _options(max_output_tokens: Optional[int]) -> Dict:
+        # Merged over the model's own generation config for this call only
+        return {"generation_config": {"max_output_tokens": max_output_tokens}} if max_output_tokens else {}
+
+    @staticmethod
+    def _to_response(message) -> LLMResponse:
+        content = message.content if hasattr(message, 'content') else str(message)
+        usage = getattr(message, 'usage_metadata', None) or {}
+        return LLMResponse(
+            content=content,
+            input_tokens=usage.get("input_tokens"),
+            output_tokens=usage.get("output_tokens")
+        )
+
+
+class StubLLMBackend(LLMBackend):
+    """
+    Deterministic local stand-in for offline benchmarking.
+
+    Validation prompts are answered VALID; answer prompts get a canned answer
+    built from the question and the first context sentences. Latency is a fixed
+    per-call delay plus the time to "generate" the output at `tokens_per_second`.
+    Words stand in for tokens, in the usage counts and `max_output_tokens`.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency: float = settings.LLM_STUB_LATENCY,
+        tokens_per_second: float = settings.LLM_STUB_TOKENS_PER_SECOND
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+
+    async def ainvoke(self, prompt: str, max_output_tokens: Optional[int] = None) -> LLMResponse:
+        response = self._respond(prompt, max_output_tokens)
+        await asyncio.sleep(self._delay(response))
+        return response
+
+    async def astream(self, prompt: str, max_output_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        response = self._respond(prompt, max_output_tokens)
+        await asyncio.sleep(self.latency)
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for i, word in enumerate(response.content.split(" ")):
+            await asyncio.sleep(per_token)
+            yield word if i == 0 else " " + word
+
+    def _delay(self, response: LLMResponse) -> float:
+        generation = response.output_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return self.latency + generation
+
+    def _respond(self, prompt: str, max_output_tokens: Optional[int] = None) -> LLMResponse:
+        if 'Respond with only the word "VALID" or "INVALID"' in prompt:
+            content = "VALID"
+        else:
+            content = self._answer(prompt)
+        if max_output_tokens:
+            content = " ".join(content.split(" ")[:max_output_tokens])
+        return LLMResponse(
+            content=content,
+            input_tokens=len(prompt.split()),
+            output_tokens=len(content.split())
+        )
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        question = re.search(r"Question: (.*)", prompt)
+        question = question.group(1).strip() if question else "your question"
+        context = prompt.split("Context from web sources:", 1)[-1].split("Instructions:", 1)[0]
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', ' '.join(context.split())) if s.strip()]
+        digest = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+
+        summary = ' '.join(sentences[:3]) or "The sources did not contain enough information."
+        return f"Here is what the sources say about {question} {summary} (stub answer {digest})"
+
+
+LLM_BACKENDS: Dict[str, Type[LLMBackend]] = {
+    GeminiBackend.name: GeminiBackend,
+    StubLLMBackend.name: StubLLMBackend,
+}
+
+
+def create_llm_backend(name: Optional[str] = None) -> LLMBackend:
+    name = name or settings.LLM_BACKEND
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}', expected one of {sorted(LLM_BACKENDS)}")
+    logger.info(f"Using LLM backend: {name}")
+    return LLM_BACKENDS[name]()
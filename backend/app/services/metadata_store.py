@@ -0,0 +1,163 @@
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config import settings
+
+# Fields kept in their own columns; everything else in an entry is the JSON payload
+USAGE_FIELDS = ("id", "timestamp", "last_accessed", "hits")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    last_accessed REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL,
+    payload TEXT NOT NULL
+);
+-- Covers the startup scan so it never touches the (large) payloads
+CREATE INDEX IF NOT EXISTS entries_usage ON entries (timestamp, last_accessed, hits, size);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class MetadataStore:
+    """
+    SQLite file holding the semantic cache's answers and sources, keyed by entry id.
+
+    Only the small usage columns (timestamps, hits, size) are read at startup; a
+    cache hit fetches the one row it needs through a read-only, memory-mapped
+    connection. The database runs in WAL mode, so any number of readers, in
+    this process or in other workers opened with `read_only=True`, proceed
+    while the single writer commits.
+
+    The writer connection is only used under the cache store's flush lock, from
+    whichever worker thread runs the flush, and the reader only from the event
+    loop, so neither is ever shared between two threads at once. Full scans
+    (`usage`) open a connection of their own so they can run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: Path = settings.CACHE_METADATA_PATH,
+        mmap_size: int = settings.CACHE_METADATA_MMAP_SIZE,
+        read_only: bool = False
+    ):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.read_only = read_only
+        self._writer: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        if self._reader or self._writer:
+            return
+        if not self.read_only:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            self._writer.execute("PRAGMA journal_mode=WAL")
+            # Each commit is a batch of log records, so pay for a real fsync
+            self._writer.execute("PRAGMA synchronous=FULL")
+            self._writer.executescript(_SCHEMA)
+        self._connect_reader()
+
+    def close(self):
+        for connection in (self._reader, self._writer):
+            if connection:
+                connection.close()
+        self._reader = self._writer = None
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        """The payload (query, answer, sources) of one entry, or None"""
+        row = self._fetch_one("SELECT payload FROM entries WHERE id = ?", (entry_id,))
+        return json.loads(row[0]) if row else None
+
+    def contains(self, entry_id: int) -> bool:
+        return self._fetch_one("SELECT 1 FROM entries WHERE id = ?", (entry_id,)) is not None
+
+    def usage(self) -> List[Tuple[int, float, float, int, int]]:
+        """(id, timestamp, last_accessed, hits, size) of every entry, oldest first"""
+        if not self.path.exists():
+            return []
+        with closing(self._connect()) as connection:
+            try:
+                return connection.execute(
+                    "SELECT id, timestamp, last_accessed, hits, size FROM entries ORDER BY timestamp, id"
+                ).fetchall()
+            except sqlite3.OperationalError:
+                # The owner has not created the schema yet
+                return []
+
+    def next_id(self) -> int:
+        row = self._fetch_one("SELECT value FROM state WHERE key = 'next_id'", ())
+        return row[0] if row else 0
+
+    def write(
+        self,
+        added: Iterable[Tuple[Dict[str, Any], int]] = (),
+        removed: Iterable[int] = (),
+        touched: Iterable[Tuple[int, float, int]] = (),
+        next_id: Optional[int] = None
+    ):
+        """
+        Apply one flush in a single transaction: `added` is (entry, size) pairs,
+        `touched` is (hits, last_accessed, id) usage updates.
+        """
+        rows = [
+            (
+                entry["id"], entry["timestamp"], entry["last_accessed"], entry["hits"], size,
+                json.dumps({k: v for k, v in entry.items() if k not in USAGE_FIELDS}, default=str)
+            )
+            for entry, size in added
+        ]
+        writer = self._writer
+        writer.execute("BEGIN")
+        try:
+            writer.executemany("DELETE FROM entries WHERE id = ?", ((entry_id,) for entry_id in removed))
+            writer.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+            writer.executemany("UPDATE entries SET hits = ?, last_accessed = ? WHERE id = ?", touched)
+            if next_id is not None:
+                writer.execute("INSERT OR REPLACE INTO state VALUES ('next_id', ?)", (next_id,))
+            writer.execute("COMMIT")
+        except Exception:
+            writer.execute("ROLLBACK")
+            raise
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        connection.execute("PRAGMA query_only=1")
+        return connection
+
+    def _connect_reader(self) -> Optional[sqlite3.Connection]:
+        # Read-only stores wait for the owner to create the file
+        if self._reader is None and self.path.exists():
+            self._reader = self._connect()
+        return self._reader
+
+    def _fetch_one(self, sql: str, params: Tuple) -> Optional[Tuple]:
+        reader = self._connect_reader()
+        if reader is None:
+            return None
+        try:
+            return reader.execute(sql, params).fetchone()
+        except sqlite3.OperationalError:
+            if not self.read_only:
+                raise
+            # The owner has not created the schema yet
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        wal_path = self.path.with_name(self.path.name + "-wal")
+        return {
+            "path": str(self.path),
+            "read_only": self.read_only,
+            "db_bytes": self.path.stat().st_size if self.path.exists() else 0,
+            "wal_bytes": wal_path.stat().st_size if wal_path.exists() else 0
+        }
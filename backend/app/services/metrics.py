@@ -0,0 +1,158 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from .prompt_builder import token_counter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+REQUEST_SECONDS = Histogram(
+    "webquery_request_seconds", "End-to-end query latency", ["cached"], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "webquery_stage_seconds", "Latency of each query pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+PAGE_FETCH_SECONDS = Histogram(
+    "webquery_page_fetch_seconds", "Latency of a single result page fetch", ["path"], buckets=LATENCY_BUCKETS
+)
+CACHE_LOOKUPS = Counter("webquery_cache_lookups_total", "Semantic cache lookups", ["result"])
+COALESCED_REQUESTS = Counter(
+    "webquery_coalesced_requests_total", "Queries answered by attaching to a similar query already in flight"
+)
+CACHE_REMOVALS = Counter("webquery_cache_removals_total", "Semantic cache entries expired or evicted", ["reason"])
+VALIDATIONS = Counter("webquery_validations_total", "Query validations by the tier that decided them", ["tier"])
+SPECULATIVE_CANCELLED = Counter(
+    "webquery_speculative_cancelled_total", "Speculative tasks cancelled before they were needed", ["task"]
+)
+SPECULATIVE_WASTED_SECONDS = Counter(
+    "webquery_speculative_wasted_seconds_total", "Wall time speculative tasks ran before being cancelled", ["task"]
+)
+SERP_CACHE = Counter("webquery_serp_cache_total", "Search results page cache lookups", ["result"])
+PAGE_CACHE = Counter(
+    "webquery_page_cache_total", "Page cache lookups (fresh, stale, revalidated, miss) and evictions", ["result"]
+)
+SCRAPE_FAILURES = Counter("webquery_scrape_failures_total", "Result pages that yielded no content", ["reason"])
+SCRAPE_REPLACEMENTS = Counter(
+    "webquery_scrape_replacements_total", "Spare search results fetched in place of failed or slow pages", ["reason"]
+)
+DOMAIN_SKIPPED = Counter("webquery_domain_skipped_total", "Result pages skipped because their domain's circuit was open")
+EMBEDDING_BATCH_SIZE = Histogram(
+    "webquery_embedding_batch_size", "Queries encoded per embedding batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+EMBEDDING_CACHE = Counter("webquery_embedding_cache_total", "Query embedding LRU lookups", ["result"])
+LLM_TOKENS = Counter("webquery_llm_tokens_total", "LLM tokens sent and received", ["direction", "call"])
+LLM_SECONDS = Counter("webquery_llm_seconds_total", "Time the model spent on LLM calls, excluding queueing", ["call"])
+LLM_OUTPUT_TOKENS_PER_SECOND = Histogram(
+    "webquery_llm_output_tokens_per_second", "Output tokens per second of each LLM call", ["call"],
+    buckets=(5, 10, 25, 50, 100, 200, 400, 800, 1600)
+)
+LLM_PROMPT_TOKENS = Histogram(
+    "webquery_llm_prompt_tokens", "Input tokens of each LLM call", ["call"],
+    buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "webquery_llm_queue_seconds", "Time LLM calls waited for the rate limit and a concurrency slot", ["call"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_MODEL_SECONDS = Histogram(
+    "webquery_llm_model_seconds", "Time LLM requests spent with the model, per attempt", ["call"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_RETRIES = Counter("webquery_llm_retries_total", "LLM attempts retried after a transient error", ["call", "error"])
+LLM_HEDGES = Counter("webquery_llm_hedges_total", "Hedged LLM calls, by whether the hedge answered first", ["call", "outcome"])
+LLM_ERRORS = Counter("webquery_llm_errors_total", "LLM calls that failed for good", ["call", "error"])
+STARTUP_SECONDS = Gauge("webquery_startup_seconds", "Time each component took to start", ["component"])
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class StageTimer:
+    """Wall-clock time spent in each pipeline stage of one request"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+
+_current_timer: ContextVar[Optional[StageTimer]] = ContextVar("stage_timer", default=None)
+
+
+def start_timer() -> StageTimer:
+    """Start collecting stage timings for the current request (and tasks it spawns)"""
+    timer = StageTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage into the stage histogram and the current request's breakdown"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.record(stage, elapsed)
+
+
+# Per-call LLM totals since startup: calls, input_tokens, output_tokens, seconds
+llm_totals: Dict[str, Dict[str, float]] = {}
+
+
+def record_llm_tokens(call: str, prompt: str, response, seconds: float) -> Tuple[int, int]:
+    """
+    Count tokens from the backend's usage data, falling back to the same
+    calibrated estimate prompt budgets use, along with the time the call took
+
+    Returns:
+        (input_tokens, output_tokens)
+    """
+    input_tokens = getattr(response, "input_tokens", None)
+    output_tokens = getattr(response, "output_tokens", None)
+    if input_tokens is None:
+        input_tokens = token_counter.count(prompt)
+    if output_tokens is None:
+        output_tokens = token_counter.count(getattr(response, "content", ""))
+
+    LLM_TOKENS.labels("in", call).inc(input_tokens)
+    LLM_TOKENS.labels("out", call).inc(output_tokens)
+    LLM_SECONDS.labels(call).inc(seconds)
+    LLM_PROMPT_TOKENS.labels(call).observe(input_tokens)
+    if seconds > 0:
+        LLM_OUTPUT_TOKENS_PER_SECOND.labels(call).observe(output_tokens / seconds)
+
+    totals = llm_totals.setdefault(call, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0})
+    totals["calls"] += 1
+    totals["input_tokens"] += input_tokens
+    totals["output_tokens"] += output_tokens
+    totals["seconds"] += seconds
+    return input_tokens, output_tokens
+
+
+def llm_throughput() -> Dict[str, Dict[str, Any]]:
+    """Aggregate token counts and tokens per second of LLM time, per call type"""
+    stats = {}
+    for call, totals in llm_totals.items():
+        seconds = totals["seconds"]
+        stats[call] = {
+            "calls": totals["calls"],
+            "input_tokens": totals["input_tokens"],
+            "output_tokens": totals["output_tokens"],
+            "seconds": round(seconds, 3),
+            "mean_input_tokens": totals["input_tokens"] / totals["calls"],
+            "input_tokens_per_second": totals["input_tokens"] / seconds if seconds else 0.0,
+            "output_tokens_per_second": totals["output_tokens"] / seconds if seconds else 0.0
+        }
+    return stats
+
+
+def render_metrics() -> bytes:
+    return generate_latest()
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import settings
+from .metrics import PAGE_CACHE
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    content BLOB NOT NULL,
+    title TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    validated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_validated ON pages (validated_at);
+"""
+
+
+class CachedPage:
+    """Extracted text of one page and the validators its server sent with it"""
+
+    def __init__(
+        self,
+        content: str,
+        title: Optional[str],
+        etag: Optional[str],
+        last_modified: Optional[str],
+        validated_at: float
+    ):
+        self.content = content
+        self.title = title
+        self.etag = etag
+        self.last_modified = last_modified
+        self.validated_at = validated_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.validated_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Validators for a conditional GET; empty when the server sent none"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    Extracted text of result pages, keyed by normalized URL.
+
+    Pages are zlib-compressed in a SQLite file, with the most recently used
+    `memory_entries` kept decompressed in an in-memory LRU. A page validated
+    within `freshness` seconds is served without touching the network; an
+    older one is revalidated with the ETag / Last-Modified its server sent, so
+    an unchanged page costs a 304 and no re-extraction. Past `max_entries`
+    the least recently validated pages are dropped from disk.
+
+    SQLite calls run in worker threads behind one lock; the database is in WAL
+    mode so uvicorn workers can share the file.
+    """
+
+    def __init__(
+        self,
+        path: Path = settings.PAGE_CACHE_PATH,
+        freshness: float = settings.PAGE_CACHE_FRESHNESS,
+        memory_entries: int = settings.PAGE_CACHE_MEMORY_ENTRIES,
+        max_entries: int = settings.PAGE_CACHE_MAX_ENTRIES
+    ):
+        self.path = path
+        self.freshness = freshness
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    async def start(self):
+        if self._connection is None:
+            await asyncio.to_thread(self._open)
+
+    def stop(self):
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        return page.age < self.freshness
+
+    async def get(self, url: str) -> Optional[CachedPage]:
+        page = self._memory.get(url)
+        if page is None:
+            try:
+                page = await asyncio.to_thread(self._read, url)
+            except sqlite3.Error as e:
+                logger.error(f"Error reading page cache: {e}")
+                return None
+            if page is None:
+                return None
+            self._remember(url, page)
+        self._memory.move_to_end(url)
+        return page
+
+    async def put(
+        self,
+        url: str,
+        content: str,
+        title: Optional[str],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ):
+        page = CachedPage(content, title, etag, last_modified, time.time())
+        self._remember(url, page)
+        try:
+            await asyncio.to_thread(self._write, url, page)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing page cache: {e}")
+
+    async def revalidated(self, url: str, page: CachedPage, etag: Optional[str], last_modified: Optional[str]):
+        """The server answered 304: the page is fresh again, possibly with new validators"""
+        page.validated_at = time.time()
+        page.etag = etag or page.etag
+        page.last_modified = last_modified or page.last_modified
+        self._remember(url, page)
+        try:
+            await asyncio.to_thread(self._touch, url, page)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing page cache: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory_entries": len(self._memory),
+            "disk_bytes": self.path.stat().st_size if self.path.exists() else 0,
+            "freshness_seconds": self.freshness
+        }
+
+    def _remember(self, url: str, page: CachedPage):
+        self._memory[url] = page
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _open(self):
+        with self._lock:
+            if self._connection is not None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Losing the last few pages in a crash only costs a refetch
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+
+    def _read(self, url: str) -> Optional[CachedPage]:
+        self._open()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT content, title, etag, last_modified, validated_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        content, title, etag, last_modified, validated_at = row
+        return CachedPage(zlib.decompress(content).decode("utf-8"), title, etag, last_modified, validated_at)
+
+    def _write(self, url: str, page: CachedPage):
+        compressed = zlib.compress(page.content.encode("utf-8"), 6)
+        self._open()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (url, compressed, page.title, page.etag, page.last_modified, page.validated_at)
+            )
+            self._writes += 1
+            # Counting rows is a full index scan, so only check the bound every so often
+            if self.max_entries and self._writes % 100 == 0:
+                self._prune()
+
+    def _touch(self, url: str, page: CachedPage):
+        self._open()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE pages SET etag = ?, last_modified = ?, validated_at = ? WHERE url = ?",
+                (page.etag, page.last_modified, page.validated_at, url)
+            )
+
+    def _prune(self):
+        excess = self._connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._connection.execute(
+                "DELETE FROM pages WHERE url IN (SELECT url FROM pages ORDER BY validated_at LIMIT ?)", (excess,)
+            )
+            PAGE_CACHE.labels("evicted").inc(excess)
+            logger.info(f"Pruned {excess} page(s) from the page cache")
+
+
+page_cache = PageCache()
@@ -0,0 +1,220 @@
+import logging
+import math
+from typing import Dict, List, Optional, Sequence
+
+from ..config import settings
+from .query_classifier import INVALID_EXAMPLES, VALID_EXAMPLES
+
+logger = logging.getLogger(__name__)
+
+ANSWER_TEMPLATE = """You are a helpful assistant that provides clear, accurate information based on web sources.
+
+Question: {query}
+
+Context from web sources:
+{context}
+
+Instructions:
+- Provide a comprehensive answer using the information from the sources
+- Write in clear, plain text without any special formatting characters like asterisks, bold markers, or markdown
+- Structure your response in easy-to-read paragraphs
+- If sources don't contain enough information, mention that limitation
+- Keep the tone conversational and informative
+- Do not use any special characters or formatting symbols in your response
+
+Answer:"""
+
+VALIDATION_TEMPLATE = """
+            Analyze the following user input. Is it a query that can be answered by a web search?
+
+            Examples of VALID queries:
+            {valid_examples}
+
+            Examples of INVALID queries:
+            {invalid_examples}
+
+            User input: "{query}"
+
+            Respond with only the word "VALID" or "INVALID".
+            """
+
+
+class TokenCounter:
+    """
+    Token counts for budgeting, without a round trip to the model.
+
+    Starts from ~4 characters per token and calibrates that ratio against the
+    input token counts the LLM backend reports, so budgets track the real
+    tokenizer of whichever model is configured.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0, smoothing: float = 0.1):
+        self.chars_per_token = chars_per_token
+        self.smoothing = smoothing
+
+    def count(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of `text` within `max_tokens`, cut at a word boundary"""
+        if self.count(text) <= max_tokens:
+            return text
+        cut = text[:max(0, int(max_tokens * self.chars_per_token))]
+        return cut.rsplit(" ", 1)[0] if " " in cut else cut
+
+    def calibrate(self, text: str, reported_tokens: Optional[int]):
+        if not reported_tokens or not text:
+            return
+        observed = len(text) / reported_tokens
+        # Bounded so a single odd response can't wreck every later budget
+        observed = min(max(observed, 1.0), 10.0)
+        self.chars_per_token += self.smoothing * (observed - self.chars_per_token)
+
+
+token_counter = TokenCounter()
+
+
+class ContextChunk:
+    """A piece of page text offered to the prompt, with its relevance to the query"""
+
+    def __init__(self, text: str, score: float, source: int):
+        self.text = text
+        self.score = score
+        self.source = source
+
+
+class BuiltPrompt:
+    """An assembled prompt, its token accounting, and the output budget for the call"""
+
+    def __init__(self, call: str, text: str, max_output_tokens: int, sections: Dict[str, int], input_budget: int):
+        self.call = call
+        self.text = text
+        self.max_output_tokens = max_output_tokens
+        self.sections = sections
+        self.input_budget = input_budget
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(self.sections.values())
+
+    def describe(self) -> str:
+        sections = ", ".join(f"{name} {tokens}" for name, tokens in self.sections.items())
+        return (
+            f"{self.call} prompt: {self.input_tokens}/{self.input_budget} input tokens ({sections}), "
+            f"max {self.max_output_tokens} output tokens"
+        )
+
+
+class PromptBuilder:
+    """
+    Assembles LLM prompts within per-call token budgets.
+
+    The answer prompt's context gets whatever the input budget leaves after the
+    template and question. That context budget is split across sources in
+    proportion to their relevance (best chunk score); a source that needs less
+    than its share hands the rest to the others, and each source's chunks are
+    added most relevant first, the last one truncated to fit.
+    """
+
+    def __init__(self, counter: TokenCounter = token_counter):
+        self.counter = counter
+
+    def answer_prompt(
+        self,
+        query: str,
+        chunks: Sequence[ContextChunk],
+        input_budget: int = settings.LLM_ANSWER_INPUT_TOKENS,
+        output_budget: int = settings.LLM_ANSWER_OUTPUT_TOKENS
+    ) -> BuiltPrompt:
+        template_tokens = self.counter.count(ANSWER_TEMPLATE.format(query="", context=""))
+        query = self.counter.truncate(query, max(0, input_budget - template_tokens) // 2)
+        query_tokens = self.counter.count(query)
+        context_budget = max(0, input_budget - template_tokens - query_tokens)
+
+        selected = self._allocate(chunks, context_budget)
+        context = "\n\n".join(selected)
+        return BuiltPrompt(
+            "answer",
+            ANSWER_TEMPLATE.format(query=query, context=context),
+            output_budget,
+            {"template": template_tokens, "query": query_tokens, "context": self.counter.count(context)},
+            input_budget
+        )
+
+    def validation_prompt(
+        self,
+        query: str,
+        input_budget: int = settings.LLM_VALIDATION_INPUT_TOKENS,
+        output_budget: int = settings.LLM_VALIDATION_OUTPUT_TOKENS
+    ) -> BuiltPrompt:
+        valid_examples = list(VALID_EXAMPLES)
+        invalid_examples = list(INVALID_EXAMPLES)
+        query = self.counter.truncate(query, input_budget // 2)
+        while True:
+            text = VALIDATION_TEMPLATE.format(
+                valid_examples="\n            ".join(f'- "{example}"' for example in valid_examples),
+                invalid_examples="\n            ".join(f'- "{example}"' for example in invalid_examples),
+                query=query
+            )
+            # Drop examples, longest list first, until the prompt fits
+            if self.counter.count(text) <= input_budget or not (valid_examples or invalid_examples):
+                break
+            (valid_examples if len(valid_examples) >= len(invalid_examples) else invalid_examples).pop()
+
+        query_tokens = self.counter.count(query)
+        return BuiltPrompt(
+            "validation",
+            text,
+            output_budget,
+            {"template": self.counter.count(text) - query_tokens, "query": query_tokens},
+            input_budget
+        )
+
+    def _allocate(self, chunks: Sequence[ContextChunk], budget: int) -> List[str]:
+        by_source: Dict[int, List[ContextChunk]] = {}
+        for chunk in sorted(chunks, key=lambda chunk: chunk.score, reverse=True):
+            by_source.setdefault(chunk.source, []).append(chunk)
+
+        needs = {
+            source: sum(self.counter.count(chunk.text) for chunk in source_chunks)
+            for source, source_chunks in by_source.items()
+        }
+        weights = {source: max(source_chunks[0].score, 0.0) + 1e-6 for source, source_chunks in by_source.items()}
+        shares = _proportional_shares(needs, weights, budget)
+
+        # Keep the overall relevance order in the prompt, not source order
+        taken: Dict[int, int] = {source: 0 for source in by_source}
+        selected: List[str] = []
+        for chunk in sorted(chunks, key=lambda chunk: chunk.score, reverse=True):
+            remaining = shares[chunk.source] - taken[chunk.source]
+            if remaining <= 0:
+                continue
+            text = self.counter.truncate(chunk.text, remaining)
+            if not text:
+                continue
+            taken[chunk.source] += self.counter.count(text)
+            selected.append(text)
+        return selected
+
+
+def _proportional_shares(needs: Dict[int, int], weights: Dict[int, float], budget: int) -> Dict[int, int]:
+    """Split `budget` by `weights`, capping each share at its need and redistributing the surplus"""
+    shares = {source: 0 for source in needs}
+    open_sources = set(needs)
+    remaining = budget
+    while open_sources and remaining > 0:
+        total_weight = sum(weights[source] for source in open_sources)
+        allotted = {source: int(remaining * weights[source] / total_weight) for source in open_sources}
+        capped = {source for source in open_sources if shares[source] + allotted[source] >= needs[source]}
+        if not capped:
+            for source in open_sources:
+                shares[source] += allotted[source]
+            break
+        for source in capped:
+            remaining -= needs[source] - shares[source]
+            shares[source] = needs[source]
+        open_sources -= capped
+    return shares
+
+
+prompt_builder = PromptBuilder()
@@ -0,0 +1,72 @@
+import logging
+from typing import Optional
+
+import numpy as np
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Labelled examples shared by the Gemini validation prompt and the local classifier
+VALID_EXAMPLES = [
+    "What is the capital of France?",
+    "Best restaurants in Tokyo",
+    "How to learn Python programming",
+    "Latest news about AI",
+    "Climate change solutions 2024",
+    "Explain quantum computing",
+]
+
+INVALID_EXAMPLES = [
+    "Walk my pet",
+    "Add apples to grocery list",
+    "Remind me to call mom",
+    "Turn off the lights",
+    "Play music",
+    "Set a timer",
+]
+
+
+class QueryClassifier:
+    """
+    Nearest-neighbour classifier over the labelled examples that can only accept.
+
+    Uses the already-loaded embedding model. A query is accepted when it is
+    close to some VALID example and clearly closer to that class than to the
+    INVALID one; everything else is reported as ambiguous so it goes to the
+    LLM. A handful of examples can't tell "set a timer" from "how to set a
+    timer on iPhone", so the local tier never rejects a query by itself.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        min_similarity: float = settings.VALIDATION_MIN_SIMILARITY,
+        margin: float = settings.VALIDATION_MARGIN
+    ):
+        self.min_similarity = min_similarity
+        self.margin = margin
+        self._valid = self._normalize(embedding_model.encode(VALID_EXAMPLES))
+        self._invalid = self._normalize(embedding_model.encode(INVALID_EXAMPLES))
+
+    def classify(self, query_embedding: np.ndarray) -> Optional[bool]:
+        """
+        Args:
+            query_embedding: L2-normalized embedding of shape (1, dim)
+
+        Returns:
+            True for a confident VALID verdict, None for the LLM to decide
+        """
+        query_vector = query_embedding.reshape(-1)
+        valid_similarity = float(np.max(self._valid @ query_vector))
+        invalid_similarity = float(np.max(self._invalid @ query_vector))
+
+        if valid_similarity < self.min_similarity:
+            return None
+        if valid_similarity - invalid_similarity < self.margin:
+            return None
+        return True
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
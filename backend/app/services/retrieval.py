@@ -0,0 +1,36 @@
+from typing import List, Sequence
+
+import numpy as np
+
+from ..config import settings
+
+
+def select_chunks(
+    scores: np.ndarray,
+    chunk_embeddings: np.ndarray,
+    token_counts: Sequence[int],
+    top_k: int = settings.RETRIEVAL_TOP_K,
+    token_budget: int = settings.RETRIEVAL_TOKEN_BUDGET,
+    dedup_threshold: float = settings.RETRIEVAL_DEDUP_THRESHOLD
+) -> List[int]:
+    """
+    Indices of the chunks to put in the answer context, most relevant first
+
+    Chunks are taken greedily by `scores` (cosine similarity to the query).
+    A chunk is skipped when it is a near-duplicate of one already taken
+    (similarity above `dedup_threshold`, e.g. the same boilerplate on two
+    pages) or when it no longer fits in `token_budget`; selection stops at
+    `top_k` chunks.
+    """
+    selected: List[int] = []
+    used = 0
+    for i in np.argsort(-scores, kind="stable"):
+        if len(selected) >= top_k:
+            break
+        if used + token_counts[i] > token_budget:
+            continue
+        if selected and float(np.max(chunk_embeddings[selected] @ chunk_embeddings[i])) > dedup_threshold:
+            continue
+        selected.append(int(i))
+        used += token_counts[i]
+    return selected
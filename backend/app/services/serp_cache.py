@@ -0,0 +1,55 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..utils.text import fold_query
+from .metrics import SERP_CACHE
+
+
+class SerpCache:
+    """
+    Result URLs of recent searches, keyed by (query, engine, max_results).
+
+    A hit skips the search page entirely, which is the one browser navigation
+    every uncached query pays for. Entries expire after `ttl` seconds, since
+    rankings move; past `max_entries` the least recently used are dropped.
+    """
+
+    def __init__(self, ttl: float = settings.SERP_CACHE_TTL, max_entries: int = settings.SERP_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, int], Tuple[float, List[str]]]" = OrderedDict()
+
+    def get(self, query: str, search_engine: str, max_results: int) -> Optional[List[str]]:
+        key = self._key(query, search_engine, max_results)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            SERP_CACHE.labels("miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        SERP_CACHE.labels("hit").inc()
+        return list(entry[1])
+
+    def put(self, query: str, search_engine: str, max_results: int, urls: List[str]):
+        # An empty results page is more likely a block or a captcha than a real answer
+        if not urls or self.ttl <= 0:
+            return
+        key = self._key(query, search_engine, max_results)
+        self._entries[key] = (time.monotonic(), list(urls))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "ttl_seconds": self.ttl}
+
+    @staticmethod
+    def _key(query: str, search_engine: str, max_results: int) -> Tuple[str, str, int]:
+        # Case and whitespace only: "C++ tutorial" and "C# tutorial" are different searches
+        return fold_query(query), search_engine.lower(), max_results
+
+
+serp_cache = SerpCache()
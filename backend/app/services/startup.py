@@ -0,0 +1,51 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from .metrics import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTracker:
+    """
+    Which components have started, failed or are still starting, and how long
+    each took. Backs the readiness endpoint and the startup log lines.
+    """
+
+    def __init__(self):
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.created_at = time.monotonic()
+
+    def expect(self, *names: str):
+        """Register components that are started later, so readiness waits for them"""
+        for name in names:
+            self.components.setdefault(name, {"status": "pending"})
+
+    async def run(self, name: str, start: Callable[[], Awaitable[Any]]):
+        """Await `start()` as component `name`, recording the outcome; failures are re-raised"""
+        self.components[name] = {"status": "starting"}
+        started = time.perf_counter()
+        try:
+            await start()
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            self.components[name] = {"status": "failed", "seconds": round(elapsed, 3), "error": str(e)}
+            logger.error(f"Failed to start {name} after {elapsed:.2f}s: {e}")
+            raise
+
+        elapsed = time.perf_counter() - started
+        self.components[name] = {"status": "ready", "seconds": round(elapsed, 3)}
+        STARTUP_SECONDS.labels(name).set(elapsed)
+        logger.info(f"Started {name} in {elapsed:.2f}s")
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.components) and all(c["status"] == "ready" for c in self.components.values())
+
+    @property
+    def uptime(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+startup = StartupTracker()
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Type
+
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TextExtractor(ABC):
+    """Turns a page's HTML into (clean_text, title)"""
+
+    name = "base"
+
+    @abstractmethod
+    def extract(self, html_content: str) -> Tuple[str, Optional[str]]:
+        ...
+
+
+class SelectorExtractor(TextExtractor):
+    """
+    Original BeautifulSoup extractor: concatenates the text of a fixed list of
+    content selectors. Overlapping selectors (e.g. `article` and the `p` inside it)
+    emit the same text more than once. Kept for comparison and as a fallback.
+    """
+
+    name = "selector"
+
+    CONTENT_SELECTORS = [
+        'main', 'article', '.content', '#content',
+        '.post', '.entry', 'p', 'h1', 'h2', 'h3'
+    ]
+
+    def extract(self, html_content: str) -> Tuple[str, Optional[str]]:
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+        title_tag = soup.find('title')
+        title = title_tag.get_text().strip() if title_tag else None
+
+        for script in soup(["script", "style", "nav", "header", "footer"]):
+            script.decompose()
+
+        text_parts = []
+        for selector in self.CONTENT_SELECTORS:
+            for element in soup.select(selector):
+                text_parts.append(element.get_text())
+
+        clean_text = ' '.join(' '.join(text_parts).split())
+
+        return clean_text, title
+
+
+class _Block:
+    __slots__ = ("parts", "chars", "link_chars")
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.chars = 0
+        self.link_chars = 0
+
+    def add(self, text: str, in_link: bool):
+        self.parts.append(text)
+        length = len(text.strip())
+        self.chars += length
+        if in_link:
+            self.link_chars += length
+
+
+class LxmlExtractor(TextExtractor):
+    """
+    Single-pass extractor built on lxml.
+
+    The tree is walked once and every text node is attributed to its nearest
+    block-level ancestor, so each piece of text is emitted exactly once and in
+    document order.
+    Blocks made up mostly of link text (menus, tag clouds, "related" lists)
+    are treated as boilerplate and dropped.
+    """
+
+    name = "lxml"
+
+    # No "form": WebForms and many CMS pages wrap their whole body in one
+    DROP_TAGS = (
+        "head", "script", "style", "noscript", "template", "svg", "iframe",
+        "nav", "header", "footer", "aside", "button", "select"
+    )
+    BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search"}
+    BLOCK_TAGS = {
+        "html", "body", "main", "article", "section", "div", "p", "blockquote", "pre",
+        "ul", "ol", "li", "dl", "dt", "dd", "table", "tr", "td", "th", "caption",
+        "h1", "h2", "h3", "h4", "h5", "h6", "figure", "figcaption", "details", "summary"
+    }
+
+    def __init__(self, max_link_density: float = 0.5):
+        self.max_link_density = max_link_density
+
+    def extract(self, html_content: str) -> Tuple[str, Optional[str]]:
+        if not html_content or not html_content.strip():
+            return "", None
+
+        try:
+            doc = lxml.html.document_fromstring(html_content)
+        except (etree.ParserError, ValueError):
+            # lxml rejects str input that carries an XML encoding declaration
+            doc = lxml.html.document_fromstring(html_content.encode("utf-8", "replace"))
+
+        title = doc.findtext(".//title")
+        title = title.strip() if title else None
+
+        self._drop_boilerplate(doc)
+
+        blocks: List[_Block] = []
+        stack: List[_Block] = []
+        link_depth = 0
+
+        for event, element in etree.iterwalk(doc, events=("start", "end")):
+            tag = element.tag if isinstance(element.tag, str) else None
+            if event == "start":
+                if tag in self.BLOCK_TAGS or not stack:
+                    block = _Block()
+                    blocks.append(block)
+                    stack.append(block)
+                if tag == "a":
+                    link_depth += 1
+                if element.text:
+                    stack[-1].add(element.text, link_depth > 0)
+            else:
+                if tag == "a":
+                    link_depth -= 1
+                if tag in self.BLOCK_TAGS and len(stack) > 1:
+                    stack.pop()
+                    # text after a nested block continues the parent in a new segment, keeping document order
+                    continuation = _Block()
+                    blocks.append(continuation)
+                    stack[-1] = continuation
+                if element.tail:
+                    stack[-1].add(element.tail, link_depth > 0)
+
+        kept = []
+        for block in blocks:
+            if not block.chars:
+                continue
+            if block.link_chars / block.chars > self.max_link_density:
+                continue
+            kept.append(' '.join(''.join(block.parts).split()))
+
+        return ' '.join(text for text in kept if text), title
+
+    def _drop_boilerplate(self, doc):
+        doomed = list(doc.iter(*self.DROP_TAGS, etree.Comment, etree.ProcessingInstruction))
+        doomed.extend(
+            element for element in doc.iter()
+            if isinstance(element.tag, str) and element.get("role") in self.BOILERPLATE_ROLES
+        )
+        for element in doomed:
+            if element.getparent() is not None:
+                element.drop_tree()
+
+
+EXTRACTORS: Dict[str, Type[TextExtractor]] = {
+    LxmlExtractor.name: LxmlExtractor,
+    SelectorExtractor.name: SelectorExtractor,
+}
+
+
+def get_extractor(name: Optional[str] = None) -> TextExtractor:
+    name = name or settings.TEXT_EXTRACTOR
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown text extractor '{name}', expected one of {sorted(EXTRACTORS)}")
+    return EXTRACTORS[name]()
+
+
+_extractor: Optional[TextExtractor] = None
+_executor: Optional[Executor] = None
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if settings.EXTRACTION_POOL == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.EXTRACTION_WORKERS)
+        else:
+            # lxml releases the GIL while parsing, so threads already run in parallel
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EXTRACTION_WORKERS,
+                thread_name_prefix="extract"
+            )
+    return _executor
+
+
+async def extract_text(html_content: str) -> Tuple[str, Optional[str]]:
+    """Run the configured extractor off the event loop"""
+    global _extractor
+    if _extractor is None:
+        _extractor = get_extractor()
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), _extractor.extract, html_content)
+
+
+def shutdown_extraction_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
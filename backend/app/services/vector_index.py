@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+QUANTIZERS = ("none", "sq8", "pq")
+
+# FAISS class -> (index type, quantizer) for recognising a loaded index
+_LAYOUTS = {
+    "IndexFlat": ("flat", "none"),
+    "IndexFlatIP": ("flat", "none"),
+    "IndexIVFFlat": ("ivf", "none"),
+    "IndexIVFScalarQuantizer": ("ivf", "sq8"),
+    "IndexIVFPQ": ("ivf", "pq"),
+    "IndexHNSWFlat": ("hnsw", "none"),
+    "IndexHNSWSQ": ("hnsw", "sq8"),
+    "IndexHNSWPQ": ("hnsw", "pq"),
+}
+
+# Removed-but-still-indexed vectors (HNSW cannot delete) tolerated before a rebuild
+_MAX_TOMBSTONE_RATIO = 0.1
+_MIN_TOMBSTONES_FOR_REBUILD = 1000
+
+
+def _inner(index: faiss.Index) -> faiss.Index:
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def _is_ivf(index: faiss.Index) -> bool:
+    try:
+        faiss.extract_index_ivf(index)
+        return True
+    except RuntimeError:
+        return False
+
+
+def index_layout(index: faiss.Index) -> Tuple[str, str]:
+    """(index type, quantizer) of a FAISS index, e.g. ("ivf", "sq8")"""
+    return _LAYOUTS.get(type(_inner(index)).__name__, ("flat", "none"))
+
+
+def _index_ids(index: faiss.Index) -> np.ndarray:
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.vector_to_array(index.id_map)
+    ivf = faiss.extract_index_ivf(index)
+    lists = [
+        faiss.rev_swig_ptr(ivf.invlists.get_ids(i), ivf.invlists.list_size(i)).copy()
+        for i in range(ivf.nlist) if ivf.invlists.list_size(i)
+    ]
+    return np.concatenate(lists) if lists else np.zeros(0, dtype=np.int64)
+
+
+def _id_selector(ids: np.ndarray) -> faiss.IDSelectorArray:
+    # The selector keeps a raw pointer; callers must hold on to `ids` while it is used
+    return faiss.IDSelectorArray(ids.size, faiss.swig_ptr(ids))
+
+
+class VectorIndex:
+    """
+    The semantic cache's FAISS index behind a configurable layout.
+
+    Vectors are stored under stable int64 ids (an `IndexIDMap2` around flat and
+    HNSW indexes, native ids for IVF) so single entries can be deleted without
+    a rebuild. HNSW cannot delete, so its removals are tombstoned, filtered out
+    of search results and purged by the next rebuild.
+
+    Starts as an exact flat index. When an IVF or HNSW layout is configured and
+    the cache holds `train_size` vectors, a replacement is trained and filled in
+    a worker thread while lookups keep using the current index. The current
+    index can also be frozen while a snapshot of it is written; in both cases
+    new vectors go to a small side index that is searched too, and removals are
+    tombstoned, until the changes are folded back in.
+    """
+
+    def __init__(
+        self,
+        index: Optional[faiss.Index] = None,
+        dimension: int = settings.EMBEDDING_DIMENSION,
+        index_type: str = settings.CACHE_INDEX_TYPE,
+        quantizer: str = settings.CACHE_INDEX_QUANTIZER,
+        train_size: int = settings.CACHE_INDEX_TRAIN_SIZE,
+        nlist: int = settings.CACHE_IVF_NLIST,
+        nprobe: int = settings.CACHE_IVF_NPROBE,
+        hnsw_m: int = settings.CACHE_HNSW_M,
+        ef_search: int = settings.CACHE_HNSW_EF_SEARCH,
+        pq_m: int = settings.CACHE_PQ_M
+    ):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown cache index type '{index_type}', expected one of {INDEX_TYPES}")
+        if quantizer not in QUANTIZERS:
+            raise ValueError(f"Unknown cache index quantizer '{quantizer}', expected one of {QUANTIZERS}")
+
+        self.dimension = dimension
+        self.index_type = index_type
+        self.quantizer = quantizer if index_type != "flat" else "none"
+        self.train_size = train_size
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+
+        self.index = self._with_ids(index) if index is not None else self._empty_flat()
+        self._configure(self.index)
+        self._side: Optional[faiss.Index] = None
+        self._side_ids: Set[int] = set()
+        self._tombstones: Set[int] = set()
+        self._migration_task: Optional[asyncio.Task] = None
+        self._retry_size = 0
+        self._last_migration_seconds: Optional[float] = None
+
+    @property
+    def ntotal(self) -> int:
+        side = self._side.ntotal if self._side is not None else 0
+        return self.index.ntotal + side - len(self._tombstones)
+
+    @property
+    def frozen(self) -> bool:
+        return self._side is not None
+
+    @property
+    def migrating(self) -> bool:
+        return self._migration_task is not None
+
+    @property
+    def layout(self) -> Tuple[str, str]:
+        return index_layout(self.index)
+
+    @property
+    def removable(self) -> bool:
+        return self.layout[0] != "hnsw"
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        ids = np.ascontiguousarray(ids, dtype=np.int64).reshape(-1)
+        if self._side is not None:
+            self._side.add_with_ids(vectors, ids)
+            self._side_ids.update(ids.tolist())
+        else:
+            self.index.add_with_ids(vectors, ids)
+
+    def remove(self, ids: Iterable[int]):
+        ids = set(ids)
+        if self._side is not None:
+            in_side = ids & self._side_ids
+            if in_side:
+                self._remove_ids(self._side, in_side)
+                self._side_ids -= in_side
+            # The frozen index is being read by a worker thread; delete after it thaws
+            self._tombstones.update(ids - in_side)
+        elif self.removable:
+            self._remove_ids(self.index, ids)
+        else:
+            self._tombstones.update(ids)
+
+    def search(self, vectors: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Inner-product similarities and ids of the k nearest live vectors"""
+        fetch = k + min(len(self._tombstones), 32)
+        similarities, ids = self._search(self.index, vectors, fetch)
+        if self._side is not None and self._side.ntotal:
+            side_similarities, side_ids = self._search(self._side, vectors, fetch)
+            similarities = np.hstack([similarities, side_similarities])
+            ids = np.hstack([ids, side_ids])
+
+        if self._tombstones:
+            dead = np.isin(ids, list(self._tombstones))
+            similarities = np.where(dead, -np.inf, similarities)
+            ids = np.where(dead, -1, ids)
+        order = np.argsort(-similarities, axis=1)[:, :k]
+        return np.take_along_axis(similarities, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def ids(self) -> np.ndarray:
+        """Ids of every vector in the main index, tombstoned ones included"""
+        return _index_ids(self.index)
+
+    def live_ids(self) -> Set[int]:
+        """Ids a search can return: the main index minus tombstones, plus the side buffer"""
+        return (set(self.ids().tolist()) - self._tombstones) | self._side_ids
+
+    def freeze(self):
+        """Stop mutating the main index so a worker thread can read it"""
+        if self._side is None:
+            self._side = self._empty_flat()
+            self._side_ids = set()
+
+    def thaw(self, replacement: Optional[faiss.Index] = None, purged: Set[int] = frozenset()):
+        """Fold buffered changes into the main index, or into `replacement` built from it"""
+        target = replacement if replacement is not None else self.index
+        side, self._side = self._side, None
+        if side is not None and side.ntotal:
+            vectors, ids = self._entries(side)
+            target.add_with_ids(vectors, ids)
+        self._side_ids = set()
+        self.index = target
+
+        self._tombstones -= purged
+        if self._tombstones and self.removable:
+            self._remove_ids(self.index, self._tombstones)
+            self._tombstones = set()
+
+    def serialize(self) -> np.ndarray:
+        return faiss.serialize_index(self.index)
+
+    def needs_migration(self) -> bool:
+        if self.frozen or self.migrating:
+            return False
+        if len(self._tombstones) > max(_MIN_TOMBSTONES_FOR_REBUILD, _MAX_TOMBSTONE_RATIO * self.index.ntotal):
+            return True
+        if self.layout == (self.index_type, self.quantizer):
+            return False
+        return self.index_type == "flat" or self.index.ntotal >= max(self.train_size, self._retry_size)
+
+    def maybe_migrate(self):
+        """Start an online migration to the configured layout (or a tombstone purge) if one is due"""
+        if self.needs_migration():
+            self._migration_task = asyncio.create_task(self._migrate())
+
+    async def wait_for_migration(self):
+        if self._migration_task:
+            await asyncio.gather(self._migration_task, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        index_type, quantizer = self.layout
+        return {
+            "index_type": index_type,
+            "quantizer": quantizer,
+            "target_index_type": self.index_type,
+            "target_quantizer": self.quantizer,
+            "migrating": self.migrating,
+            "tombstones": len(self._tombstones),
+            "last_migration_seconds": self._last_migration_seconds
+        }
+
+    def build(self, vectors: np.ndarray, ids: np.ndarray) -> faiss.Index:
+        """Create and train an index in the configured layout holding `vectors` under `ids`"""
+        factory = self._factory_string(len(vectors))
+        metric = faiss.METRIC_L2 if "HNSW" in factory and self.quantizer == "pq" else faiss.METRIC_INNER_PRODUCT
+        index = faiss.index_factory(self.dimension, factory, metric)
+        if not index.is_trained:
+            index.train(vectors)
+        self._configure(index)
+        index.add_with_ids(vectors, ids)
+        return index
+
+    async def _migrate(self):
+        started = time.perf_counter()
+        source = self.index
+        purged = set(self._tombstones)
+        target = f"{self.index_type}/{self.quantizer}"
+        self.freeze()
+        logger.info(f"Rebuilding semantic cache index as {target} ({source.ntotal - len(purged)} vectors)")
+
+        def rebuild() -> faiss.Index:
+            vectors, ids = self._entries(source)
+            if purged:
+                keep = ~np.isin(ids, list(purged))
+                vectors, ids = vectors[keep], ids[keep]
+            return self.build(vectors, ids)
+
+        replacement = None
+        try:
+            replacement = await asyncio.to_thread(rebuild)
+            self._last_migration_seconds = time.perf_counter() - started
+            logger.info(f"Semantic cache index rebuilt as {target} in {self._last_migration_seconds:.2f}s")
+        except Exception as e:
+            logger.error(f"Error migrating semantic cache index: {e}")
+            self._retry_size = 2 * source.ntotal
+        finally:
+            self.thaw(replacement, purged if replacement is not None else frozenset())
+            self._migration_task = None
+
+    def _factory_string(self, n: int) -> str:
+        if self.index_type == "flat":
+            return "IDMap2,Flat"
+
+        encoding = {"none": "Flat", "sq8": "SQ8", "pq": f"PQ{self._pq_subquantizers()}"}[self.quantizer]
+        if self.index_type == "hnsw":
+            if self.quantizer == "none":
+                return f"IDMap2,HNSW{self.hnsw_m}"
+            # FAISS only builds HNSW+PQ for L2; on normalized vectors that ranks like inner product
+            if self.quantizer == "pq":
+                return f"IDMap2,HNSW{self.hnsw_m}_{encoding}"
+            return f"IDMap2,HNSW{self.hnsw_m},{encoding}"
+
+        # ~39 training points per centroid keeps k-means well conditioned
+        nlist = self.nlist or max(1, min(int(4 * math.sqrt(n)), n // 39))
+        return f"IVF{nlist},{encoding}"
+
+    def _pq_subquantizers(self) -> int:
+        m = self.pq_m or self.dimension // 8
+        while self.dimension % m:
+            m -= 1
+        return m
+
+    def _configure(self, index: faiss.Index):
+        if _is_ivf(index):
+            ivf = faiss.extract_index_ivf(index)
+            ivf.nprobe = self.nprobe
+            # Lets IVF reconstruct and delete by id
+            if ivf.direct_map.type != faiss.DirectMap.Hashtable:
+                ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        inner = _inner(index)
+        if hasattr(inner, "hnsw"):
+            inner.hnsw.efSearch = self.ef_search
+
+    def _empty_flat(self) -> faiss.Index:
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+
+    def _with_ids(self, index: faiss.Index) -> faiss.Index:
+        """Wrap an index without external ids (the original flat cache) so position i gets id i"""
+        downcast = faiss.downcast_index(index)
+        if isinstance(downcast, (faiss.IndexIDMap, faiss.IndexIDMap2)) or _is_ivf(downcast):
+            # Keep the object that owns the C++ index; the downcast wrapper does not
+            return index
+        wrapped = self._empty_flat()
+        if downcast.ntotal:
+            wrapped.add_with_ids(downcast.reconstruct_n(0, downcast.ntotal), np.arange(downcast.ntotal, dtype=np.int64))
+        return wrapped
+
+    @staticmethod
+    def _remove_ids(index: faiss.Index, ids: Iterable[int]):
+        ids = np.fromiter(ids, dtype=np.int64)
+        if ids.size:
+            index.remove_ids(_id_selector(ids))
+
+    @staticmethod
+    def _search(index: faiss.Index, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        distances, ids = index.search(np.ascontiguousarray(vectors, dtype=np.float32), k)
+        if index.metric_type == faiss.METRIC_L2:
+            # Squared L2 between unit vectors is 2 - 2 * cosine
+            distances = 1 - distances / 2
+        return np.where(ids >= 0, distances, -np.inf), ids
+
+    def _entries(self, index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+        """All (vectors, ids) stored in `index`"""
+        downcast = faiss.downcast_index(index)
+        if downcast.ntotal == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32), np.zeros(0, dtype=np.int64)
+        if isinstance(downcast, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            inner = faiss.downcast_index(downcast.index)
+            return inner.reconstruct_n(0, inner.ntotal), faiss.vector_to_array(downcast.id_map)
+        ids = _index_ids(downcast)
+        return downcast.reconstruct_batch(ids), ids
@@ -1,34 +1,140 @@
-from typing import List, Tuple, Optional
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+import asyncio
+import re
+from collections import Counter
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, Optional
+from urllib.parse import urlparse
 import logging
+import time
+
+from ..config import settings
+from ..utils.text import normalize_url
+from .browser_pool import browser_pool
+from .domain_scheduler import domain_scheduler
+from .http_fetcher import http_fetcher
+from .metrics import PAGE_CACHE, PAGE_FETCH_SECONDS, SCRAPE_FAILURES, SCRAPE_REPLACEMENTS, span
+from .page_cache import page_cache
+from .serp_cache import serp_cache
+from .text_extractor import extract_text
 
 logger = logging.getLogger(__name__)
 
-class WebScraperService:
+# Pages with less extracted text than this are not worth sending to the LLM
+MIN_CONTENT_LENGTH = 200
+
+# Fetch path taken for every scraped URL since startup: "cache", "revalidated", "http", "browser_fallback" or "browser"
+fetch_path_counts: Counter = Counter()
+
+# Called with (rank, url, content, title) as soon as each result page is scraped
+ResultCallback = Callable[[int, str, str, Optional[str]], Awaitable[None]]
+
+_EMPTY_APP_ROOT = re.compile(r'<div[^>]+id=["\'](root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.IGNORECASE)
+
+
+def looks_js_rendered(html: str, text: str) -> bool:
+    """
+    Heuristic for pages whose server HTML is an empty client-side app shell:
+    an empty root element, or too little extracted text. A "please enable
+    JavaScript" <noscript> banner alone doesn't count; server-rendered pages
+    carry them too.
+    """
+    return len(text) <= MIN_CONTENT_LENGTH or bool(_EMPTY_APP_ROOT.search(html))
+
+
+# Network totals across all queries: bytes transferred and requests blocked by the router
+network_totals: Counter = Counter()
+
+
+class ScrapeStats:
+    """Per-query network accounting for one scraper instance"""
+
     def __init__(self):
-        self.browser = None
+        self.bytes_transferred = 0
+        self.blocked_requests: Counter = Counter()
+        self.search_ready_time: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "bytes_transferred": self.bytes_transferred,
+            "blocked_requests": sum(self.blocked_requests.values()),
+            "blocked_by_type": dict(self.blocked_requests),
+            "search_ready_time": self.search_ready_time
+        }
+
+
+def _is_blocked_domain(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return any(host == domain or host.endswith("." + domain) for domain in settings.BLOCKED_DOMAINS)
+
+
+# Shared by every scraper instance so a burst of queries can't open an unbounded number of pages
+_global_fetch_semaphore = asyncio.Semaphore(settings.SCRAPE_GLOBAL_CONCURRENCY)
+
+class WebScraperService:
+    def __init__(
+        self,
+        pool=None,
+        concurrency: int = settings.SCRAPE_CONCURRENCY,
+        deadline: float = settings.SCRAPE_DEADLINE,
+        overfetch: int = settings.SCRAPE_OVERFETCH,
+        hedge_delay: float = settings.SCRAPE_HEDGE_DELAY
+    ):
+        self.pool = pool or browser_pool
+        self.concurrency = max(1, concurrency)
+        self.deadline = deadline
+        self.overfetch = max(0, overfetch)
+        self.hedge_delay = hedge_delay
+        self.context = None
         self.page = None
+        self.fetch_paths: Dict[str, str] = {}
+        self.stats = ScrapeStats()
+        self._exit_stack: Optional[AsyncExitStack] = None
     
     async def __aenter__(self):
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=True)
-        self.page = await self.browser.new_page()
+        self._exit_stack = AsyncExitStack()
+        self.context = await self._exit_stack.enter_async_context(self.pool.context())
+        await self.context.route("**/*", self._route_request)
+        self.context.on("response", self._count_response)
+        # The search page is opened on a SERP cache miss only
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.page:
-            await self.page.close()
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        # closing the pooled context also closes its pages
+        if self._exit_stack:
+            await self._exit_stack.aclose()
+        self._exit_stack = None
+        self.context = None
+        self.page = None
+    
+    async def _route_request(self, route):
+        """Let documents (and the scripts JS-rendered pages need) through; abort everything else"""
+        request = route.request
+        if request.resource_type in settings.BLOCKED_RESOURCE_TYPES:
+            reason = request.resource_type
+        elif _is_blocked_domain(request.url):
+            reason = "tracker"
+        else:
+            await route.continue_()
+            return
+
+        self.stats.blocked_requests[reason] += 1
+        await route.abort()
+
+    async def _count_response(self, response):
+        # Bytes on the wire, so compressed and chunked bodies (no Content-Length) count too
+        try:
+            sizes = await response.request.sizes()
+        except Exception:
+            # The page or context closed before the body finished
+            return
+        self.stats.bytes_transferred += sizes["responseHeadersSize"] + sizes["responseBodySize"]
     
     async def scrape_web_content(
         self, 
         query: str, 
         max_results: int = 5, 
-        search_engine: str = "bing"
+        search_engine: str = "bing",
+        on_result: Optional[ResultCallback] = None
     ) -> List[Tuple[str, str, Optional[str]]]:
         """
         Scrape web content based on search query
@@ -36,51 +142,183 @@ class WebScraperService:
         Args:
             query: Search query
             max_results: Maximum number of URLs to scrape
-            search_engine: Search engine to use ("bing", "google")
+            search_engine: Search engine to use ("bing", "google", or "local" for the offline fixture server)
+            on_result: Optional callback fired for each page as soon as its content is extracted
             
         Returns:
             List of (url, content, title) tuples
         """
         urls_and_content = []
+        deadline_at = asyncio.get_running_loop().time() + self.deadline
         
         try:
+            excluded = search_engine.lower()
             if search_engine.lower() == "google":
                 search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
                 result_selector = "h3"
                 link_selector = "a"
+            elif search_engine.lower() == "local":
+                # Bing-style markup served by benchmarks/fixture_server.py; its result links stay on the same host
+                search_url = f"{settings.LOCAL_SEARCH_URL}?q={query.replace(' ', '+')}"
+                result_selector = '.b_algo h2 a'
+                link_selector = None
+                excluded = None
             else:
                 search_url = f"https://www.bing.com/search?q={query.replace(' ', '+')}"
                 result_selector = '.b_algo h2 a'
                 link_selector = None
             
-            await self.page.goto(search_url, wait_until="networkidle")
-            await self.page.wait_for_selector(result_selector, timeout=10000)
-            urls = await self._extract_urls(result_selector, link_selector, search_engine, max_results)
-            logger.info(f"Found {len(urls)} URLs to scrape")
+            urls = serp_cache.get(query, search_engine, max_results)
+            if urls is None:
+                # Stop as soon as the results are in the DOM instead of waiting for the network to go idle
+                with span("search_page"):
+                    search_started = time.perf_counter()
+                    if self.page is None:
+                        self.page = await self.context.new_page()
+                    await self.page.goto(search_url, wait_until="commit")
+                    await self.page.wait_for_selector(result_selector, timeout=10000)
+                    self.stats.search_ready_time = time.perf_counter() - search_started
+                    # Spare results stand in for pages that fail or are slow
+                    urls = await self._extract_urls(
+                        result_selector, link_selector, excluded, max_results + self.overfetch
+                    )
+                serp_cache.put(query, search_engine, max_results, urls)
+            # Domains that would only get hedged anyway are fetched last; results keep their search rank
+            candidates = domain_scheduler.order(urls, slow_after=self.hedge_delay)
+            logger.info(f"Found {len(candidates)} URLs to scrape for {max_results} results")
+            
+            with span("page_fetches"):
+                urls_and_content = await self._fetch_all(candidates, deadline_at, on_result, target=max_results)
             
-            for i, url in enumerate(urls):
-                try:
-                    logger.info(f"Scraping {i+1}/{len(urls)}: {url[:60]}...")
-                    
-                    content, title = await self._scrape_url_content(url)
-                    
-                    if content and len(content) > 200:
-                        urls_and_content.append((url, content, title))
-                    
-                except Exception as e:
-                    logger.error(f"Error scraping {url}: {str(e)[:50]}...")
-                    continue
-                    
         except Exception as e:
+            SCRAPE_FAILURES.labels("search").inc()
             logger.error(f"Error during web search: {e}")
+        
+        network_totals["bytes_transferred"] += self.stats.bytes_transferred
+        network_totals["blocked_requests"] += sum(self.stats.blocked_requests.values())
+        logger.info(f"Scrape network stats: {self.stats.as_dict()}")
             
         return urls_and_content
     
+    async def _fetch_all(
+        self,
+        candidates: List[Tuple[int, str]],
+        deadline_at: float,
+        on_result: Optional[ResultCallback] = None,
+        target: Optional[int] = None
+    ) -> List[Tuple[str, str, Optional[str]]]:
+        """
+        Fetch (search rank, url) candidates concurrently, in the given order,
+        until `target` pages have content; results come back, and are passed
+        to `on_result`, by search rank
+
+        There may be more candidates than `target`: a page that fails, or is
+        still loading after `hedge_delay` seconds, is backed up by the next
+        candidate, and once `target` pages are in the stragglers are cancelled.
+        Each page gets its domain's adaptive timeout. Pages still loading when
+        the deadline passes are cancelled and whatever finished in time is returned.
+        """
+        if not candidates:
+            return []
+
+        target = min(target or len(candidates), len(candidates))
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: List[Optional[Tuple[str, str, Optional[str]]]] = [None] * len(candidates)
+        started_at: Dict[int, float] = {}
+
+        async def fetch(i: int, rank: int, url: str):
+            async with semaphore, _global_fetch_semaphore, domain_scheduler.slot(url):
+                started_at[i] = loop.time()
+                timeout = domain_scheduler.timeout(url)
+                ok = False
+                try:
+                    logger.info(f"Scraping {i+1}/{len(candidates)}: {url[:60]}...")
+                    content, title = await asyncio.wait_for(self._scrape_url_content(url, timeout), timeout)
+                    ok = True
+                    if not content or len(content) <= MIN_CONTENT_LENGTH:
+                        SCRAPE_FAILURES.labels("too_short").inc()
+                    # A hedged page finishing once `target` are in is dropped, so only returned pages are streamed
+                    elif succeeded() < target:
+                        results[i] = (url, content, title)
+                        if on_result:
+                            await on_result(rank, url, content, title)
+                except asyncio.CancelledError:
+                    if self.fetch_paths.get(url) != "cache":
+                        domain_scheduler.record_unfinished(url, loop.time() - started_at[i])
+                    raise
+                except asyncio.TimeoutError:
+                    SCRAPE_FAILURES.labels("timeout").inc()
+                    logger.warning(f"Timed out after {timeout:.1f}s scraping {url[:60]}")
+                except Exception as e:
+                    SCRAPE_FAILURES.labels("timeout" if "Timeout" in type(e).__name__ else "error").inc()
+                    logger.error(f"Error scraping {url}: {str(e)[:50]}...")
+                # Pages served from the page cache say nothing about the site
+                if self.fetch_paths.get(url) != "cache":
+                    domain_scheduler.record(url, loop.time() - started_at[i], ok)
+
+        running: Dict[asyncio.Task, int] = {}
+        hedged: set = set()
+        next_candidate = 0
+
+        def succeeded() -> int:
+            return sum(1 for result in results if result)
+
+        def top_up(reason: Optional[str] = None):
+            """Keep enough un-hedged pages in flight to reach `target`"""
+            nonlocal next_candidate
+            while succeeded() + len(running) - len(hedged) < target and next_candidate < len(candidates):
+                task = asyncio.create_task(fetch(next_candidate, *candidates[next_candidate]))
+                running[task] = next_candidate
+                next_candidate += 1
+                if reason:
+                    SCRAPE_REPLACEMENTS.labels(reason).inc()
+
+        top_up()
+        while running and succeeded() < target:
+            now = loop.time()
+            timeout = deadline_at - now
+            if timeout <= 0:
+                break
+            if self.hedge_delay > 0 and next_candidate < len(candidates):
+                hedge_at = [
+                    started_at.get(i, now) + self.hedge_delay
+                    for task, i in running.items() if task not in hedged
+                ]
+                if hedge_at:
+                    timeout = min(timeout, max(0.0, min(hedge_at) - now))
+
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                running.pop(task)
+                hedged.discard(task)
+            top_up("failed")
+
+            if self.hedge_delay > 0:
+                now = loop.time()
+                for task, i in running.items():
+                    if task not in hedged and i in started_at and now - started_at[i] >= self.hedge_delay:
+                        hedged.add(task)
+                top_up("slow")
+
+        if running:
+            if loop.time() >= deadline_at:
+                SCRAPE_FAILURES.labels("deadline").inc(len(running))
+                logger.warning(f"Scrape deadline reached, cancelling {len(running)} unfinished page(s)")
+            else:
+                logger.info(f"Have {target} pages, cancelling {len(running)} slower one(s)")
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        ranked = sorted((candidates[i][0], result) for i, result in enumerate(results) if result)
+        return [result for _, result in ranked[:target]]
+    
     async def _extract_urls(
         self, 
         result_selector: str, 
         link_selector: Optional[str], 
-        search_engine: str, 
+        excluded: Optional[str], 
         max_results: int
     ) -> List[str]:
         urls = []
@@ -91,43 +329,82 @@ class WebScraperService:
                 parent_link = await element.query_selector('xpath=../../..//a[@href]')
                 if parent_link:
                     href = await parent_link.get_attribute('href')
-                    if href and href.startswith('http') and search_engine not in href:
+                    if href and href.startswith('http') and not (excluded and excluded in href):
                         urls.append(href)
         else:  # Bing
             result_elements = await self.page.query_selector_all(result_selector)
             for element in result_elements[:max_results]:
                 href = await element.get_attribute('href')
-                if href and href.startswith('http') and search_engine not in href:
+                if href and href.startswith('http') and not (excluded and excluded in href):
                     urls.append(href)
         
         return urls
     
-    async def _scrape_url_content(self, url: str) -> Tuple[str, Optional[str]]:
-        await self.page.goto(url, wait_until="domcontentloaded", timeout=15000)
-        
-        html_content = await self.page.content()
-        soup = BeautifulSoup(html_content, 'html.parser')
+    async def _scrape_url_content(
+        self, url: str, timeout: float = settings.DOMAIN_TIMEOUT_DEFAULT
+    ) -> Tuple[str, Optional[str]]:
+        started = time.perf_counter()
+        cache_key = normalize_url(url)
+        cached = await page_cache.get(cache_key) if settings.PAGE_CACHE_ENABLED else None
+        if cached and page_cache.is_fresh(cached):
+            PAGE_CACHE.labels("fresh").inc()
+            self._record_fetch_path(url, "cache", started)
+            return cached.content, cached.title
+        PAGE_CACHE.labels("stale" if cached else "miss").inc()
 
-        title_tag = soup.find('title')
-        title = title_tag.get_text().strip() if title_tag else None
+        path = "browser"
+        if settings.HTTP_FAST_PATH:
+            try:
+                validators = cached.conditional_headers() if cached else {}
+                response = await http_fetcher.fetch(url, headers=validators or None)
+                if response:
+                    self.stats.bytes_transferred += response.num_bytes_downloaded
+                if response is not None and response.status_code == 304:
+                    PAGE_CACHE.labels("revalidated").inc()
+                    await page_cache.revalidated(
+                        cache_key, cached, response.headers.get("etag"), response.headers.get("last-modified")
+                    )
+                    self._record_fetch_path(url, "revalidated", started)
+                    return cached.content, cached.title
 
-        for script in soup(["script", "style", "nav", "header", "footer"]):
-            script.decompose()
+                html_content = response.text if response else None
+                if html_content:
+                    content, title = await extract_text(html_content)
+                    if not looks_js_rendered(html_content, content):
+                        await self._cache_page(cache_key, content, title, response.headers)
+                        self._record_fetch_path(url, "http", started)
+                        return content, title
+            except Exception as e:
+                logger.debug(f"HTTP fast path failed for {url[:60]}: {str(e)[:50]}")
+            path = "browser_fallback"
 
-        content_selectors = [
-            'main', 'article', '.content', '#content', 
-            '.post', '.entry', 'p', 'h1', 'h2', 'h3'
-        ]
-        
-        text_content = ""
-        for selector in content_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                text_content += element.get_text() + " "
+        page = await self.context.new_page()
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=timeout * 1000)
+            html_content = await page.content()
+        finally:
+            await page.close()
 
-        clean_text = ' '.join(text_content.split())
-        
-        return clean_text, title
+        content, title = await extract_text(html_content)
+        if len(content) > MIN_CONTENT_LENGTH:
+            # No validators: the browser's response headers aren't kept, so this is refetched once stale
+            await self._cache_page(cache_key, content, title)
+        self._record_fetch_path(url, path, started)
+        return content, title
+
+    async def _cache_page(self, cache_key: str, content: str, title: Optional[str], headers=None):
+        if not settings.PAGE_CACHE_ENABLED:
+            return
+        headers = headers or {}
+        if "no-store" in headers.get("cache-control", "").lower():
+            return
+        await page_cache.put(cache_key, content, title, headers.get("etag"), headers.get("last-modified"))
+
+    def _record_fetch_path(self, url: str, path: str, started: float):
+        self.fetch_paths[url] = path
+        fetch_path_counts[path] += 1
+        PAGE_FETCH_SECONDS.labels(path).observe(time.perf_counter() - started)
+        logger.info(f"Fetched {url[:60]} via {path}")
 
 async def scrape_web_content(
     query: str, 
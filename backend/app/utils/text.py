@@ -0,0 +1,38 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Query parameters that only track where a click came from, never what the page shows
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|msclkid|mc_eid|ref_src)$", re.IGNORECASE)
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query for exact-match cache keys: lowercase, no punctuation, single spaces"""
+    return ' '.join(_PUNCTUATION.sub(' ', query.lower()).split())
+
+
+def fold_query(query: str) -> str:
+    """
+    Query key that ignores only case and whitespace, for keys that decide which
+    results a query gets: punctuation can change the meaning ("C++" vs "C#")
+    """
+    return ' '.join(query.lower().split())
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for page cache keys: lowercase scheme and host,
+    no default port, fragment or tracking parameters, remaining parameters sorted
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _TRACKING_PARAMS.match(key)
+    ))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark the semantic cache index layouts against exact (flat) search.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_ann [--size 50000] [--queries 1000] [--layouts flat ivf/sq8 hnsw]
+                                   [--vectors FILE.npy]
+
+The corpus is clustered synthetic unit vectors, or real embeddings from a
+.npy file. Every query is a perturbed copy of a cached vector whose cosine
+similarity to it is drawn from SIMILARITY_THRESHOLD +/- --band, so most
+lookups sit right at the cache's hit/miss boundary. For every layout it
+reports recall@1 against flat search, how often the hit/miss decision at the
+threshold matches flat (missed hits and false hits), single-query lookup
+latency, build time and index size.
+"""
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+# Settings are loaded on import; the index never talks to Gemini
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.config import settings  # noqa: E402
+from app.services.vector_index import VectorIndex  # noqa: E402
+
+DEFAULT_LAYOUTS = ["flat", "ivf", "ivf/sq8", "ivf/pq", "hnsw", "hnsw/sq8", "hnsw/pq"]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def make_corpus(size: int, dimension: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors grouped around random topics, like embeddings of related queries"""
+    centers = normalize(rng.standard_normal((clusters, dimension)))
+    assignment = rng.integers(0, clusters, size)
+    spread = rng.standard_normal((size, dimension)) / np.sqrt(dimension)
+    return normalize(centers[assignment] + 0.8 * spread)
+
+
+def make_queries(corpus: np.ndarray, count: int, threshold: float, band: float, rng: np.random.Generator) -> np.ndarray:
+    """Rotate cached vectors away from themselves to a cosine in threshold +/- band"""
+    targets = corpus[rng.integers(0, len(corpus), count)]
+    noise = rng.standard_normal(targets.shape).astype(np.float32)
+    noise -= np.sum(noise * targets, axis=1, keepdims=True) * targets
+    noise = normalize(noise)
+    cosine = np.clip(rng.uniform(threshold - band, threshold + band, (count, 1)), -1, 1)
+    return normalize(cosine * targets + np.sqrt(1 - cosine ** 2) * noise)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def run(size: int, query_count: int, layouts: List[str], band: float, vectors_file: Optional[Path], seed: int):
+    rng = np.random.default_rng(seed)
+    threshold = settings.SIMILARITY_THRESHOLD
+
+    if vectors_file:
+        corpus = normalize(np.load(vectors_file))[:size]
+    else:
+        corpus = make_corpus(size, settings.EMBEDDING_DIMENSION, max(1, size // 200), rng)
+    dimension = corpus.shape[1]
+    queries = make_queries(corpus, query_count, threshold, band, rng)
+    ids = np.arange(len(corpus), dtype=np.int64)
+
+    exact = VectorIndex(dimension=dimension).build(corpus, ids)
+    truth_similarity, truth_ids = exact.search(queries, 1)
+    truth_hit = truth_similarity[:, 0] > threshold
+    print(
+        f"{len(corpus)} vectors x {dimension} dims, {query_count} queries at threshold {threshold} +/- {band} "
+        f"({truth_hit.mean():.1%} are hits under flat search)\n"
+    )
+    print(
+        f"{'layout':<10} {'recall@1':>9} {'agree':>7} {'missed':>7} {'false':>7} "
+        f"{'p50 us':>8} {'p99 us':>8} {'build s':>8} {'MB':>8}"
+    )
+
+    for layout in layouts:
+        index_type, _, quantizer = layout.partition("/")
+        vector_index = VectorIndex(dimension=dimension, index_type=index_type, quantizer=quantizer or "none")
+        started = time.perf_counter()
+        vector_index.index = vector_index.build(corpus, ids)
+        build_seconds = time.perf_counter() - started
+
+        latencies = []
+        similarities = np.empty(query_count, dtype=np.float32)
+        found_ids = np.empty(query_count, dtype=np.int64)
+        # One query per call, as the API does
+        for i in range(query_count):
+            started = time.perf_counter()
+            similarity, found = vector_index.search(queries[i:i + 1], 1)
+            latencies.append(time.perf_counter() - started)
+            similarities[i], found_ids[i] = similarity[0, 0], found[0, 0]
+
+        hit = similarities > threshold
+        recall = np.mean(found_ids == truth_ids[:, 0])
+        agree = np.mean((hit == truth_hit) & (~hit | (found_ids == truth_ids[:, 0])))
+        missed = np.mean(truth_hit & ~hit)
+        false_hits = np.mean(hit & (~truth_hit | (found_ids != truth_ids[:, 0])))
+        megabytes = vector_index.serialize().nbytes / 1e6
+
+        print(
+            f"{layout:<10} {recall:>9.3f} {agree:>7.1%} {missed:>7.1%} {false_hits:>7.1%} "
+            f"{percentile(latencies, 50) * 1e6:>8.1f} {percentile(latencies, 99) * 1e6:>8.1f} "
+            f"{build_seconds:>8.2f} {megabytes:>8.1f}"
+        )
+
+    print(f"\nmean flat similarity of the queries: {statistics.mean(truth_similarity[:, 0].tolist()):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50000, help="Cached vectors")
+    parser.add_argument("--queries", type=int, default=1000, help="Lookups per layout")
+    parser.add_argument("--layouts", nargs="+", default=DEFAULT_LAYOUTS, help="index_type[/quantizer] to compare")
+    parser.add_argument("--band", type=float, default=0.05, help="Half-width of the similarity band around the threshold")
+    parser.add_argument("--vectors", type=Path, help="Real embeddings (.npy, rows are vectors) instead of synthetic ones")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.size, args.queries, args.layouts, args.band, args.vectors, args.seed)
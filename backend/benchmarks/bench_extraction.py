@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark the HTML-to-text extractors against saved HTML pages.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_extraction [--fixtures DIR] [--repeat N]
+
+Reports per-page extraction time, output size and the share of duplicated
+sentences in the output for every registered extractor.
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+from pathlib import Path
+
+# Settings are loaded on import; extraction itself never talks to Gemini
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.services.text_extractor import EXTRACTORS  # noqa: E402
+
+DEFAULT_FIXTURES = Path(__file__).parent / "fixtures" / "html"
+
+
+def duplicate_ratio(text: str) -> float:
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if len(s.strip()) > 20]
+    if not sentences:
+        return 0.0
+    return 1 - len(set(sentences)) / len(sentences)
+
+
+def run(fixtures_dir: Path, repeat: int):
+    pages = sorted(fixtures_dir.glob("*.html"))
+    if not pages:
+        raise SystemExit(f"No .html fixtures found in {fixtures_dir}")
+
+    corpus = [(page.name, page.read_text(encoding="utf-8", errors="replace")) for page in pages]
+    print(f"{len(corpus)} page(s) from {fixtures_dir}, {repeat} run(s) each\n")
+    print(f"{'extractor':<10} {'page':<28} {'ms/page':>9} {'chars':>7} {'dup':>6}")
+
+    totals = {}
+    for name, extractor_cls in EXTRACTORS.items():
+        extractor = extractor_cls()
+        totals[name] = 0.0
+        for page_name, html in corpus:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                text, _title = extractor.extract(html)
+                timings.append(time.perf_counter() - started)
+            mean_ms = statistics.mean(timings) * 1000
+            totals[name] += mean_ms
+            print(f"{name:<10} {page_name:<28} {mean_ms:>9.3f} {len(text):>7} {duplicate_ratio(text):>6.1%}")
+
+    print()
+    baseline = totals.get("selector")
+    for name, total_ms in totals.items():
+        speedup = f" ({baseline / total_ms:.1f}x vs selector)" if baseline and name != "selector" else ""
+        print(f"{name:<10} total {total_ms:.3f} ms for the corpus{speedup}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES, help="Directory of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=50, help="Extraction runs per page")
+    args = parser.parse_args()
+    run(args.fixtures, args.repeat)
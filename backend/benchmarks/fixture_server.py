@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Local fixture HTTP server that stands in for the search engine and result pages.
+
+    GET /search?q=...      Bing-style results page (`.b_algo h2 a` links)
+    GET /article/<n>?q=... Article page; saved fixtures are served in rotation,
+                           with an ETag (If-None-Match gets a 304)
+
+Bodies are sent with a Content-Length, or chunked with --chunked.
+
+Usage (from the backend directory):
+    python -m benchmarks.fixture_server [--port 8765] [--results 8] [--latency 0.05] [--chunked]
+
+Point the API at it with LLM_BACKEND=stub and search_engine="local".
+"""
+import argparse
+import hashlib
+import html
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qs, quote, urlparse
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "html"
+
+
+class FixtureServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        results: int = 8,
+        latency: float = 0.0,
+        chunked: bool = False
+    ):
+        self.host = host
+        self.port = port
+        self.results = results
+        self.latency = latency
+        self.chunked = chunked
+        self.pages: List[str] = [
+            page.read_text(encoding="utf-8", errors="replace")
+            for page in sorted(FIXTURES_DIR.glob("*.html"))
+        ]
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def search_url(self) -> str:
+        return f"http://{self.host}:{self.port}/search"
+
+    def start(self):
+        """Serve in a daemon thread"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def serve_forever(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        print(f"Fixture server listening on {self.search_url}")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def search_page(self, query: str) -> str:
+        items = []
+        for rank in range(self.results):
+            article = self._article_number(query, rank)
+            href = f"http://{self.host}:{self.port}/article/{article}?q={quote(query)}"
+            items.append(
+                f'<li class="b_algo"><h2><a href="{html.escape(href)}">Result {rank + 1} for {html.escape(query)}</a></h2>'
+                f'<p>Snippet for result {rank + 1}.</p></li>'
+            )
+        return (
+            f"<html><head><title>{html.escape(query)} - Search</title></head>"
+            f"<body><ol id=\"b_results\">{''.join(items)}</ol></body></html>"
+        )
+
+    def article_page(self, number: int, query: str) -> str:
+        if self.pages:
+            return self.pages[number % len(self.pages)]
+        paragraphs = ''.join(
+            f"<p>Paragraph {i} of article {number} discussing {html.escape(query)} in some detail, "
+            f"with enough text to pass the minimum content length used by the scraper.</p>"
+            for i in range(8)
+        )
+        return f"<html><head><title>Article {number}</title></head><body><article>{paragraphs}</article></body></html>"
+
+    @staticmethod
+    def _article_number(query: str, rank: int) -> int:
+        digest = hashlib.sha1(f"{query}:{rank}".encode()).hexdigest()
+        return int(digest[:8], 16) % 1000
+
+    def _handler(self):
+        fixtures = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if fixtures.latency:
+                    time.sleep(fixtures.latency)
+
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query).get("q", [""])[0]
+                if parsed.path == "/search":
+                    self._send(fixtures.search_page(query))
+                elif parsed.path.startswith("/article/"):
+                    try:
+                        number = int(parsed.path.rsplit("/", 1)[-1])
+                    except ValueError:
+                        self._send("<html><body>Not found</body></html>", status=404)
+                        return
+                    body = fixtures.article_page(number, query)
+                    etag = '"%s"' % hashlib.sha1(body.encode("utf-8")).hexdigest()[:16]
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self._send(body, etag=etag)
+                else:
+                    self._send("<html><body>Not found</body></html>", status=404)
+
+            def _send(self, body: str, status: int = 200, etag: Optional[str] = None):
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if etag:
+                    self.send_header("ETag", etag)
+                if not fixtures.chunked:
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                # No Content-Length: the size is only known once the last chunk arrives
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for start in range(0, len(payload), 4096):
+                    chunk = payload[start:start + 4096]
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--results", type=int, default=8, help="Results listed per search page")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial delay per response in seconds")
+    parser.add_argument("--chunked", action="store_true", help="Send bodies with chunked transfer encoding")
+    args = parser.parse_args()
+    FixtureServer(args.host, args.port, args.results, args.latency, args.chunked).serve_forever()
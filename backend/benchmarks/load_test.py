@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for POST /api/v1/query.
+
+By default the FastAPI app runs in-process with the stub LLM backend, the
+"local" search engine served by benchmarks/fixture_server.py and a throwaway
+data directory, so nothing leaves the machine. Use --url to drive an
+already running server instead.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test [--requests 200] [--concurrency 20] [--queries FILE]
+
+Reports p50/p95/p99 latency, throughput and cache-hit ratio overall and for
+every stage timing the API returns.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_QUERIES = [
+    "What is photosynthesis?",
+    "How does the city transit plan get funded?",
+    "How do I use asyncio.Semaphore in Python?",
+    "Easy sourdough bread recipe for beginners",
+    "What is the Calvin cycle?",
+    "Difference between Semaphore and BoundedSemaphore",
+    "How long should sourdough proof in the fridge?",
+    "When will the airport rail extension be built?",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def load_queries(path: Optional[Path]) -> List[str]:
+    if not path:
+        return DEFAULT_QUERIES
+
+    queries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            record = json.loads(line)
+            line = record.get("query") or record.get("title") or ""
+        if line:
+            queries.append(line)
+    return queries
+
+
+class Result:
+    def __init__(self, latency: float, ok: bool, cached: bool = False, timings: Optional[Dict[str, float]] = None):
+        self.latency = latency
+        self.ok = ok
+        self.cached = cached
+        self.timings = timings or {}
+
+
+async def drive(client, queries: List[str], total: int, concurrency: int, payload_extra: Dict) -> List[Result]:
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[Result] = []
+
+    async def one(i: int):
+        body = {"query": queries[i % len(queries)], **payload_extra}
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/query", json=body)
+                latency = time.perf_counter() - started
+                if response.status_code != 200:
+                    results.append(Result(latency, ok=False))
+                    return
+                data = response.json()
+                results.append(Result(latency, ok=True, cached=data.get("cached", False), timings=data.get("timings")))
+            except Exception:
+                results.append(Result(time.perf_counter() - started, ok=False))
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return results
+
+
+def report(results: List[Result], wall_time: float):
+    ok = [r for r in results if r.ok]
+    latencies = [r.latency for r in ok]
+    cached = sum(1 for r in ok if r.cached)
+
+    print(f"\nrequests: {len(results)}  ok: {len(ok)}  errors: {len(results) - len(ok)}")
+    print(f"wall time: {wall_time:.2f}s  throughput: {len(ok) / wall_time if wall_time else 0:.2f} req/s")
+    print(f"cache hit ratio: {cached / len(ok) if ok else 0:.1%}")
+
+    print(f"\n{'stage':<22} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    rows = {"total": latencies}
+    for kind, subset in (("total (cache hit)", [r for r in ok if r.cached]), ("total (cache miss)", [r for r in ok if not r.cached])):
+        rows[kind] = [r.latency for r in subset]
+
+    stages: Dict[str, List[float]] = defaultdict(list)
+    for r in ok:
+        for stage, seconds in r.timings.items():
+            if isinstance(seconds, (int, float)):
+                stages[stage].append(seconds)
+    rows.update(sorted(stages.items()))
+
+    for stage, values in rows.items():
+        if not values:
+            continue
+        print(
+            f"{stage:<22} {len(values):>5} {percentile(values, 50) * 1000:>9.1f} "
+            f"{percentile(values, 95) * 1000:>9.1f} {percentile(values, 99) * 1000:>9.1f} "
+            f"{statistics.mean(values) * 1000:>9.1f}"
+        )
+
+
+async def wait_until_ready(client, timeout: float):
+    """Models load in the background after startup; don't count that against the first requests"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        response = await client.get("/health/ready")
+        if response.status_code == 200:
+            return
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"API not ready after {timeout:.0f}s: {response.json()}")
+
+
+async def main(args):
+    import httpx
+
+    queries = load_queries(args.queries)
+    payload_extra = {
+        "max_results": args.max_results,
+        "search_engine": args.search_engine,
+        "use_cache": not args.no_cache,
+        "speculative": args.speculative
+    }
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            await wait_until_ready(client, args.timeout)
+            started = time.perf_counter()
+            results = await drive(client, queries, args.requests, args.concurrency, payload_extra)
+            report(results, time.perf_counter() - started)
+        return
+
+    from .fixture_server import FixtureServer
+
+    fixtures = FixtureServer(port=0, results=args.max_results + 2, latency=args.fixture_latency)
+    fixtures.start()
+
+    # Configure the app before it is imported; settings are read at import time
+    os.environ.setdefault("LLM_BACKEND", "stub")
+    # The stub has no provider quota to respect
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "0")
+    # Every fixture page is on the one local host; don't let the per-domain cap serialize them
+    os.environ.setdefault("DOMAIN_MAX_CONCURRENCY", "1000")
+    os.environ["LOCAL_SEARCH_URL"] = fixtures.search_url
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="loadtest-"))
+
+    from app.main import app
+
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+                await wait_until_ready(client, args.timeout)
+                started = time.perf_counter()
+                results = await drive(client, queries, args.requests, args.concurrency, payload_extra)
+                report(results, time.perf_counter() - started)
+    finally:
+        fixtures.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running API; default runs the app in-process")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight at once")
+    parser.add_argument("--queries", type=Path, help="Text file (one query per line) or JSONL with a query/title field")
+    parser.add_argument("--max-results", type=int, default=5)
+    parser.add_argument("--search-engine", default="local")
+    parser.add_argument("--no-cache", action="store_true", help="Send use_cache=false")
+    parser.add_argument("--speculative", action="store_true", help="Send speculative=true")
+    parser.add_argument("--fixture-latency", type=float, default=0.02, help="Delay per fixture server response")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Pre-warm the semantic cache from a query log, ahead of peak traffic.
+
+Reads a JSONL stream of queries (objects with a "query" or "title" field, or
+bare JSON strings; plain lines are taken as they are), embeds them in
+batches, drops near-duplicates (similarity above SIMILARITY_THRESHOLD, the
+same test a cache lookup uses) and queries the cache already answers, and
+runs validation, scraping and generation for the rest at bounded
+concurrency. The answers are then inserted into the FAISS index and the
+metadata store in one bulk add.
+
+Every finished query is appended to a progress file, so an interrupted run
+picks up where it stopped: answered, invalid and no-result queries are not
+run again, failed ones are retried, and answers gathered before the
+interruption are inserted at the end of the next run.
+
+Usage (from the backend directory, with the API stopped or running against
+the same DATA_DIR):
+    python prewarm.py QUERIES.jsonl [--concurrency 8] [--progress FILE] [--restart]
+
+Use "-" to read the queries from stdin.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO
+
+import numpy as np
+
+from app.config import settings
+from app.utils.text import fold_query
+
+# Statuses that are final; anything else ("failed") is retried on the next run
+DONE_STATUSES = ("answered", "invalid", "no_results")
+
+
+def load_queries(stream: TextIO) -> List[str]:
+    queries = []
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] in "{\"":
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = line
+            if isinstance(record, dict):
+                record = record.get("query") or record.get("title") or ""
+            line = str(record).strip()
+        if line:
+            queries.append(line)
+    return queries
+
+
+def load_progress(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Latest progress record per query (ignoring case and whitespace); a line cut short by a crash is skipped"""
+    progress: Dict[str, Dict[str, Any]] = {}
+    if not path.exists():
+        return progress
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            progress[fold_query(record["query"])] = record
+    return progress
+
+
+def semantic_dedupe(vectors: np.ndarray, threshold: float, block: int = 1024) -> List[int]:
+    """
+    Indices of the vectors to keep, in order: each is kept unless it is within
+    `threshold` of one kept before it. Compared block by block against
+    everything kept so far, then greedily within the block.
+    """
+    kept: List[int] = []
+    for start in range(0, len(vectors), block):
+        candidates = vectors[start:start + block]
+        if kept:
+            duplicate = (candidates @ vectors[kept].T).max(axis=1) > threshold
+        else:
+            duplicate = np.zeros(len(candidates), dtype=bool)
+        similarities = candidates @ candidates.T
+        block_kept: List[int] = []
+        for i in range(len(candidates)):
+            if duplicate[i] or (block_kept and similarities[i, block_kept].max() > threshold):
+                continue
+            block_kept.append(i)
+        kept.extend(start + i for i in block_kept)
+    return kept
+
+
+class Throughput:
+    """Prints progress and queries per minute at most every `interval` seconds"""
+
+    def __init__(self, total: int, interval: float = 10.0):
+        self.total = total
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.finished: Optional[float] = None
+        self.done = 0
+        self.counts: Dict[str, int] = {}
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def per_minute(self) -> float:
+        return self.done / self.elapsed * 60 if self.elapsed else 0.0
+
+    def record(self, status: str):
+        self.done += 1
+        self.counts[status] = self.counts.get(status, 0) + 1
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval or self.done == self.total:
+            self.last_report = now
+            print(f"{self.done}/{self.total} queries  {self.per_minute:.1f} queries/min  {self.counts}", flush=True)
+
+
+async def run_pipeline(queries: List[str], vectors: np.ndarray, args, progress_file: TextIO, throughput: Throughput):
+    from app.services.ai_service import ai_service
+
+    pending = iter(range(len(queries)))
+
+    async def worker():
+        # Workers pull the next query when they are free, so at most `concurrency` are in flight
+        for i in pending:
+            query = queries[i]
+            try:
+                status, entry = await ai_service.build_cache_entry(
+                    query, vectors[i:i + 1], args.max_results, args.search_engine
+                )
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Pre-warming failed for {query!r}: {e}")
+                status, entry = "failed", None
+            record = {"query": query, "status": status}
+            if entry is not None:
+                record["entry"] = entry
+            progress_file.write(json.dumps(record, default=str) + "\n")
+            progress_file.flush()
+            throughput.record(status)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, args.concurrency))))
+
+
+async def build_index(progress_path: Path, batch_size: int) -> int:
+    """Insert every answer in the progress file the cache doesn't already cover, with one add"""
+    from app.services.ai_service import ai_service
+
+    entries = [record["entry"] for record in load_progress(progress_path).values() if record.get("entry")]
+    if not entries:
+        return 0
+    vectors = await ai_service.embeddings.embed_documents([entry["query"] for entry in entries], batch_size)
+    # Entries inserted by an earlier run (or cached by live traffic since) are covered already
+    new = ~ai_service.cache_store.covered(vectors, settings.SIMILARITY_THRESHOLD)
+    if not new.any():
+        return 0
+    ai_service.cache_store.add_many(vectors[new], [entry for entry, keep in zip(entries, new) if keep])
+    await ai_service.cache_store.flush()
+    return int(new.sum())
+
+
+async def main(args):
+    from app.main import app
+    from app.services.ai_service import ai_service
+
+    if not args.verbose:
+        # app.main configures INFO logging for the server; progress lines are enough here
+        logging.getLogger().setLevel(logging.WARNING)
+    if args.restart and args.progress.exists():
+        args.progress.unlink()
+    progress = load_progress(args.progress)
+
+    if args.queries == "-":
+        queries = load_queries(sys.stdin)
+    else:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = load_queries(f)
+    seen = set()
+    unique = []
+    for query in queries:
+        key = fold_query(query)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(query)
+
+    async with app.router.lifespan_context(app):
+        await ai_service.initialize()
+
+        started = time.perf_counter()
+        vectors = await ai_service.embeddings.embed_documents(unique, args.embed_batch)
+        kept = semantic_dedupe(vectors, settings.SIMILARITY_THRESHOLD) if unique else []
+        covered = ai_service.cache_store.covered(vectors[kept], settings.SIMILARITY_THRESHOLD) if kept else []
+        todo = [
+            i for i, is_covered in zip(kept, covered)
+            if not is_covered and progress.get(fold_query(unique[i]), {}).get("status") not in DONE_STATUSES
+        ]
+        print(
+            f"{len(queries)} queries, {len(unique)} distinct, {len(kept)} after semantic dedupe, "
+            f"{int(np.sum(covered))} already cached, {len(kept) - int(np.sum(covered)) - len(todo)} done in earlier runs, "
+            f"{len(todo)} to run (embedded in {time.perf_counter() - started:.1f}s)",
+            flush=True
+        )
+
+        throughput = Throughput(len(todo))
+        if todo:
+            with args.progress.open("a", encoding="utf-8") as progress_file:
+                await run_pipeline([unique[i] for i in todo], vectors[todo], args, progress_file, throughput)
+        throughput.finished = time.perf_counter()
+
+        build_started = time.perf_counter()
+        added = await build_index(args.progress, args.embed_batch)
+        print(
+            f"\nran {throughput.done} queries in {throughput.elapsed:.1f}s "
+            f"({throughput.per_minute:.1f} queries/min): {throughput.counts}\n"
+            f"added {added} cache entries in {time.perf_counter() - build_started:.2f}s "
+            f"({len(ai_service.cache_store)} entries in the cache)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queries", help="JSONL query log, or - for stdin")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in the pipeline at once")
+    parser.add_argument("--max-results", type=int, default=5)
+    parser.add_argument("--search-engine", default="bing")
+    parser.add_argument("--embed-batch", type=int, default=settings.RETRIEVAL_ENCODE_BATCH, help="Texts per forward pass")
+    parser.add_argument(
+        "--progress", type=Path, default=settings.DATA_DIR / "prewarm_progress.jsonl",
+        help="Progress file that makes the run resumable"
+    )
+    parser.add_argument("--restart", action="store_true", help="Discard earlier progress and start over")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's INFO logging")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; progress is saved in {args.progress}, run again to resume", file=sys.stderr)
+        sys.exit(130)
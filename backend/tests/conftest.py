@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Settings are read at import time: keep the suite offline and out of the real data directory
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="webquery-tests-"))
@@ -0,0 +1,100 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.ai_service import AIService, LLMGateway
+from app.services.llm_backends import LLMBackend
+
+EMBEDDING = np.ones((1, 4), dtype=np.float32) / 2
+
+
+def make_service():
+    service = AIService()
+    service._initialized = True
+    runs = []
+
+    async def embed(text):
+        return EMBEDDING
+
+    async def run_pipeline(query, query_embedding, max_results, search_engine, use_cache, speculative, on_event=None):
+        runs.append((max_results, search_engine, speculative))
+        await asyncio.sleep(0.05)
+        return f"{query} via {search_engine} x{max_results}", [], False
+
+    service.embeddings.embed = embed
+    service._run_pipeline = run_pipeline
+    return service, runs
+
+
+def test_identical_concurrent_queries_share_one_run():
+    service, runs = make_service()
+
+    async def run():
+        return await asyncio.gather(
+            service.process_query("what is faiss", 3, "google"),
+            service.process_query("What is FAISS?", 3, "google")
+        )
+
+    first, second = asyncio.run(run())
+
+    assert len(runs) == 1
+    assert first == second
+
+
+@pytest.mark.parametrize("options", [
+    {"max_results": 10},
+    {"search_engine": "bing"},
+    {"speculative": True},
+])
+def test_queries_with_different_options_are_not_coalesced(options):
+    service, runs = make_service()
+    leader = {"max_results": 3, "search_engine": "google", "speculative": False}
+
+    async def run():
+        return await asyncio.gather(
+            service.process_query("what is faiss", **leader),
+            service.process_query("what is faiss", **{**leader, **options})
+        )
+
+    first, second = asyncio.run(run())
+
+    assert len(runs) == 2
+    follower = {**leader, **options}
+    assert runs[1] == (follower["max_results"], follower["search_engine"], follower["speculative"])
+    assert second[0] == f"what is faiss via {follower['search_engine']} x{follower['max_results']}"
+
+
+class HangingBackend(LLMBackend):
+    """Never answers; records whether its call was cancelled"""
+
+    name = "hanging"
+
+    def __init__(self):
+        self.cancelled = 0
+
+    async def ainvoke(self, prompt, max_output_tokens=None):
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def test_cancelled_hedged_call_releases_its_slot():
+    gateway = LLMGateway(max_concurrency=1, timeout=3600, hedge_calls=["answer"], hedge_delay=3600)
+    gateway.backend = HangingBackend()
+
+    async def run():
+        call = asyncio.create_task(gateway.invoke("answer", "prompt"))
+        # Cancel while the call is still waiting out the hedge delay
+        await asyncio.sleep(0.05)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await asyncio.sleep(0)
+        return gateway._slots.locked()
+
+    assert asyncio.run(run()) is False
+    assert gateway.backend.cancelled == 1
+    assert gateway.in_flight == 0
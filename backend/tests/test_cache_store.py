@@ -0,0 +1,255 @@
+import asyncio
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.cache_store import CacheStore
+
+DIMENSION = 16
+# One axis per entry, so each vector matches only itself
+VECTORS = np.eye(DIMENSION, dtype=np.float32)
+
+
+def metadata(i: int) -> dict:
+    return {"query": f"query {i}", "answer": f"answer {i}", "sources": [f"http://example.com/{i}"]}
+
+
+def make_store(directory, **options) -> CacheStore:
+    # The background flusher stays idle unless a test shortens the interval; tests flush themselves
+    options = {"flush_interval": 3600, "ttl": 0, "max_entries": 0, **options}
+    return CacheStore(directory, DIMENSION, **options)
+
+
+def crash(store: CacheStore):
+    """Drop a store without flushing, compacting or closing cleanly, as a killed process would"""
+    store._flush_task.cancel()
+    store._wal_file.close()
+    store.metadata_store.close()
+    store._lock_file.close()
+
+
+def answers(store: CacheStore) -> dict:
+    """Entry id -> cached answer, looked up by each entry's own vector"""
+    found = {}
+    for i in range(DIMENSION):
+        hit = store.lookup(VECTORS[i:i + 1], 0.99)
+        if hit:
+            found[hit["id"]] = hit["answer"]
+    return found
+
+
+async def eventually(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def test_log_is_replayed_after_a_crash_before_compaction(tmp_path):
+    async def run():
+        store = make_store(tmp_path)
+        await store.start()
+        ids = store.add_many(VECTORS[:3], [metadata(i) for i in range(3)])
+        await store.flush()
+        crash(store)
+        # A record torn by the crash is dropped on replay
+        with open(store._wal_path(store._wal_generation), 'ab') as f:
+            f.write(b"\x20\x00\x00\x00torn")
+
+        reloaded = make_store(tmp_path)
+        await reloaded.start()
+        try:
+            return ids, answers(reloaded), reloaded.persistence_stats()
+        finally:
+            await reloaded.stop()
+
+    ids, found, stats = asyncio.run(run())
+
+    assert found == {entry_id: f"answer {i}" for i, entry_id in enumerate(ids)}
+    assert stats["generation"] == 0
+    assert stats["wal_records"] == 3
+
+
+def test_compaction_then_reload_keeps_ids_and_metadata(tmp_path):
+    async def run():
+        store = make_store(tmp_path)
+        await store.start()
+        ids = store.add_many(VECTORS[:4], [metadata(i) for i in range(4)])
+        store.remove([ids[1]], "evicted")
+        await store.compact()
+        before = {entry_id: store._payload(entry_id) for entry_id in store.entries}
+        await store.stop()
+
+        reloaded = make_store(tmp_path)
+        await reloaded.start()
+        try:
+            after = {entry_id: reloaded._payload(entry_id) for entry_id in reloaded.entries}
+            return ids, before, after, reloaded.persistence_stats(), reloaded.add(VECTORS[5], metadata(5))
+        finally:
+            await reloaded.stop()
+
+    ids, before, after, stats, next_id = asyncio.run(run())
+
+    assert after == before
+    assert sorted(after) == [ids[0], ids[2], ids[3]]
+    assert stats["generation"] == 1
+    assert stats["wal_records"] == 0
+    # Ids are never reused, even for removed entries
+    assert next_id == ids[-1] + 1
+    assert sorted(path.name for path in tmp_path.glob("cache_wal.*.log")) == ["cache_wal.1.log"]
+
+
+def test_legacy_single_file_cache_is_imported(tmp_path):
+    index = faiss.IndexFlatIP(DIMENSION)
+    index.add(VECTORS[:2])
+    faiss.write_index(index, str(tmp_path / settings.FAISS_INDEX_PATH.name))
+    with open(tmp_path / settings.FAISS_METADATA_PATH.name, 'w') as f:
+        json.dump([metadata(0), metadata(1)], f)
+
+    async def run():
+        store = make_store(tmp_path)
+        await store.start()
+        found = answers(store)
+        await store.stop()
+
+        # The import is recorded in the manifest, and a restart does not repeat it
+        reloaded = make_store(tmp_path)
+        await reloaded.start()
+        try:
+            return found, answers(reloaded)
+        finally:
+            await reloaded.stop()
+
+    found, found_after_restart = asyncio.run(run())
+
+    assert found == {0: "answer 0", 1: "answer 1"}
+    assert found_after_restart == found
+    manifest = json.loads((tmp_path / "cache_manifest.json").read_text())
+    assert "metadata" not in manifest
+
+
+def test_reader_add_reaches_the_owner_through_the_inbox(tmp_path):
+    async def run():
+        owner = make_store(tmp_path, flush_interval=0.05)
+        await owner.start()
+        reader = make_store(tmp_path, flush_interval=0.05)
+        await reader.start()
+        try:
+            roles = owner.owner, reader.owner
+            forwarded = reader.add(VECTORS[0], metadata(0))
+            await eventually(lambda: len(owner) == 1)
+            # The reader picks the entry up from the owner's log and reads its row
+            await eventually(lambda: reader.lookup(VECTORS[:1], 0.99) is not None)
+            return roles, forwarded, answers(owner), answers(reader)
+        finally:
+            await reader.stop()
+            await owner.stop()
+
+    roles, forwarded, owner_found, reader_found = asyncio.run(run())
+
+    assert roles == (True, False)
+    assert forwarded is None
+    assert owner_found == reader_found == {0: "answer 0"}
+
+
+def test_reader_takes_over_when_the_owner_exits(tmp_path):
+    async def run():
+        owner = make_store(tmp_path, flush_interval=0.05)
+        await owner.start()
+        owner.add_many(VECTORS[:2], [metadata(0), metadata(1)])
+        await owner.flush()
+        reader = make_store(tmp_path, flush_interval=0.05)
+        await reader.start()
+        await owner.stop()
+        try:
+            await eventually(lambda: reader.owner)
+            added = reader.add(VECTORS[2], metadata(2))
+            await reader.flush()
+            return added, answers(reader)
+        finally:
+            await reader.stop()
+
+    added, found = asyncio.run(run())
+
+    assert added == 2
+    assert found == {0: "answer 0", 1: "answer 1", 2: "answer 2"}
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    async def run():
+        store = make_store(tmp_path, ttl=60)
+        await store.start()
+        try:
+            store.add_many(VECTORS[:2], [metadata(0), metadata(1)])
+            # Entry 0 was cached two TTLs ago
+            store.entries[0]["timestamp"] -= 120
+            return answers(store), len(store), store.usage_stats()["expired"]
+        finally:
+            await store.stop()
+
+    found, entries, expired = asyncio.run(run())
+
+    assert found == {1: "answer 1"}
+    assert entries == 1
+    assert expired == 1
+
+
+def test_sweep_removes_expired_entries_the_lookups_missed(tmp_path):
+    async def run():
+        store = make_store(tmp_path, ttl=60)
+        await store.start()
+        try:
+            store.add_many(VECTORS[:3], [metadata(i) for i in range(3)])
+            for entry_id in (0, 1):
+                store.entries[entry_id]["timestamp"] -= 120
+            store.sweep_expired()
+            return sorted(store.entries)
+        finally:
+            await store.stop()
+
+    assert asyncio.run(run()) == [2]
+
+
+@pytest.mark.parametrize("policy", ["lru", "lfu"])
+def test_eviction_trims_to_the_entry_bound(tmp_path, policy):
+    async def run():
+        store = make_store(tmp_path, max_entries=10, eviction_policy=policy)
+        await store.start()
+        try:
+            store.add_many(VECTORS[:10], [metadata(i) for i in range(10)])
+            # The oldest entry is used, so neither policy evicts it
+            store.lookup(VECTORS[:1], 0.99)
+            store.add(VECTORS[10], metadata(10))
+            return sorted(store.entries), store.usage_stats()["evicted"]
+        finally:
+            await store.stop()
+
+    entries, evicted = asyncio.run(run())
+
+    # Over the bound, eviction goes down to the 95% watermark in one batch
+    assert len(entries) == 9
+    assert evicted == 2
+    assert 0 in entries and 10 in entries
+
+
+def test_eviction_trims_to_the_byte_bound(tmp_path):
+    async def run():
+        store = make_store(tmp_path)
+        await store.start()
+        try:
+            store.add_many(VECTORS[:4], [metadata(i) for i in range(4)])
+            entry_size = store._bytes // 4
+            store.max_bytes = entry_size * 6
+            store.add_many(VECTORS[4:8], [metadata(i) for i in range(4, 8)])
+            return sorted(store.entries), store._bytes, store.max_bytes
+        finally:
+            await store.stop()
+
+    entries, size, max_bytes = asyncio.run(run())
+
+    assert size <= max_bytes
+    # The least recently used go first
+    assert entries == [3, 4, 5, 6, 7]
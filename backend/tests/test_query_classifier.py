@@ -0,0 +1,62 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.ai_service import AIService
+from app.services.query_classifier import INVALID_EXAMPLES, VALID_EXAMPLES, QueryClassifier
+
+EXAMPLES = VALID_EXAMPLES + INVALID_EXAMPLES
+
+
+class OneHotModel:
+    """Embeds every labelled example as its own axis"""
+
+    def encode(self, texts):
+        return np.stack([np.eye(len(EXAMPLES))[EXAMPLES.index(text)] for text in texts])
+
+
+def near(example: str, closeness: float = 0.9) -> np.ndarray:
+    """A unit query embedding whose similarity to `example` is `closeness`"""
+    vector = np.full(len(EXAMPLES), np.sqrt((1 - closeness ** 2) / (len(EXAMPLES) - 1)))
+    vector[EXAMPLES.index(example)] = closeness
+    return vector.reshape(1, -1).astype(np.float32)
+
+
+# Borderline how-to queries whose nearest example is an INVALID assistant command
+BORDERLINE_HOW_TO = {
+    "how to set a timer on iPhone": "Set a timer",
+    "how to turn off the lights with Alexa": "Turn off the lights",
+    "how to play music on two speakers at once": "Play music",
+}
+
+
+@pytest.fixture
+def classifier():
+    return QueryClassifier(OneHotModel(), min_similarity=0.6, margin=0.15)
+
+
+def test_clear_web_query_is_accepted_locally(classifier):
+    assert classifier.classify(near("What is the capital of France?")) is True
+
+
+@pytest.mark.parametrize("example", INVALID_EXAMPLES)
+def test_local_tier_never_rejects(classifier, example):
+    assert classifier.classify(near(example, closeness=0.99)) is None
+
+
+@pytest.mark.parametrize("query, example", BORDERLINE_HOW_TO.items())
+def test_borderline_how_to_queries_reach_the_llm(classifier, query, example):
+    service = AIService()
+    service._initialized = True
+    service.query_classifier = classifier
+    asked = []
+
+    async def validate_with_llm(text):
+        asked.append(text)
+        return True
+
+    service._validate_with_llm = validate_with_llm
+
+    assert asyncio.run(service.validate_query(query, near(example))) is True
+    assert asked == [query]
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.models.schemas import BatchQueryResult
+from app.services.batch_scheduler import BatchScheduler
+from app.services.serp_cache import SerpCache
+
+
+def test_serp_cache_keeps_punctuation_that_changes_the_query():
+    cache = SerpCache(ttl=60, max_entries=10)
+    cache.put("c++ x", "bing", 5, ["https://example.com/cpp"])
+
+    assert SerpCache._key("c++ x", "bing", 5) != SerpCache._key("c# x", "bing", 5)
+    assert cache.get("c# x", "bing", 5) is None
+    assert cache.get("  C++   X ", "Bing", 5) == ["https://example.com/cpp"]
+
+
+def test_batch_runs_queries_that_differ_in_punctuation_separately():
+    scheduler = BatchScheduler(concurrency=4)
+    processed = []
+
+    async def schedule(query, max_results, search_engine, use_cache):
+        processed.append(query)
+        return BatchQueryResult(query=query, error=f"ran {query}")
+
+    scheduler._schedule = schedule
+
+    results = asyncio.run(scheduler.run(["c++ x", "c# x", "C++  X"]))
+
+    assert processed == ["c++ x", "c# x"]
+    assert [result.error for result in results] == ["ran c++ x", "ran c# x", "ran c++ x"]
+    assert results[2].query == "C++  X"
@@ -0,0 +1,35 @@
+import pytest
+
+from app.services.text_extractor import LxmlExtractor, SelectorExtractor, TextExtractor
+
+BODY = " ".join(
+    f"Paragraph {i} explains how the permit application is reviewed by the city planning office."
+    for i in range(8)
+)
+
+FORM_WRAPPED_PAGE = f"""
+<html><head><title>Permit applications</title></head>
+<body>
+  <form method="post" action="./Default.aspx" id="form1">
+    <input type="hidden" name="__VIEWSTATE" value="abc" />
+    <nav><a href="/">Home</a> <a href="/permits">Permits</a></nav>
+    <div id="content"><h1>Applying for a permit</h1><p>{BODY}</p></div>
+    <footer>Copyright City Hall</footer>
+  </form>
+</body></html>
+"""
+
+
+def test_form_wrapped_page_keeps_its_content():
+    text, title = LxmlExtractor().extract(FORM_WRAPPED_PAGE)
+
+    assert title == "Permit applications"
+    assert "Applying for a permit" in text
+    assert BODY in text
+    assert "Copyright City Hall" not in text
+    assert len(text) >= len(SelectorExtractor().extract(FORM_WRAPPED_PAGE)[0]) // 2
+
+
+def test_text_extractor_is_abstract():
+    with pytest.raises(TypeError):
+        TextExtractor()
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.browser_pool import BrowserPool
+from app.services.domain_scheduler import DomainScheduler
+from app.services.text_extractor import extract_text
+from app.services.web_scraper import WebScraperService, looks_js_rendered
+from benchmarks.fixture_server import FixtureServer
+
+URLS = ["http://first.example/1", "http://second.example/1", "http://third.example/1"]
+
+
+def test_degraded_domain_is_fetched_last_but_keeps_its_rank():
+    scheduler = DomainScheduler(min_samples=1, breaker_failures=100)
+    for _ in range(3):
+        scheduler.record(URLS[0], 1.0, ok=False)
+
+    assert scheduler.order(URLS) == [(1, URLS[1]), (2, URLS[2]), (0, URLS[0])]
+
+
+def test_fetch_all_returns_and_streams_results_by_search_rank():
+    scraper = WebScraperService(hedge_delay=0)
+    delays = {URLS[0]: 0.05, URLS[1]: 0.0, URLS[2]: 0.01}
+
+    async def scrape(url, timeout):
+        await asyncio.sleep(delays[url])
+        return url + " " + "content " * 50, None
+
+    scraper._scrape_url_content = scrape
+    streamed = []
+
+    async def on_result(rank, url, content, title):
+        streamed.append((rank, url))
+
+    async def run():
+        deadline_at = asyncio.get_running_loop().time() + 10
+        candidates = [(1, URLS[1]), (2, URLS[2]), (0, URLS[0])]
+        return await scraper._fetch_all(candidates, deadline_at, on_result, target=3)
+
+    results = asyncio.run(run())
+
+    assert [url for url, _, _ in results] == URLS
+    assert sorted(streamed) == list(enumerate(URLS))
+
+
+def test_browser_counts_bytes_of_chunked_responses(monkeypatch):
+    # Browser path only: the HTTP fast path counts its own bytes
+    monkeypatch.setattr(settings, "HTTP_FAST_PATH", False)
+    monkeypatch.setattr(settings, "PAGE_CACHE_ENABLED", False)
+    fixtures = FixtureServer(port=0, chunked=True)
+    fixtures.start()
+    pool = BrowserPool(size=1)
+
+    async def run():
+        try:
+            await pool.start()
+        except Exception as e:
+            pytest.skip(f"Chromium is not available: {e}")
+        try:
+            async with WebScraperService(pool=pool) as scraper:
+                await scraper._scrape_url_content(f"http://{fixtures.host}:{fixtures.port}/article/1?q=test")
+                return scraper.stats.bytes_transferred
+        finally:
+            await pool.stop()
+
+    try:
+        assert asyncio.run(run()) > 0
+    finally:
+        fixtures.stop()
+
+
+ARTICLE = "".join(f"<p>Paragraph {i} of a server-rendered article with plenty of readable text.</p>" for i in range(8))
+NOSCRIPT_BANNER = "<noscript>Please enable JavaScript for the best experience.</noscript>"
+
+
+@pytest.mark.parametrize("html, is_shell", [
+    # A full server-rendered page is kept despite its <noscript> banner
+    (f"<html><body>{NOSCRIPT_BANNER}<article>{ARTICLE}</article></body></html>", False),
+    # Too little text to be worth keeping: the browser renders it
+    (f"<html><body>{NOSCRIPT_BANNER}<p>Loading...</p></body></html>", True),
+    # An empty root element is filled in by scripts, whatever else the page carries
+    (f'<html><body><div id="__next"></div><footer>{ARTICLE}</footer></body></html>', True),
+])
+def test_app_shell_detection(html, is_shell):
+    text, _ = asyncio.run(extract_text(html))
+
+    assert looks_js_rendered(html, text) is is_shell
+
+
+def test_fetch_all_streams_no_more_results_than_it_returns():
+    scraper = WebScraperService(hedge_delay=0.01)
+    started = []
+    all_started = asyncio.Event()
+
+    async def scrape(url, timeout):
+        # The slow pages get hedged, then all of them finish together
+        started.append(url)
+        if len(started) == len(URLS):
+            all_started.set()
+        await all_started.wait()
+        return url + " " + "content " * 50, None
+
+    scraper._scrape_url_content = scrape
+    streamed = []
+
+    async def on_result(rank, url, content, title):
+        streamed.append(url)
+
+    async def run():
+        deadline_at = asyncio.get_running_loop().time() + 10
+        return await scraper._fetch_all(list(enumerate(URLS)), deadline_at, on_result, target=2)
+
+    results = asyncio.run(run())
+
+    assert len(started) == 3
+    assert len(results) == 2
+    assert sorted(streamed) == sorted(url for url, _, _ in results)
@@ -15,6 +15,7 @@ export interface QueryRequest {
   max_results?: number;
   search_engine?: string;
   use_cache?: boolean;
+  speculative?: boolean;
 }
 
 export interface SearchResult {
@@ -31,20 +32,123 @@ export interface QueryResponse {
   cached: boolean;
   timestamp: string;
   processing_time?: number;
+  timings?: Record<string, number>;
 }
 
 export interface CacheStats {
   total_cached_queries: number;
   faiss_index_size: number;
   cache_enabled: boolean;
+  hits?: number;
+  misses?: number;
+  expired?: number;
+  evicted?: number;
+  hit_rate?: number;
+  bytes?: number;
+  eviction_policy?: string;
 }
 
+export interface StreamHandlers {
+  onCache?: (hit: boolean) => void;
+  onValidated?: (valid: boolean) => void;
+  onSource?: (source: SearchResult & { rank: number }) => void;
+  onToken?: (text: string) => void;
+  signal?: AbortSignal;
+}
+
+const parseSseFrame = (frame: string): { event: string; data: any } | null => {
+  let event = 'message';
+  const dataLines: string[] = [];
+  for (const line of frame.split('\n')) {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trimStart());
+    }
+  }
+  if (dataLines.length === 0) {
+    return null;
+  }
+  return { event, data: JSON.parse(dataLines.join('\n')) };
+};
+
 export class ApiService {
   static async processQuery(request: QueryRequest): Promise<QueryResponse> {
     const response = await api.post<QueryResponse>('/query', request);
     return response.data;
   }
 
+  /**
+   * Stream a query over server-sent events. Stage events and answer tokens are
+   * delivered to the handlers; resolves with the final QueryResponse.
+   */
+  static async streamQuery(request: QueryRequest, handlers: StreamHandlers = {}): Promise<QueryResponse> {
+    const response = await fetch(`${API_BASE_URL}/api/v1/query/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'text/event-stream',
+      },
+      body: JSON.stringify(request),
+      signal: handlers.signal,
+    });
+
+    if (!response.ok || !response.body) {
+      let detail = `Server error: ${response.status}`;
+      try {
+        detail = (await response.json()).detail || detail;
+      } catch {
+        // Non-JSON error body
+      }
+      throw new Error(detail);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) {
+        break;
+      }
+      buffer += decoder.decode(value, { stream: true }).replace(/\r\n/g, '\n');
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const frame = parseSseFrame(buffer.slice(0, boundary));
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+        if (!frame) {
+          continue;
+        }
+
+        switch (frame.event) {
+          case 'cache':
+            handlers.onCache?.(frame.data.hit);
+            break;
+          case 'validated':
+            handlers.onValidated?.(frame.data.valid);
+            break;
+          case 'source':
+            handlers.onSource?.(frame.data);
+            break;
+          case 'token':
+            handlers.onToken?.(frame.data.text);
+            break;
+          case 'result':
+            await reader.cancel();
+            return frame.data as QueryResponse;
+          case 'error':
+            await reader.cancel();
+            throw new Error(frame.data.detail || 'Query processing failed');
+        }
+      }
+    }
+
+    throw new Error('Stream ended before a result was received');
+  }
+
   static async getCacheStats(): Promise<CacheStats> {
     const response = await api.get<CacheStats>('/cache/stats');
     return response.data;